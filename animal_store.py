@@ -0,0 +1,347 @@
+# Compact, memory-mapped storage for the featured collection.
+#
+#   python animal_store.py build                      # from featured_animals.py
+#   python animal_store.py build --jsonl catalog.jsonl -o big.bin
+#   python animal_store.py info
+#
+# Records are stored column by column. Every distinct string is stored once,
+# in a single UTF-8 pool; columns are uint32 string ids, and list fields
+# (facts, aliases, ...) use an offsets + values pair. The file is mmapped,
+# so opening it costs a header read however large the catalog is, pages are
+# shared between worker processes, and records are decoded on access into
+# small __slots__ views. Lookup by id is a binary search over a sorted
+# permutation, so no per-process dict of ids is needed either.
+#
+# Layout: MAGIC | u32 header length | JSON header | 8-byte aligned sections.
+#
+# The header records what the store was built from. Only stores built from
+# featured_animals.py are rebuilt automatically when that file changes; a
+# store built from a JSON Lines catalog is never replaced by the app.
+
+import argparse
+import json
+import os
+import sys
+import warnings
+from array import array
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+
+import config
+
+MAGIC = b"ANMSTOR\x01"
+FORMAT_VERSION = 1
+
+SCALAR_FIELDS = (
+    "name",
+    "category",
+    "scientific_name",
+    "conservation_status",
+    "image",
+    "description",
+    "habitat",
+    "distribution",
+    "population",
+)
+LIST_FIELDS = ("facts", "characteristics", "threats", "aliases")
+FIELDS = SCALAR_FIELDS + LIST_FIELDS
+
+SOURCE_PATH = Path(__file__).with_name("featured_animals.py")
+FEATURED_SOURCE = SOURCE_PATH.name
+
+
+class AnimalStoreError(Exception):
+    pass
+
+
+def _align(n: int, to: int = 8) -> int:
+    return (n + to - 1) // to * to
+
+
+def build(records, path, source: str = FEATURED_SOURCE) -> Path:
+    """Write an iterable of (animal_id, dict) pairs to `path` atomically.
+
+    `source` is recorded in the header (see load_featured).
+    """
+    path = Path(path)
+    strings = {}
+    pool = bytearray()
+    offsets = array("I", [0])
+
+    def intern(s) -> int:
+        s = "" if s is None else str(s)
+        sid = strings.get(s)
+        if sid is None:
+            sid = strings[s] = len(offsets) - 1
+            pool.extend(s.encode("utf-8"))
+            if len(pool) >= 2 ** 32:
+                raise AnimalStoreError("string pool larger than 4 GiB")
+            offsets.append(len(pool))
+        return sid
+
+    ids = array("I")
+    columns = {f: array("I") for f in SCALAR_FIELDS}
+    lists = {f: (array("I", [0]), array("I")) for f in LIST_FIELDS}
+    for animal_id, a in records:
+        ids.append(intern(animal_id))
+        for f in SCALAR_FIELDS:
+            columns[f].append(intern(a.get(f)))
+        for f in LIST_FIELDS:
+            offs, values = lists[f]
+            values.extend(intern(v) for v in (a.get(f) or ()))
+            offs.append(len(values))
+
+    if len(set(ids)) != len(ids):
+        raise AnimalStoreError("duplicate animal ids")
+    # Row numbers sorted by id, for binary search.
+    id_bytes = [bytes(pool[offsets[i]:offsets[i + 1]]) for i in ids]
+    order = array("I", sorted(range(len(ids)), key=id_bytes.__getitem__))
+    del id_bytes
+
+    sections = [("pool", bytes(pool)), ("offsets", offsets), ("ids", ids), ("order", order)]
+    sections += [(f, columns[f]) for f in SCALAR_FIELDS]
+    for f in LIST_FIELDS:
+        sections += [(f"{f}.offsets", lists[f][0]), (f"{f}.values", lists[f][1])]
+
+    layout = {}
+    pos = 0
+    for name, data in sections:
+        size = len(data) * (data.itemsize if isinstance(data, array) else 1)
+        layout[name] = [pos, size]
+        pos = _align(pos + size)
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "source": source,
+        "count": len(ids),
+        "strings": len(offsets) - 1,
+        "sections": layout,
+    }).encode("utf-8")
+    base = _align(len(MAGIC) + 4 + len(header))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(4, "little") + header)
+        for name, data in sections:
+            f.seek(base + layout[name][0])
+            f.write(data.tobytes() if isinstance(data, array) else data)
+        f.truncate(base + pos)
+    os.replace(tmp, path)
+    return path
+
+
+def _parse_header(data, path):
+    if data[:len(MAGIC)] != MAGIC:
+        raise AnimalStoreError(f"{path} is not an animal store")
+    hlen = int.from_bytes(data[len(MAGIC):len(MAGIC) + 4], "little")
+    try:
+        return hlen, json.loads(bytes(data[len(MAGIC) + 4:len(MAGIC) + 4 + hlen]))
+    except ValueError:
+        raise AnimalStoreError(f"{path} has a damaged header") from None
+
+
+def read_source(path):
+    """What the store at `path` was built from, or None if it cannot be read."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(len(MAGIC) + 4)
+            hlen = int.from_bytes(head[len(MAGIC):], "little")
+            _, header = _parse_header(head + f.read(hlen), path)
+    except (AnimalStoreError, OSError):
+        return None
+    return header.get("source", FEATURED_SOURCE)
+
+
+class AnimalRecord(Mapping):
+    """Read-only view of one stored animal; decodes fields on access."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row: int):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._store._field(self._row, key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return f"AnimalRecord({self._store._id(self._row)!r})"
+
+    def to_dict(self) -> dict:
+        return {f: self[f] for f in FIELDS}
+
+
+class AnimalStore(Mapping):
+    """animal_id -> AnimalRecord over a memory-mapped file, in build order."""
+
+    def __init__(self, path):
+        import mmap
+
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        hlen, header = _parse_header(mm, path)
+        if header.get("version") != FORMAT_VERSION or header.get("byteorder") != sys.byteorder:
+            raise AnimalStoreError(f"{path} was written by another version or platform")
+        base = _align(len(MAGIC) + 4 + hlen)
+        # Stores written before the source was recorded were all built
+        # from featured_animals.py by load_featured.
+        self.source = header.get("source", FEATURED_SOURCE)
+        view = memoryview(mm)
+
+        def section(name, fmt="I"):
+            start, size = header["sections"][name]
+            part = view[base + start:base + start + size]
+            return part.cast(fmt) if fmt else part
+
+        self._count = header["count"]
+        self._pool = section("pool", None)
+        self._offsets = section("offsets")
+        self._ids = section("ids")
+        self._order = section("order")
+        self._columns = {f: section(f) for f in SCALAR_FIELDS}
+        self._lists = {f: (section(f"{f}.offsets"), section(f"{f}.values")) for f in LIST_FIELDS}
+        # Categories, statuses and the like repeat across records.
+        self._str = lru_cache(maxsize=4096)(self._decode)
+
+    def _decode(self, sid: int) -> str:
+        return str(self._pool[self._offsets[sid]:self._offsets[sid + 1]], "utf-8")
+
+    def _id(self, row: int) -> str:
+        return self._str(self._ids[row])
+
+    def _field(self, row: int, key: str):
+        col = self._columns.get(key)
+        if col is not None:
+            return self._str(col[row])
+        if key in self._lists:
+            offs, values = self._lists[key]
+            return [self._str(v) for v in values[offs[row]:offs[row + 1]]]
+        raise KeyError(key)
+
+    def _find(self, animal_id: str) -> int:
+        target = animal_id.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            sid = self._ids[self._order[mid]]
+            if bytes(self._pool[self._offsets[sid]:self._offsets[sid + 1]]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count:
+            row = self._order[lo]
+            if self._id(row) == animal_id:
+                return row
+        return -1
+
+    def __getitem__(self, animal_id):
+        row = self._find(animal_id) if isinstance(animal_id, str) else -1
+        if row < 0:
+            raise KeyError(animal_id)
+        return AnimalRecord(self, row)
+
+    def __contains__(self, animal_id):
+        return isinstance(animal_id, str) and self._find(animal_id) >= 0
+
+    def __iter__(self):
+        return (self._id(r) for r in range(self._count))
+
+    def __len__(self):
+        return self._count
+
+    # Row-order iteration without a lookup per key.
+    def items(self):
+        return [(self._id(r), AnimalRecord(self, r)) for r in range(self._count)]
+
+    def values(self):
+        return [AnimalRecord(self, r) for r in range(self._count)]
+
+
+def _is_stale(path: Path, source: str) -> bool:
+    # Only a store compiled from featured_animals.py follows that file.
+    return (
+        source == FEATURED_SOURCE
+        and SOURCE_PATH.exists()
+        and SOURCE_PATH.stat().st_mtime > path.stat().st_mtime
+    )
+
+
+def load_featured(path=None):
+    """Open the featured store, (re)building it from featured_animals.py if needed.
+
+    A store built from another source (``build --jsonl``) is used as it is,
+    and is never overwritten: if it cannot be opened, the source dicts are
+    used with a warning. Also falls back to the source dicts when the store
+    cannot be written (for example on a read-only filesystem).
+    """
+    path = Path(path or config.ANIMAL_STORE_PATH)
+    source = read_source(path)
+    if source is not None and not _is_stale(path, source):
+        try:
+            return AnimalStore(path)
+        except (AnimalStoreError, ValueError, OSError):
+            pass  # rebuild below, unless it came from elsewhere
+
+    from featured_animals import ANIMALS
+
+    if source not in (None, FEATURED_SOURCE):
+        warnings.warn(
+            f"{path} was built from {source} but cannot be opened; "
+            f"using featured_animals.py without replacing it. Rebuild it with "
+            f"animal_store.py build --jsonl.",
+            stacklevel=2,
+        )
+        return ANIMALS
+    try:
+        return AnimalStore(build(ANIMALS.items(), path))
+    except OSError:
+        return ANIMALS
+
+
+def iter_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                yield rec.pop("id"), rec
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the featured animal store.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="compile featured_animals.py (or --jsonl) into a store")
+    b.add_argument("-o", "--output", type=Path, default=Path(config.ANIMAL_STORE_PATH))
+    b.add_argument("--jsonl", type=Path, default=None,
+                   help='one {"id": ..., "name": ..., ...} object per line')
+    i = sub.add_parser("info", help="summarize a store file")
+    i.add_argument("path", type=Path, nargs="?", default=Path(config.ANIMAL_STORE_PATH))
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        if args.jsonl:
+            records, source = iter_jsonl(args.jsonl), args.jsonl.name
+        else:
+            from featured_animals import ANIMALS
+
+            records, source = ANIMALS.items(), FEATURED_SOURCE
+        path = build(records, args.output, source=source)
+        print(f"Wrote {path} ({path.stat().st_size / 1e6:.2f} MB)")
+    else:
+        store = AnimalStore(args.path)
+        print(f"{args.path}: {len(store)} animals from {store.source}, "
+              f"{args.path.stat().st_size / 1e6:.2f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
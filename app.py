@@ -1,28 +1,30 @@
 import base64
-from pathlib import Path
+import threading
+import time
+from typing import TYPE_CHECKING
 
 import streamlit as st
-import requests
-import numpy as np
-from PIL import Image
 
 import config
+import metrics
+from result_cache import build_result_cache
+from uploads import UploadError, ingest, check_size as check_upload_size
 from animal_data import (
     ANIMAL_CATEGORIES,
     ANIMALS_DATA,
+    FEATURED_STORE,
+    FUZZY_INDEX,
+    NAME_INDEX,
+    PREFIX_INDEX,
     get_animals_by_category,
     get_animal_detail
 )
 
-# -------------------------------------------------
-# Safe optional import: do NOT crash the whole app
-# -------------------------------------------------
-try:
-    import onnxruntime as ort
-    ORT_AVAILABLE = True
-except Exception:
-    ort = None
-    ORT_AVAILABLE = False
+# numpy, PIL, onnxruntime and requests are imported inside the functions
+# that use them, so Home/Featured reruns and fresh workers do not pay for
+# them (see benchmarks/startup.py).
+if TYPE_CHECKING:
+    from PIL import Image
 
 
 # -----------------------------
@@ -45,10 +47,6 @@ def allowed_file(filename: str) -> bool:
     return ext in config.ALLOWED_EXTENSIONS
 
 
-def normalize(s: str) -> str:
-    return (s or "").strip().lower()
-
-
 def is_ascii_text(s: str) -> bool:
     try:
         s.encode("ascii")
@@ -63,8 +61,10 @@ def safe_aliases_for_display(aliases):
 
 
 def read_image_as_data_url(uploaded_file) -> str:
-    raw = uploaded_file.getvalue()
-    b64 = base64.b64encode(raw).decode("utf-8")
+    # Same byte limit as uploads.ingest; encoded from the buffer, not a copy.
+    with uploaded_file.getbuffer() as raw:
+        check_upload_size(uploaded_file.name, raw.nbytes)
+        b64 = base64.b64encode(raw).decode("utf-8")
 
     ext = uploaded_file.name.rsplit(".", 1)[1].lower() if "." in uploaded_file.name else "jpeg"
     mime = {
@@ -81,150 +81,286 @@ def read_image_as_data_url(uploaded_file) -> str:
 # -----------------------------
 # GBIF (Global)
 # -----------------------------
+# Timed outside st.cache_data, so cache hits are counted too.
+@metrics.timed("gbif_search")
 @st.cache_data(ttl=60 * 60)
 def gbif_species_search(query: str, limit: int = 10):
-    url = "https://api.gbif.org/v1/species/search"
-    params = {"q": query, "limit": limit}
-    r = requests.get(url, params=params, timeout=15)
-    r.raise_for_status()
-    return r.json().get("results", [])
+    # Local backbone copy first (milliseconds, works offline); GBIF API only
+    # when it has no answer.
+    import gbif_lookup
+
+    return gbif_lookup.species_search(query, limit=limit)
 
 
+@metrics.timed("gbif_match")
 @st.cache_data(ttl=60 * 60)
 def gbif_species_match(name: str):
-    url = "https://api.gbif.org/v1/species/match"
-    params = {"name": name, "verbose": "true"}
-    r = requests.get(url, params=params, timeout=15)
-    r.raise_for_status()
-    return r.json()
+    import gbif_lookup
+
+    return gbif_lookup.species_match(name)
+
+
+def gbif_lookup_stream(query: str, limit: int = 5):
+    # Match, search and enrichment of the top hits in parallel, bounded by
+    # GBIF_LOOKUP_DEADLINE; yields partial results as they arrive.
+    # gbif_lookup caches complete results itself, so a lookup cut short is
+    # retried on the next rerun.
+    import gbif_lookup
+
+    return gbif_lookup.iter_lookup(query, limit=limit)
+
+
+# -----------------------------
+# Featured photos
+# -----------------------------
+@st.cache_resource
+def get_image_cache():
+    import image_cache
+
+    cache = image_cache.get_image_cache()
+    if cache is not None and config.IMAGE_PROXY_PORT:
+        try:
+            image_cache.start_proxy(cache, config.IMAGE_PROXY_HOST, config.IMAGE_PROXY_PORT)
+        except OSError:
+            pass  # another process on this host already serves the same files
+    return cache
+
+
+def featured_image_sources(urls, variant: str = "thumb") -> dict:
+    # {original URL: what to pass to st.image}: the resized local copy (or
+    # its proxy URL) when available, else the original URL.
+    cache = get_image_cache()
+    if cache is None:
+        return {u: u for u in urls}
+    import image_cache
+
+    sources = {}
+    for url, path in cache.prefetch(urls, variant).items():
+        if path is None:
+            sources[url] = url
+        elif config.IMAGE_PROXY_PORT:
+            sources[url] = image_cache.proxy_url(path)
+        else:
+            sources[url] = str(path)
+    return sources
 
 
 # -----------------------------
 # Local name search (Featured)
 # -----------------------------
 def local_name_search(query: str):
-    q = normalize(query)
-    if not q:
-        return []
+    # Exact matches first, then prefix, then substring (see search_index.py).
+    return [(animal_id, ANIMALS_DATA[animal_id]) for animal_id in NAME_INDEX.search(query)]
+
+
+def local_suggestions(query: str, limit: int = 8):
+    # Type-ahead over the featured names; the per-session TypeAhead narrows
+    # its previous candidates while the user keeps typing.
+    from search_index import TypeAhead
 
-    hits = []
-    for animal_id, a in ANIMALS_DATA.items():
-        fields = [
-            a.get("name", ""),
-            a.get("scientific_name", ""),
-            *(a.get("aliases", []) or []),
-        ]
-        fields_norm = [normalize(x) for x in fields if x]
+    typeahead = st.session_state.get("typeahead")
+    if typeahead is None:
+        typeahead = st.session_state["typeahead"] = TypeAhead(PREFIX_INDEX)
+    return typeahead.suggest(query, limit=limit)
 
-        if any(q == f for f in fields_norm) or any(q in f for f in fields_norm):
-            hits.append((animal_id, a))
-    return hits
+
+def local_fuzzy_search(query: str, limit: int = 5):
+    # Typo-tolerant fallback: [(animal_id, animal, matched_name, distance), ...]
+    return [
+        (animal_id, ANIMALS_DATA[animal_id], term, dist)
+        for animal_id, term, dist in FUZZY_INDEX.lookup(query, limit=limit)
+    ]
 
 
 # -----------------------------
 # No-key ImageNet classifier via ONNX
 # -----------------------------
-MODEL_DIR = Path(".cache/models")
-MODEL_DIR.mkdir(parents=True, exist_ok=True)
+@st.cache_resource
+def ort_available() -> bool:
+    # Safe optional import: a broken onnxruntime must not crash the app.
+    try:
+        import onnxruntime  # noqa: F401
+        return True
+    except Exception:
+        return False
 
-# Public model + labels
-MOBILENET_ONNX_URL = (
-    "https://huggingface.co/qualcomm/MobileNet-v2/resolve/main/MobileNet-v2.onnx"
-)
-IMAGENET_LABELS_URL = (
-    "https://raw.githubusercontent.com/pytorch/hub/master/imagenet_classes.txt"
-)
 
-MODEL_PATH = MODEL_DIR / "mobilenet_v2.onnx"
-LABELS_PATH = MODEL_DIR / "imagenet_classes.txt"
+@st.cache_resource
+def load_imagenet_labels():
+    import imagenet_model
+
+    return imagenet_model.load_labels()
+
+
+@st.cache_resource
+@metrics.timed("model_load")
+def load_onnx_session():
+    import imagenet_model
+
+    if config.INFERENCE_SOCKET:
+        # Shared model process (inference_server.py); a local session is
+        # only loaded if the server cannot be reached. With neither, calls
+        # raise ModelUnavailable (see imagenet_classify_batch).
+        from inference_server import InferenceClient
+
+        return InferenceClient(
+            config.INFERENCE_SOCKET,
+            fallback=imagenet_model.load_session if ort_available() else None,
+        )
+    if not ort_available():
+        return None
+    return imagenet_model.load_session()
+
+
+@st.cache_resource
+def load_label_map():
+    import imagenet_model
+
+    labels = load_imagenet_labels()
+    return imagenet_model.build_label_map(labels) if labels else None
+
 
+def imagenet_classify_batch(pil_images, topk: int = 5, batch_size: int = None):
+    # Yields lists of (top-k results, featured matches), one per batch.
+    # Stops early when the model is unavailable; the pages report that the
+    # same way as a missing model.
+    import imagenet_model
+    from inference_server import ModelUnavailable
 
-def download_file(url: str, path: Path):
-    if path.exists() and path.stat().st_size > 0:
+    try:
+        yield from imagenet_model.classify_batch(
+            load_onnx_session(), load_imagenet_labels(), pil_images, topk, batch_size,
+            label_map=load_label_map(),
+        )
+    except ModelUnavailable:
         return
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    path.write_bytes(r.content)
+
+
+@metrics.timed("classify")
+def imagenet_identify(pil_image: "Image.Image", topk: int = 5):
+    for batch in imagenet_classify_batch([pil_image], topk=topk, batch_size=1):
+        return batch[0]
+    return [], []
+
+
+def imagenet_classify(pil_image: "Image.Image", topk: int = 5):
+    return imagenet_identify(pil_image, topk)[0]
 
 
 @st.cache_resource
-def load_imagenet_labels():
+def load_embedding_session():
+    # Local only: the shared inference server returns class scores, not features.
+    import embeddings
+
     try:
-        download_file(IMAGENET_LABELS_URL, LABELS_PATH)
-        return LABELS_PATH.read_text(encoding="utf-8").splitlines()
+        return embeddings.load_embedding_session()
     except Exception:
-        return []
+        return None
 
 
 @st.cache_resource
-def load_onnx_session():
-    if not ORT_AVAILABLE:
-        return None
+def load_reference_index():
+    import embeddings
+
+    # Only an index built with the current model's features is usable.
     try:
-        download_file(MOBILENET_ONNX_URL, MODEL_PATH)
-        return ort.InferenceSession(str(MODEL_PATH), providers=["CPUExecutionProvider"])
+        model = embeddings.embedding_model_for().name
     except Exception:
         return None
+    return embeddings.open_reference_index(model=model)
 
 
-def preprocess_imagenet(pil_image: Image.Image) -> np.ndarray:
-    img = pil_image.convert("RGB").resize((224, 224))
-    arr = np.array(img).astype(np.float32) / 255.0
+def similar_featured(pil_image: "Image.Image", k: int = 5):
+    # [(animal_id, cosine similarity)], or None when embedding mode is unavailable.
+    import embeddings
 
-    mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
-    std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
-    arr = (arr - mean) / std
+    index = load_reference_index()
+    sess = load_embedding_session() if index is not None else None
+    if sess is None:
+        return None
+    vec = embeddings.embed_images(sess, [pil_image])[0]
+    return [(animal_id, s) for animal_id, s in index.search(vec, k) if animal_id in ANIMALS_DATA]
 
-    arr = np.transpose(arr, (2, 0, 1))  # CHW
-    arr = np.expand_dims(arr, axis=0)   # NCHW
-    return arr
+
+@st.cache_resource(show_spinner=False)
+def warm_identifier() -> bool:
+    # No spinner here (and none for the nested loaders): this runs in a
+    # background thread that has no page to draw on.
+    try:
+        load_label_map()
+        return load_onnx_session() is not None
+    except Exception:
+        return False  # the identifier page reports load problems itself
 
 
-def softmax(x):
-    x = x - np.max(x)
-    e = np.exp(x)
-    return e / np.sum(e)
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    # Once per process: import numpy/PIL/onnxruntime and load the model in
+    # the background, so the identifier is ready when the user gets there.
+    # The cache_resource locks make the page wait for, not repeat, the load.
+    thread = threading.Thread(target=warm_identifier, name="prewarm-identifier", daemon=True)
+    thread.start()
+    return thread
 
 
-def imagenet_classify(pil_image: Image.Image, topk: int = 5):
-    sess = load_onnx_session()
-    labels = load_imagenet_labels()
+@st.cache_resource
+def get_result_cache():
+    import imagenet_model
+    from result_cache import results_fingerprint
 
-    if sess is None or not labels:
-        return []
-
-    inp = preprocess_imagenet(pil_image)
-    input_name = sess.get_inputs()[0].name
-    out = sess.run(None, {input_name: inp})[0][0]
-    probs = softmax(out)
-
-    idxs = np.argsort(probs)[::-1][:topk]
-    results = []
-    for i in idxs:
-        label = labels[i] if i < len(labels) else f"class_{i}"
-        results.append((label, float(probs[i])))
-    return results
-
-
-def map_imagenet_to_featured(label: str):
-    l = normalize(label)
-    mappings = {
-        "snowy owl": "snowy_owl",
-        "great white shark": "great_white_shark",
-        "tiger": "tiger",
-        "lion": "lion",
-        "giant panda": "giant_panda",
-        "red panda": "red_panda",
-        "raccoon": "raccoon",
-        "monarch butterfly": "monarch_butterfly",
-        "crocodile": "nile_crocodile",
-        "komodo dragon": "komodo_dragon",
-        "ferret": "ferret",
-    }
-    for k, v in mappings.items():
-        if k in l:
-            return v
-    return None
+    try:
+        variant = imagenet_model.resolve_variant()
+    except Exception:
+        variant = None  # the identifier reports the model problem itself
+    fingerprint = results_fingerprint(
+        load_imagenet_labels(), load_label_map(), config.FEATURED_MATCH_MIN_PROB
+    )
+    cache = build_result_cache(variant, fingerprint)
+    metrics.add_collector("result_cache", cache.stats)
+    return cache
+
+
+def classify_upload(upload, topk: int = 5):
+    """Classify an ingested upload, returning (results, featured, from_cache)."""
+    cache = get_result_cache()
+    cached = cache.get(upload.digest, topk)
+    if cached is not None:
+        results, featured = cached
+        return results, known_matches(featured), True
+
+    # Undecoded, so the model can decode it at reduced scale
+    # (see image_preprocess.prepare_image).
+    results, featured = imagenet_identify(upload.open(), topk=topk)
+    if results:
+        cache.put(upload.digest, topk, (results, featured))
+    return results, known_matches(featured), False
+
+
+def known_matches(featured):
+    # Matches for animals no longer in the catalog (a store rebuilt since
+    # the result was cached) are skipped.
+    return [m for m in featured if m[0] in ANIMALS_DATA]
+
+
+def featured_match_label(featured) -> str:
+    """Label for the best known match in `featured`, or "" if there is none."""
+    featured = known_matches(featured)
+    if not featured:
+        return ""
+    featured_id, bucket, p = featured[0]
+    name = ANIMALS_DATA[featured_id]["name"]
+    if bucket:
+        name = f"{name} (related: {bucket})"
+    return f"{name} — {round(p * 100, 1)}%"
+
+
+def render_result_cache_stats():
+    stats = get_result_cache().stats()
+    st.caption(
+        f"Result cache: {stats['hits'] + stats['disk_hits']} hits "
+        f"({stats['disk_hits']} from disk) • {stats['misses']} misses • "
+        f"{stats['entries']} cached images"
+    )
 
 
 def render_imagenet_result_block(results):
@@ -237,6 +373,7 @@ def render_imagenet_result_block(results):
 # -----------------------------
 # UI Pages
 # -----------------------------
+@metrics.timed()
 def render_home():
     st.title("🐾 Global Animal Explorer")
 
@@ -261,6 +398,7 @@ This app includes:
         st.metric("No-key image ID", "Enabled")
 
 
+@metrics.timed()
 def render_featured_categories():
     st.title("🗂️ Featured Animal Categories")
     cols = st.columns(3)
@@ -280,6 +418,7 @@ def render_featured_categories():
         i += 1
 
 
+@metrics.timed()
 def render_featured_category_detail(category_id: str):
     info = ANIMAL_CATEGORIES.get(category_id)
     if not info:
@@ -294,13 +433,34 @@ def render_featured_category_detail(category_id: str):
         st.info("No featured animals in this category yet.")
         return
 
+    statuses, regions = FEATURED_STORE.facets(category_id)
+    c1, c2 = st.columns(2)
+    status = c1.selectbox(
+        "Conservation status",
+        [None, *sorted(statuses)],
+        format_func=lambda s: "Any" if s is None else f"{FEATURED_STORE.status_labels[s]} ({statuses[s]})",
+        key=f"status_{category_id}"
+    )
+    region = c2.selectbox(
+        "Region",
+        [None, *sorted(regions)],
+        format_func=lambda r: "Any" if r is None else f"{r.title()} ({regions[r]})",
+        key=f"region_{category_id}"
+    )
+    animals = FEATURED_STORE.filter(category_id, status, region)
+    if not animals:
+        st.info("No featured animals match these filters.")
+        return
+
     items = list(animals.items())
+    # Fetched in parallel on a cold cache, then served from disk.
+    images = featured_image_sources([a.get("image") for _, a in items], "thumb")
     cols = st.columns(3)
     for idx, (animal_id, a) in enumerate(items):
         with cols[idx % 3]:
             st.markdown(f"#### {a['name']}")
             if a.get("image"):
-                st.image(a["image"], use_container_width=True)
+                st.image(images[a["image"]], use_container_width=True)
             if a.get("scientific_name"):
                 st.caption(a["scientific_name"])
 
@@ -312,6 +472,7 @@ def render_featured_category_detail(category_id: str):
                 st.session_state["animal_id"] = animal_id
 
 
+@metrics.timed()
 def render_featured_animal_detail(animal_id: str):
     a = get_animal_detail(animal_id)
     if not a:
@@ -327,7 +488,8 @@ def render_featured_animal_detail(animal_id: str):
     col1, col2 = st.columns([1, 1], gap="large")
     with col1:
         if a.get("image"):
-            st.image(a["image"], use_container_width=True)
+            image = featured_image_sources([a["image"]], "detail")[a["image"]]
+            st.image(image, use_container_width=True)
         st.markdown(f"**Category:** {cat['name']}")
         st.markdown(f"**Conservation status:** {a.get('conservation_status', 'N/A')}")
         st.markdown(f"**Habitat:** {a.get('habitat', 'N/A')}")
@@ -349,29 +511,82 @@ def render_featured_animal_detail(animal_id: str):
             st.write(", ".join(safe_aliases))
 
 
+def open_featured_animal(animal_id: str):
+    st.session_state["page"] = "featured_animal"
+    st.session_state["animal_id"] = animal_id
+
+
+def live_text_input(label: str, **kwargs):
+    # Commit after a typing pause where Streamlit supports it; older
+    # versions commit on Enter or blur.
+    try:
+        return st.text_input(label, live=config.NAME_EXPLORER_LIVE, **kwargs)
+    except TypeError:
+        return st.text_input(label, **kwargs)
+
+
+def wait_for_typing_pause(query: str, slot) -> bool:
+    # GBIF is asked only once the query has stayed the same for
+    # GBIF_DEBOUNCE_MS. A newer keystroke reruns the script, which stops
+    # this run at its next Streamlit call, so a superseded query never
+    # reaches GBIF.
+    q = " ".join(query.lower().split())
+    if len(q) < config.GBIF_MIN_QUERY_CHARS:
+        slot.caption(
+            f"Type at least {config.GBIF_MIN_QUERY_CHARS} characters, "
+            "or press Search GBIF now."
+        )
+        return False
+    now = time.monotonic()
+    seen = st.session_state.get("gbif_query_seen")
+    if not seen or seen[0] != q:
+        seen = st.session_state["gbif_query_seen"] = (q, now)
+    left = config.GBIF_DEBOUNCE_MS / 1000 - (now - seen[1])
+    if left > 0:
+        slot.caption("Searching GBIF when you stop typing...")
+        time.sleep(left)
+        slot.empty()
+    return True
+
+
+@metrics.timed()
 def render_name_explorer():
     st.title("🔎 Animal Name Explorer")
     st.markdown(
         """
 Type an animal name and get an instant info card.
 
-1) Searches the **Featured** collection first.  
+1) Suggests **Featured** animals as you type and searches them first (typos are tolerated).  
 2) If no match is found, uses **GBIF** to validate global names.
 """
     )
 
-    query = st.text_input(
+    query = live_text_input(
         "Enter a common name or scientific name",
-        placeholder="Try: Snowy Owl, Bubo scandiacus, Ferret, Panthera tigris"
+        placeholder="Try: Snowy Owl, Bubo scandiacus, Ferret, Panthera tigris",
+        key="name_explorer_query",
     )
+    search_now = st.button("Search GBIF now")
 
     if not query:
         st.info("Type a name to begin.")
         return
 
+    suggestions = local_suggestions(query)
+    if suggestions:
+        st.caption("Featured suggestions")
+        cols = st.columns(min(len(suggestions), 4))
+        for i, animal_id in enumerate(suggestions):
+            cols[i % len(cols)].button(
+                ANIMALS_DATA[animal_id]["name"],
+                key=f"suggest_{animal_id}",
+                on_click=open_featured_animal,
+                args=(animal_id,),
+            )
+
     hits = local_name_search(query)
 
-    if hits:
+    if hits and not search_now:
         st.markdown("### Featured match")
         animal_id, _ = hits[0]
         render_featured_animal_detail(animal_id)
@@ -382,46 +597,101 @@ Type an animal name and get an instant info card.
                 st.write(f"- {a['name']} ({a.get('scientific_name','')})")
         return
 
+    fuzzy = local_fuzzy_search(query) if not search_now else []
+    if fuzzy:
+        animal_id, a, _, _ = fuzzy[0]
+        st.markdown("### Closest featured match")
+        st.caption(f"No exact match for \"{query}\". Showing the closest spelling: {a['name']}.")
+        render_featured_animal_detail(animal_id)
+
+        if len(fuzzy) > 1:
+            st.markdown("### Other close spellings")
+            for animal_id, a, _, dist in fuzzy[1:]:
+                st.write(f"- {a['name']} ({a.get('scientific_name','')}) • {dist} edit(s) away")
+        return
+
     st.markdown("### Global lookup (GBIF)")
-    try:
-        match = gbif_species_match(query)
-        usage_key = match.get("usageKey")
+    slot = st.empty()
+    if not search_now and not wait_for_typing_pause(query, slot):
+        return
+    # Redrawn as answers arrive: the match first, enrichment after.
+    for found in gbif_lookup_stream(query, limit=5):
+        with slot.container():
+            render_gbif_lookup(found)
+
+
+def render_gbif_lookup(found: dict):
+    match = found["match"] or {}
+    results = found["results"]
+    if found["pending"] and not match.get("usageKey") and not results:
+        st.caption("Searching GBIF...")
+        return
+    if not match and not results and found["errors"]:
+        st.error(f"GBIF lookup failed: {found['errors'][0]}")
+        return
+
+    usage_key = match.get("usageKey")
+    if usage_key:
         sci = match.get("scientificName") or match.get("canonicalName") or "Unknown"
         rank = match.get("rank", "N/A")
         kingdom = match.get("kingdom", "N/A")
         family = match.get("family", "")
         genus = match.get("genus", "")
 
-        if usage_key:
-            st.success(f"Best GBIF match: {sci}")
-            st.write(f"**Rank:** {rank}")
-            st.write(f"**Kingdom:** {kingdom}")
-            if family:
-                st.write(f"**Family:** {family}")
-            if genus:
-                st.write(f"**Genus:** {genus}")
-
-            st.markdown("### Quick natural history note")
-            blurb = (
-                f"This taxon is listed in the GBIF backbone as **{sci}**. "
-                f"It belongs to the **{kingdom}** kingdom"
-            )
-            if family:
-                blurb += f" and the **{family}** family"
-            blurb += "."
-            st.write(blurb)
-        else:
-            results = gbif_species_search(query, limit=5)
-            if not results:
-                st.warning("No global match found. Try another spelling.")
-            else:
-                for r in results:
-                    canonical = r.get("canonicalName") or r.get("scientificName", "Unknown")
-                    st.write(f"- **{canonical}** • {r.get('rank','N/A')} • {r.get('kingdom','N/A')}")
-    except Exception as e:
-        st.error(f"GBIF lookup failed: {e}")
-
-
+        st.success(f"Best GBIF match: {sci}")
+        st.write(f"**Rank:** {rank}")
+        st.write(f"**Kingdom:** {kingdom}")
+        if family:
+            st.write(f"**Family:** {family}")
+        if genus:
+            st.write(f"**Genus:** {genus}")
+
+        st.markdown("### Quick natural history note")
+        blurb = (
+            f"This taxon is listed in the GBIF backbone as **{sci}**. "
+            f"It belongs to the **{kingdom}** kingdom"
+        )
+        if family:
+            blurb += f" and the **{family}** family"
+        blurb += "."
+        st.write(blurb)
+        render_gbif_enrichment(found["enrichment"].get(usage_key, {}))
+    elif not results:
+        if not found["pending"]:
+            st.warning("No global match found. Try another spelling.")
+    else:
+        for r in results:
+            canonical = r.get("canonicalName") or r.get("scientificName", "Unknown")
+            st.write(f"- **{canonical}** • {r.get('rank','N/A')} • {r.get('kingdom','N/A')}")
+            extra = found["enrichment"].get(r.get("key"))
+            if extra and any(extra.values()):
+                with st.expander(f"More about {canonical}", expanded=False):
+                    render_gbif_enrichment(extra)
+
+    if found["pending"]:
+        st.caption("Loading more details from GBIF...")
+    elif found["timed_out"]:
+        st.caption("Some GBIF details did not arrive in time; rerun to try again.")
+
+
+def render_gbif_enrichment(extra: dict):
+    names = extra.get("vernacularNames") or []
+    english = [n["vernacularName"] for n in names if n.get("language") in ("eng", "en")]
+    if english or names:
+        st.write("**Common names:** " + ", ".join(
+            dict.fromkeys(english or [n["vernacularName"] for n in names[:5]])
+        ))
+    places = [d.get("locality") or d.get("country") for d in extra.get("distributions") or []]
+    if places:
+        st.write("**Distribution:** " + ", ".join(dict.fromkeys(p for p in places if p)))
+    media = extra.get("media") or []
+    if media:
+        m = media[0]
+        credit = " • ".join(x for x in (m.get("rightsHolder"), m.get("license")) if x)
+        st.image(m["identifier"], caption=credit or None, width=320)
+
+
+@metrics.timed()
 def render_global_encyclopedia():
     st.title("🌍 Global Animal Encyclopedia (GBIF)")
 
@@ -444,6 +714,8 @@ def render_global_encyclopedia():
             return
 
         st.markdown("### Search results")
+        if results[0].get("source") == "local":
+            st.caption("Answered from the local GBIF backbone copy.")
         for r in results:
             canonical = r.get("canonicalName") or r.get("scientificName", "Unknown")
             rank = r.get("rank", "N/A")
@@ -454,24 +726,37 @@ def render_global_encyclopedia():
         st.error(f"Global search failed: {e}")
 
 
+@metrics.timed()
 def render_identifier():
     st.title("🧠 Image Animal Identifier (No API Key Required)")
     st.markdown(
         """
-Upload an image and get an animal guess.
+Upload an image (or a whole folder of images) and get an animal guess.
 
 This page uses a lightweight onboard ImageNet classifier via ONNX.
 It always returns top candidates when model assets can be downloaded.
 """
     )
 
-    if not ORT_AVAILABLE:
+    if not config.INFERENCE_SOCKET and not ort_available():
         st.warning(
             "The lightweight image model is not available in this build. "
             "Your app should still load normally. "
             "If this persists, check Python version and requirements."
         )
 
+    mode = st.radio(
+        "Mode",
+        ["Single image", "Many images (batch)", "Similar featured animals"],
+        horizontal=True
+    )
+    if mode == "Many images (batch)":
+        render_batch_identifier()
+        return
+    if mode == "Similar featured animals":
+        render_similarity_identifier()
+        return
+
     uploaded = st.file_uploader(
         "Upload an image",
         type=list(config.ALLOWED_EXTENSIONS),
@@ -485,11 +770,16 @@ It always returns top candidates when model assets can be downloaded.
         st.error("Unsupported file type.")
         return
 
-    image = Image.open(uploaded)
-    st.image(image, caption="Uploaded image", use_container_width=True)
-
-    with st.spinner("Running no-key model..."):
-        results = imagenet_classify(image, topk=5)
+    try:
+        upload = ingest(uploaded)
+    except UploadError as e:
+        st.error(str(e))
+        return
+    with upload:
+        st.image(upload.preview(), caption="Uploaded image", use_container_width=True)
+        with st.spinner("Running no-key model..."):
+            results, featured, _ = classify_upload(upload, topk=5)
+    render_result_cache_stats()
 
     if not results:
         st.error(
@@ -501,11 +791,15 @@ It always returns top candidates when model assets can be downloaded.
     st.markdown("### Result")
     st.write(render_imagenet_result_block(results))
 
-    top_label = results[0][0]
-    featured_id = map_imagenet_to_featured(top_label)
-
-    if featured_id and featured_id in ANIMALS_DATA:
-        st.markdown("### Featured reference")
+    if featured:
+        featured_id, bucket, p = featured[0]
+        if bucket:
+            st.markdown("### Closest featured relative")
+            st.caption(
+                f"Model classes grouped as **{bucket}** add up to {round(p * 100, 1)}%."
+            )
+        else:
+            st.markdown("### Featured reference")
         render_featured_animal_detail(featured_id)
     else:
         st.caption(
@@ -514,6 +808,150 @@ It always returns top candidates when model assets can be downloaded.
         )
 
 
+def render_similarity_identifier():
+    st.caption(
+        "Compares the photo with the featured reference photos using the "
+        "model's image features, so it also works for animals that are not "
+        "among the model's 1000 classes."
+    )
+    if load_reference_index() is None:
+        st.info("No reference embeddings yet. Build them with `python embeddings.py build`.")
+        return
+
+    uploaded = st.file_uploader(
+        "Upload an image",
+        type=list(config.ALLOWED_EXTENSIONS),
+        accept_multiple_files=False,
+        key="similar_upload"
+    )
+    if not uploaded:
+        return
+    if not allowed_file(uploaded.name):
+        st.error("Unsupported file type.")
+        return
+
+    try:
+        upload = ingest(uploaded)
+    except UploadError as e:
+        st.error(str(e))
+        return
+    with upload:
+        st.image(upload.preview(), caption="Uploaded image", use_container_width=True)
+        with st.spinner("Comparing with featured photos..."):
+            similar = similar_featured(upload.open(), k=5)
+    if similar is None:
+        st.error("The embedding model could not be loaded (it needs the onnx package).")
+        return
+    if not similar:
+        st.warning("No featured reference photos to compare with.")
+        return
+
+    st.markdown("### Most similar featured animals")
+    images = featured_image_sources([ANIMALS_DATA[i].get("image") for i, _ in similar], "thumb")
+    cols = st.columns(len(similar))
+    for col, (animal_id, score) in zip(cols, similar):
+        a = ANIMALS_DATA[animal_id]
+        with col:
+            if a.get("image"):
+                st.image(images[a["image"]], use_container_width=True)
+            st.markdown(f"**{a['name']}**")
+            st.caption(f"Similarity {round(score * 100, 1)}%")
+
+    animal_id, score = similar[0]
+    if score >= config.EMBEDDING_MIN_SIMILARITY:
+        render_featured_animal_detail(animal_id)
+    else:
+        st.caption("No featured animal looks clearly alike; these are the nearest photos.")
+
+
+def render_batch_identifier():
+    uploads = st.file_uploader(
+        "Upload images (e.g. a camera-trap folder)",
+        type=list(config.ALLOWED_EXTENSIONS),
+        accept_multiple_files=True
+    )
+    batch_size = st.number_input(
+        "Images per model call",
+        min_value=1,
+        max_value=256,
+        value=config.IDENTIFIER_BATCH_SIZE
+    )
+
+    if not uploads:
+        return
+
+    from image_preprocess import prepare_image
+
+    cache = get_result_cache()
+    rows = []
+    pending = []
+    skipped = []
+
+    def add_row(name, identified):
+        res, featured = identified
+        label, p = res[0]
+        rows.append({
+            "file": name,
+            "top label": label,
+            "confidence": f"{round(p * 100, 1)}%",
+            "featured match": featured_match_label(featured),
+            "other candidates": ", ".join(lbl for lbl, _ in res[1:]),
+        })
+
+    def open_images():
+        # Cache hits are answered here; the rest are decoded lazily, one
+        # batch at a time, straight to model size.
+        for f in uploads:
+            if not allowed_file(f.name):
+                skipped.append(f"{f.name} (unsupported type)")
+                continue
+            try:
+                upload = ingest(f)
+            except UploadError as e:
+                skipped.append(str(e))
+                continue
+            with upload:
+                cached = cache.get(upload.digest, 5)
+                if cached is not None:
+                    add_row(f.name, cached)
+                    continue
+                try:
+                    image = prepare_image(upload.open())
+                    image.load()  # before the upload's buffer is released
+                except Exception:
+                    skipped.append(f"{f.name} (unreadable)")
+                    continue
+            pending.append((f.name, upload.digest))
+            yield image
+
+    progress = st.progress(0.0, text=f"0 / {len(uploads)} images")
+    table = st.empty()
+    classified = 0
+
+    for results in imagenet_classify_batch(open_images(), topk=5, batch_size=int(batch_size)):
+        for (name, digest), identified in zip(pending[classified:], results):
+            cache.put(digest, 5, identified)
+            add_row(name, identified)
+        classified += len(results)
+        done = len(rows) + len(skipped)
+        progress.progress(done / len(uploads), text=f"{done} / {len(uploads)} images")
+        table.dataframe(rows, use_container_width=True)
+
+    # Uploads that were all cache hits never reach the model loop.
+    done = len(rows) + len(skipped)
+    progress.progress(done / len(uploads), text=f"{done} / {len(uploads)} images")
+    table.dataframe(rows, use_container_width=True)
+    render_result_cache_stats()
+
+    if len(rows) + len(skipped) < len(uploads):
+        st.error(
+            "Model assets could not be loaded in this environment. "
+            "This may be temporary network or build compatibility issues."
+        )
+    if skipped:
+        st.warning("Skipped files:\n\n" + "\n".join(f"- {item}" for item in skipped))
+
+
 # -----------------------------
 # Navigation
 # -----------------------------
@@ -541,12 +979,42 @@ def sidebar_nav():
     st.sidebar.caption("All UI text is English-only.")
 
 
-def main():
-    ensure_state()
-    sidebar_nav()
-
-    page = st.session_state["page"]
-
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    if not config.METRICS_PORT:
+        return None
+    try:
+        return metrics.start_server(config.METRICS_HOST, config.METRICS_PORT)
+    except OSError:
+        return None  # another worker on this host already serves it
+
+
+def render_debug_sidebar():
+    with st.sidebar.expander("Timings", expanded=False):
+        rows = metrics.REGISTRY.summary()
+        if rows:
+            st.dataframe(
+                [{k: round(v, 1) if isinstance(v, float) else v for k, v in r.items()} for r in rows],
+                use_container_width=True,
+                hide_index=True,
+            )
+        else:
+            st.caption("Nothing timed yet.")
+        collected = metrics.REGISTRY.collect()
+        if collected:
+            st.json(collected, expanded=False)
+        if st.button("Profile next rerun", key="debug_profile"):
+            st.session_state["profile_next"] = True
+            st.rerun()
+        if st.button("Reset timings", key="debug_reset"):
+            metrics.REGISTRY.reset()
+    report = st.session_state.get("profile_report")
+    if report:
+        with st.sidebar.expander("Profile of the last profiled rerun"):
+            st.code(report, language=None)
+
+
+def render_page(page: str):
     if page == "home":
         render_home()
     elif page == "featured_categories":
@@ -565,5 +1033,23 @@ def main():
         render_home()
 
 
+def main():
+    ensure_state()
+    start_metrics_server()
+    sidebar_nav()
+
+    page = st.session_state["page"]
+    if config.DEBUG_SIDEBAR and st.session_state.pop("profile_next", False):
+        _, st.session_state["profile_report"] = metrics.profile_call(render_page, page)
+    else:
+        render_page(page)
+    if config.DEBUG_SIDEBAR:
+        render_debug_sidebar()
+
+    # After rendering, so it never delays the first page.
+    if config.PREWARM_IDENTIFIER:
+        start_prewarm()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,272 @@
+# Headless batch identification over image folders.
+#
+#   python batch_identify.py /archive/camera_traps --output tags.jsonl
+#   python batch_identify.py --list paths.txt --output tags.csv --workers 8
+#
+# Decode and resize run in a process pool; the parent normalizes each
+# batch into one tensor and runs MobileNet once per batch. Results are
+# appended and flushed after every batch, so an interrupted run resumes
+# where it stopped when started again with the same --output. Images that
+# failed to load are tried again on the next run.
+
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import config
+import imagenet_model
+from animal_data import ANIMALS_DATA
+from image_preprocess import INPUT_SIZE, normalize_into, prepare_image
+
+CSV_FIELDS = [
+    "path", "label", "probability",
+    "featured_id", "featured_name", "featured_bucket", "featured_probability",
+    "candidates", "error",
+]
+
+
+def iter_inputs(paths, list_file=None):
+    for p in paths:
+        p = Path(p)
+        if p.is_dir():
+            yield from (str(x) for x in imagenet_model.iter_image_paths(p))
+        else:
+            yield str(p)
+    if list_file:
+        fh = sys.stdin if list_file == "-" else open(list_file, encoding="utf-8")
+        with fh:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def _load(path):
+    # Runs in a worker: returns model-sized uint8 pixels (4x smaller to ship
+    # back than float32) or the error text.
+    try:
+        with Image.open(path) as im:
+            return path, np.asarray(prepare_image(im)), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def _output_format(output: Path, fmt: str = None) -> str:
+    fmt = fmt or ("csv" if output.suffix.lower() == ".csv" else "jsonl")
+    if fmt not in ("csv", "jsonl"):
+        raise SystemExit(f"Unsupported format: {fmt}")
+    return fmt
+
+
+def _cut_partial_line(output: Path, chunk_size: int = 1 << 16):
+    # Scan back from the end for the last newline; only the tail is read,
+    # however large the file is.
+    with open(output, "rb+") as fh:
+        end = fh.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - chunk_size)
+            fh.seek(start)
+            nl = fh.read(pos - start).rfind(b"\n")
+            if nl >= 0:
+                pos = start + nl + 1
+                break
+            pos = start
+        if pos != end:
+            fh.truncate(pos)
+
+
+def load_checkpoint(output: Path, fmt: str) -> set:
+    """Return paths already written to `output`, read one line at a time.
+
+    A trailing partial line (from a killed run) is cut off so appending
+    continues on a clean line boundary. Paths recorded with an error are
+    not counted as done, so a rerun tries them again; a path's last row in
+    the file is its current result.
+    """
+    if not output.exists():
+        return set()
+    _cut_partial_line(output)
+
+    done = set()
+    with open(output, encoding="utf-8", newline="") as fh:
+        if fmt == "csv":
+            rows = csv.DictReader(fh)
+        else:
+            rows = _json_rows(fh)
+        for row in rows:
+            if row.get("error"):
+                done.discard(row["path"])
+            else:
+                done.add(row["path"])
+    return done
+
+
+def _json_rows(lines):
+    for line in lines:
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(row, dict) and "path" in row:
+            yield row
+
+
+class ResultWriter:
+    def __init__(self, output: Path, fmt: str):
+        new = not output.exists() or output.stat().st_size == 0
+        self.fmt = fmt
+        self._fh = open(output, "a", encoding="utf-8", newline="")
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._fh, fieldnames=CSV_FIELDS)
+            if new:
+                self._csv.writeheader()
+
+    def write(self, record: dict):
+        if self._csv is not None:
+            row = {k: record.get(k, "") for k in CSV_FIELDS}
+            row["candidates"] = json.dumps(record.get("candidates", []))
+            self._csv.writerow(row)
+        else:
+            self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def checkpoint(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    def close(self):
+        self.checkpoint()
+        self._fh.close()
+
+
+def _record(path, res, featured):
+    label, p = res[0]
+    record = {
+        "path": path,
+        "label": label,
+        "probability": round(p, 6),
+        "featured_id": "",
+        "featured_name": "",
+        "featured_bucket": "",
+        "featured_probability": "",
+        "candidates": [[lbl, round(q, 6)] for lbl, q in res],
+    }
+    if featured:
+        featured_id, bucket, fp = featured[0]
+        record.update(
+            featured_id=featured_id,
+            featured_name=ANIMALS_DATA[featured_id]["name"],
+            featured_bucket=bucket or "",
+            featured_probability=round(fp, 6),
+        )
+    return record
+
+
+def run(inputs, output: Path, fmt=None, workers=None, batch_size=None, topk=5,
+        variant=None, profile=None, model=None, log=print):
+    fmt = _output_format(output, fmt)
+    batch_size = batch_size or config.IDENTIFIER_BATCH_SIZE
+    workers = workers or os.cpu_count() or 1
+
+    if model:
+        from onnx_session import create_session
+
+        sess = create_session(model, profile=profile)
+    else:
+        sess = imagenet_model.load_session(variant, profile=profile)
+    labels = imagenet_model.load_labels()
+    if sess is None or not labels:
+        raise SystemExit("Model assets could not be loaded.")
+    label_map = imagenet_model.build_label_map(labels)
+
+    done = load_checkpoint(output, fmt)
+    if done:
+        log(f"Resuming: {len(done)} images already in {output}")
+    todo = (p for p in inputs if p not in done)
+
+    writer = ResultWriter(output, fmt)
+    buf = np.empty((batch_size, 3, INPUT_SIZE[1], INPUT_SIZE[0]), dtype=np.float32)
+    # Keep only a bounded window of work in flight, so millions of paths
+    # never pile up as decoded frames in memory.
+    window = batch_size * workers * 4
+    count = errors = 0
+    start = time.perf_counter()
+
+    with mp.get_context("spawn").Pool(workers) as pool:
+        while True:
+            chunk = list(islice(todo, window))
+            if not chunk:
+                break
+            loaded = pool.imap(_load, chunk, chunksize=max(1, batch_size // workers))
+            while True:
+                batch = list(islice(loaded, batch_size))
+                if not batch:
+                    break
+                ok = []
+                for path, pixels, err in batch:
+                    if err:
+                        writer.write({"path": path, "error": err})
+                        errors += 1
+                    else:
+                        normalize_into(pixels, buf[len(ok)])
+                        ok.append(path)
+                if ok:
+                    logits = imagenet_model.run_onnx_batch(sess, buf[:len(ok)])
+                    probs = imagenet_model.softmax(logits)
+                    featured = imagenet_model.featured_matches(label_map, probs)
+                    for path, p, f in zip(ok, probs, featured):
+                        writer.write(_record(path, imagenet_model.topk_labels(p, labels, topk), f))
+                writer.checkpoint()
+                count += len(batch)
+            rate = count / max(time.perf_counter() - start, 1e-9)
+            log(f"{count} images ({errors} errors), {rate:.1f} images/s")
+
+    writer.close()
+    return count, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify image folders without the web UI.")
+    parser.add_argument("paths", nargs="*", help="image files or directories (walked recursively)")
+    parser.add_argument("--list", dest="list_file", help="file with one image path per line ('-' for stdin)")
+    parser.add_argument("--output", "-o", type=Path, required=True, help="results file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None)
+    parser.add_argument("--workers", type=int, default=None, help="decode processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--topk", type=int, default=5)
+    parser.add_argument("--variant", default=None, help="fp32 or int8 (default: MODEL_VARIANT)")
+    parser.add_argument("--profile", default=None, help="ONNX Runtime profile (see onnx_session.py)")
+    parser.add_argument("--model", type=Path, default=None, help="use this ONNX file instead of --variant")
+    args = parser.parse_args(argv)
+
+    if not args.paths and not args.list_file:
+        parser.error("give image paths/directories or --list")
+
+    count, errors = run(
+        iter_inputs(args.paths, args.list_file),
+        args.output,
+        fmt=args.format,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        topk=args.topk,
+        variant=args.variant,
+        profile=args.profile,
+        model=args.model,
+        log=lambda msg: print(msg, file=sys.stderr),
+    )
+    print(f"Done: {count} images, {errors} errors -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# Featured data as Python literals vs the memory-mapped animal store.
+#
+#   python -m benchmarks.animal_store --records 100000
+#
+# Generates a synthetic catalog (the real records, repeated with unique ids,
+# names and descriptions), then in fresh interpreters measures:
+#   literal  import of a generated module of _animal(...) calls, first
+#            (compiling) and second (from .pyc) time
+#   store    opening the .bin built by animal_store.build
+# For each: load time, peak RSS, mean lookup time for random ids, and a full
+# scan of one category.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = """
+import json, random, resource, sys, time
+sys.path[:0] = [{tmp!r}, {root!r}]
+from featured_animals import _animal  # noqa: F401  (literal module needs it)
+rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+t0 = time.perf_counter()
+if {mode!r} == "store":
+    from animal_store import AnimalStore
+    data = AnimalStore({store!r})
+else:
+    from synthetic_literal import ANIMALS as data
+load = time.perf_counter() - t0
+ids = random.Random(0).sample(range({n}), min(1000, {n}))
+t0 = time.perf_counter()
+for i in ids:
+    data[f"animal_{{i}}"]["name"]
+lookup = (time.perf_counter() - t0) / len(ids)
+t0 = time.perf_counter()
+birds = sum(1 for a in data.values() if a["category"] == "birds")
+scan = time.perf_counter() - t0
+print(json.dumps({{
+    "load_ms": load * 1000,
+    "rss_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss0) / 1024,
+    "lookup_us": lookup * 1e6,
+    "scan_ms": scan * 1000,
+}}))
+"""
+
+
+def synthetic_animals(n: int):
+    """Yield n (animal_id, record) pairs derived from the real featured records."""
+    from featured_animals import ANIMALS
+
+    base = list(ANIMALS.values())
+    for i in range(n):
+        a = dict(base[i % len(base)])
+        a["name"] = f"{a['name']} {i}"
+        a["description"] = f"{a['description']} (record {i})"
+        a["aliases"] = [f"{a['name'].lower()}", *a["aliases"][1:]]
+        yield f"animal_{i}", a
+
+
+def write_literal_module(path: Path, n: int):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("from featured_animals import _animal\n\nANIMALS = {\n")
+        for animal_id, a in synthetic_animals(n):
+            f.write(
+                f"    {animal_id!r}: _animal({a['name']!r}, {a['category']!r}, "
+                f"{a['scientific_name']!r}, {a['conservation_status']!r}, {a['image']!r}, "
+                f"{a['description']!r}, {a['habitat']!r}, {a['distribution']!r}, "
+                f"population={a['population']!r}, facts={a['facts']!r}, "
+                f"characteristics={a['characteristics']!r}, threats={a['threats']!r}, "
+                f"aliases={a['aliases']!r}),\n"
+            )
+        f.write("}\n")
+
+
+def _probe(mode: str, tmp: Path, store: Path, n: int) -> dict:
+    code = PROBE.format(tmp=str(tmp), root=str(ROOT), mode=mode, store=str(store), n=n)
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        raise SystemExit(f"{mode} probe failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout)
+
+
+def run(n: int, literal: bool = True):
+    sys.path.insert(0, str(ROOT))
+    from animal_store import build
+
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        store = tmp / "animals.bin"
+        t0 = time.perf_counter()
+        build(synthetic_animals(n), store)
+        build_s = time.perf_counter() - t0
+        if literal:
+            module = tmp / "synthetic_literal.py"
+            write_literal_module(module, n)
+            reports.append({"format": "literal (compile)", "file_mb": module.stat().st_size / 1e6,
+                            **_probe("literal", tmp, store, n)})
+            reports.append({"format": "literal (.pyc)", "file_mb": module.stat().st_size / 1e6,
+                            **_probe("literal", tmp, store, n)})
+        reports.append({"format": "store", "file_mb": store.stat().st_size / 1e6,
+                        "build_s": build_s, **_probe("store", tmp, store, n)})
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare featured data formats.")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--no-literal", action="store_true",
+                        help="skip the literal module (slow above ~1M records)")
+    parser.add_argument("--json", type=Path, default=None, help="also write results here")
+    args = parser.parse_args(argv)
+
+    reports = run(args.records, literal=not args.no_literal)
+    cols = ["format", "file_mb", "load_ms", "rss_mb", "lookup_us", "scan_ms", "build_s"]
+    print(f"records\t{args.records}")
+    print("\t".join(cols))
+    for r in reports:
+        print("\t".join(
+            f"{r[c]:.2f}" if isinstance(r.get(c), float) else str(r.get(c, "-")) for c in cols
+        ))
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
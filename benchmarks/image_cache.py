@@ -0,0 +1,148 @@
+# Featured photo cache against a local stub image server.
+#
+#   python -m benchmarks.image_cache --images 36
+#
+# The stub serves large JPEGs with ETags and honours If-None-Match. The run
+# measures a cold category page (download + resize), a warm one (disk
+# only), a revalidation pass (conditional GETs answered 304), and the bytes
+# a browser would receive for the grid: originals vs cached thumbnails.
+
+import argparse
+import hashlib
+import io
+import json
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def synthetic_jpeg(seed: int, size=(1600, 1067)) -> bytes:
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    # Smooth gradients plus noise: compresses like a photo, not like flat color.
+    y, x = np.mgrid[0:size[1], 0:size[0]]
+    base = np.stack([(x * (seed % 7 + 1)) % 256, (y * 3) % 256, ((x + y) // 4) % 256], -1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype("uint8")
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+class StubImageServer:
+    """Serves /img/<n>.jpg with strong ETags; counts requests and bytes sent."""
+
+    def __init__(self, images: int):
+        self.images = {f"/img/{i}.jpg": synthetic_jpeg(i) for i in range(images)}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                data = stub.images.get(self.path.split("?", 1)[0])
+                if data is None:
+                    self.send_error(404)
+                    return
+                etag = f'"{hashlib.md5(data).hexdigest()}"'
+                with stub._lock:
+                    stub.requests += 1
+                if self.headers.get("If-None-Match") == etag:
+                    with stub._lock:
+                        stub.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+                with stub._lock:
+                    stub.bytes_sent += len(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def urls(self):
+        host, port = self.server.server_address
+        return [f"http://{host}:{port}{p}?w=800" for p in self.images]
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run(images: int, workers: int) -> dict:
+    sys.path.insert(0, str(ROOT))
+    from image_cache import ImageCache
+
+    stub = StubImageServer(images)
+    urls = stub.urls
+    report = {"images": images, "original_kb": sum(map(len, stub.images.values())) / 1024}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ImageCache(tmp, revalidate_after=3600)
+
+            t0 = time.perf_counter()
+            paths = cache.prefetch(urls, "thumb", workers=workers)
+            report["cold_ms"] = (time.perf_counter() - t0) * 1000
+            if any(p is None for p in paths.values()):
+                raise SystemExit(f"fetch failed: {cache.stats()}")
+            report["thumb_kb"] = sum(p.stat().st_size for p in paths.values()) / 1024
+            report["detail_kb"] = sum(
+                cache.get(u, "detail").stat().st_size for u in urls
+            ) / 1024
+
+            t0 = time.perf_counter()
+            cache.prefetch(urls, "thumb", workers=workers)
+            report["warm_ms"] = (time.perf_counter() - t0) * 1000
+            report["stub_requests_after_warm"] = stub.requests
+
+            # Everything is due for revalidation now: conditional GETs only.
+            cache.revalidate_after = 0
+            cache.prefetch(urls, "thumb", workers=workers)
+            deadline = time.time() + 30
+            while cache.stats()["not_modified"] < images and time.time() < deadline:
+                time.sleep(0.05)
+            report["revalidated_304"] = stub.not_modified
+            report["stub_bytes_sent_kb"] = stub.bytes_sent / 1024
+            report["cache_stats"] = cache.stats()
+    finally:
+        stub.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the featured photo cache.")
+    parser.add_argument("--images", type=int, default=36, help="cards on the page")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--json", type=Path, default=None, help="also write results here")
+    args = parser.parse_args(argv)
+
+    report = run(args.images, args.workers)
+    for k, v in report.items():
+        print(f"{k}\t{v:.1f}" if isinstance(v, float) else f"{k}\t{v}")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    ok = (report["revalidated_304"] == args.images
+          and report["stub_requests_after_warm"] == args.images)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# Load test for the shared inference server.
+#
+#   python -m benchmarks.inference_loadtest --clients 8 --requests 50
+#   python -m benchmarks.inference_loadtest --mode local --clients 8
+#   python -m benchmarks.inference_loadtest --socket /tmp/animal-explorer.sock
+#
+# --mode server (default) starts an InferenceServer in this process (or
+# uses --socket if one is already running) and drives it from N client
+# processes. --mode local gives every client process its own session, the
+# way separate app workers behave without the server. Each request is one
+# synthetic preprocessed image, so the numbers isolate model + transport.
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _rss_mb():
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _load_local(model, variant, profile):
+    import imagenet_model
+    from onnx_session import create_session
+
+    if model:
+        return create_session(model, profile=profile)
+    return imagenet_model.load_session(variant, profile=profile)
+
+
+def _client(mode, socket_path, model, variant, profile, n_requests, ready, start, queue):
+    import imagenet_model
+    from image_preprocess import INPUT_SIZE
+
+    if mode == "server":
+        from inference_server import InferenceClient
+
+        sess = InferenceClient(socket_path)
+    else:
+        sess = _load_local(model, variant, profile)
+
+    rng = np.random.default_rng(os.getpid())
+    inp = rng.standard_normal((1, 3, INPUT_SIZE[1], INPUT_SIZE[0]), dtype=np.float32)
+    imagenet_model.predict_probs(sess, inp)  # warm up / connect
+    ready.put(os.getpid())
+    start.wait()
+
+    latencies = []
+    for _ in range(n_requests):
+        t0 = time.perf_counter()
+        imagenet_model.predict_probs(sess, inp)
+        latencies.append(time.perf_counter() - t0)
+    queue.put({"latencies": latencies, "rss_mb": _rss_mb()})
+
+
+def run(mode="server", clients=4, requests=50, socket_path=None, model=None, variant=None,
+        profile=None, max_batch=32, max_wait_ms=5.0):
+    server = None
+    tmpdir = None
+    if mode == "server" and not socket_path:
+        from inference_server import InferenceServer
+        import imagenet_model
+
+        sess = _load_local(model, variant, profile or "latency")
+        if sess is None:
+            raise SystemExit("Model assets could not be loaded.")
+        tmpdir = tempfile.TemporaryDirectory()
+        socket_path = str(Path(tmpdir.name) / "infer.sock")
+        server = InferenceServer(
+            socket_path,
+            lambda batch: imagenet_model.predict_probs(sess, batch),
+            max_batch=max_batch,
+            max_wait=max_wait_ms / 1000.0,
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    ready = ctx.Queue()
+    start = ctx.Event()
+    procs = [
+        ctx.Process(target=_client, args=(mode, socket_path, model, variant, profile,
+                                          requests, ready, start, queue))
+        for _ in range(clients)
+    ]
+    try:
+        for p in procs:
+            p.start()
+        # Every client has loaded/connected before the clock starts.
+        for _ in procs:
+            ready.get()
+        t0 = time.perf_counter()
+        start.set()
+        results = [queue.get() for _ in procs]
+        wall = time.perf_counter() - t0
+        for p in procs:
+            p.join()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server_stats = server.batcher.stats()
+            server.server_close()
+            tmpdir.cleanup()
+
+    latencies = [x for r in results for x in r["latencies"]]
+    report = {
+        "mode": mode,
+        "clients": clients,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "client_rss_mb": sum(r["rss_mb"] for r in results),
+    }
+    if server is not None:
+        report["server_rss_mb"] = _rss_mb()
+        report["mean_batch"] = server_stats["mean_batch"]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the inference server.")
+    parser.add_argument("--mode", choices=["server", "local"], default="server")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent client processes")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--socket", default=None, help="use an already running server")
+    parser.add_argument("--model", default=None, help="ONNX file instead of the MobileNet variant")
+    parser.add_argument("--variant", default=None)
+    parser.add_argument("--profile", default=None, help="ORT profile (see onnx_session.py)")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--json", type=Path, default=None, help="also write results here")
+    args = parser.parse_args(argv)
+
+    report = run(args.mode, args.clients, args.requests, args.socket, args.model, args.variant,
+                 args.profile, args.max_batch, args.max_wait_ms)
+    for k, v in report.items():
+        print(f"{k}\t{v:.3f}" if isinstance(v, float) else f"{k}\t{v}")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# Compare MobileNet variants (fp32 vs int8) on a local folder of images.
+#
+#   python -m benchmarks.model_variants photos/ [--variants fp32 int8]
+#
+# Images may be grouped in sub-folders named after an ImageNet label
+# (photos/tiger/*.jpg); then top-1/top-5 accuracy is reported as well.
+# Agreement is measured against the first variant: top-1 agreement means
+# the same top label, top-5 agreement means the reference top label is
+# among the candidate's top five.
+#
+# Each variant runs in its own process so peak RSS is not shared.
+
+import argparse
+import json
+import multiprocessing as mp
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import model_assets
+from imagenet_model import ASSET_NAMES, iter_image_paths
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _run_variant(variant, model_path, paths, profile, queue):
+    from PIL import Image
+
+    import imagenet_model
+    from onnx_session import create_session
+
+    t0 = time.perf_counter()
+    sess = create_session(model_path, profile=profile)
+    load_s = time.perf_counter() - t0
+    labels = imagenet_model.load_labels() or [f"class_{i}" for i in range(1000)]
+
+    top5 = []
+    latencies = []
+    for path in paths:
+        with Image.open(path) as im:
+            im.load()
+            t0 = time.perf_counter()
+            inp = imagenet_model.preprocess_imagenet(im)
+            probs = imagenet_model.softmax(imagenet_model.run_onnx_batch(sess, inp))[0]
+            latencies.append(time.perf_counter() - t0)
+        top5.append([label for label, _ in imagenet_model.topk_labels(probs, labels, 5)])
+
+    queue.put({
+        "variant": variant,
+        "model": str(model_path),
+        "model_mb": Path(model_path).stat().st_size / 1e6,
+        "load_s": load_s,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "top5": top5,
+    })
+
+
+def resolve_model(variant: str, models=None) -> Path:
+    # Strict: imagenet_model.model_path_for falls back to fp32 when there is
+    # no int8 file, which would report fp32 numbers under the int8 label.
+    if (models or {}).get(variant):
+        return Path(models[variant])
+    if variant not in ASSET_NAMES:
+        raise SystemExit(f"Unknown variant {variant!r}; expected one of {', '.join(ASSET_NAMES)}")
+    try:
+        return model_assets.ensure_asset(ASSET_NAMES[variant])
+    except model_assets.AssetError as e:
+        raise SystemExit(
+            f"No model file for {variant}: {e}\n"
+            f"Build it with quantize_model.py or pass --model {variant}=PATH."
+        )
+
+
+def run(folder, variants, models=None, profile=None, limit=None):
+    paths = list(iter_image_paths(folder))[:limit]
+    if not paths:
+        raise SystemExit(f"No images found in {folder}")
+    model_paths = {v: resolve_model(v, models) for v in variants}
+    truth = [p.parent.name.replace("_", " ").lower() if p.parent != Path(folder) else None
+             for p in paths]
+
+    ctx = mp.get_context("spawn")
+    reports = []
+    for variant in variants:
+        queue = ctx.Queue()
+        proc = ctx.Process(
+            target=_run_variant,
+            args=(variant, model_paths[variant], paths, profile, queue),
+        )
+        proc.start()
+        reports.append(queue.get())
+        proc.join()
+
+    ref = reports[0]["top5"]
+    for r in reports:
+        preds = r.pop("top5")
+        n = len(preds)
+        r["images"] = n
+        r["top1_agreement"] = sum(p[0] == q[0] for p, q in zip(preds, ref)) / n
+        r["top5_agreement"] = sum(q[0] in p for p, q in zip(preds, ref)) / n
+        labeled = [(p, t) for p, t in zip(preds, truth) if t]
+        if labeled:
+            r["top1_accuracy"] = sum(p[0].lower() == t for p, t in labeled) / len(labeled)
+            r["top5_accuracy"] = sum(t in (x.lower() for x in p) for p, t in labeled) / len(labeled)
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare MobileNet variants.")
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--variants", nargs="+", default=["fp32", "int8"])
+    parser.add_argument("--model", action="append", default=[], metavar="VARIANT=PATH",
+                        help="use a specific model file for a variant")
+    parser.add_argument("--profile", default=None, help="ORT profile (see onnx_session.py)")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--json", type=Path, default=None, help="also write results here")
+    args = parser.parse_args(argv)
+
+    models = dict(m.split("=", 1) for m in args.model)
+    reports = run(args.folder, args.variants, models, args.profile, args.limit)
+
+    cols = ["variant", "images", "model_mb", "load_s", "p50_ms", "p99_ms", "peak_rss_mb",
+            "top1_agreement", "top5_agreement", "top1_accuracy", "top5_accuracy"]
+    print("\t".join(cols))
+    for r in reports:
+        print("\t".join(
+            f"{r[c]:.3f}" if isinstance(r.get(c), float) else str(r.get(c, "-")) for c in cols
+        ))
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# Cold-start budget for the Streamlit app.
+#
+#   python -m benchmarks.startup                 # Home page, default budget
+#   python -m benchmarks.startup --page featured_categories --budget-ms 500
+#   python -m benchmarks.startup --json startup.json            # save a baseline
+#   python -m benchmarks.startup --baseline startup.json --tolerance 0.5
+#
+# Each run is a fresh interpreter started with `-X importtime`. Streamlit
+# itself is imported first and not counted; the clock covers the first
+# render of app.py (module imports + page) via streamlit.testing's AppTest.
+# Exits with status 1 when the median render time is over budget or when
+# a heavy module (numpy, PIL, onnxruntime, requests) is imported by a page
+# that should not need it. With --baseline, render_ms and import_ms are
+# also compared with a saved --json run, as in benchmarks.suite.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("numpy", "PIL", "onnxruntime", "requests")
+# Pages that must render without any of HEAVY_MODULES.
+LIGHT_PAGES = ("home", "featured_categories", "name_explorer")
+MARKER = "startup-probe: render"
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+print({marker!r}, file=sys.stderr, flush=True)
+t0 = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.session_state["page"] = {page!r}
+at.run()
+render = time.perf_counter() - t0
+print(json.dumps({{
+    "render_s": render,
+    "errors": [str(e.value) for e in at.exception],
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def parse_importtime(stderr: str, marker: str = MARKER):
+    """Top-level [(module, cumulative_us)] imported after `marker`."""
+    lines = stderr.splitlines()
+    if marker in lines:
+        lines = lines[lines.index(marker) + 1:]
+    out = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue  # header line or nested import
+        out.append((name.strip(), int(cumulative)))
+    return out
+
+
+def probe(page: str = "home"):
+    code = PROBE.format(root=str(ROOT), marker=MARKER, app=str(ROOT / "app.py"),
+                        page=page, heavy=HEAVY_MODULES)
+    env = dict(os.environ, PREWARM_IDENTIFIER="0")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, cwd=ROOT, env=env)
+    if proc.returncode != 0:
+        raise SystemExit(f"probe failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def run(page: str = "home", repeat: int = 3):
+    runs = [probe(page) for _ in range(repeat)]
+    imports = sorted(runs[-1]["imports"], key=lambda x: -x[1])
+    return {
+        "page": page,
+        "samples": repeat,
+        "render_ms": statistics.median(r["render_s"] for r in runs) * 1000,
+        "import_ms": sum(us for _, us in imports) / 1000,
+        "heavy_modules": runs[-1]["heavy"],
+        "errors": runs[-1]["errors"],
+        "slowest_imports": [(name, us / 1000) for name, us in imports[:10]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the app's time to first render.")
+    parser.add_argument("--page", default="home", help="session_state page to render")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=500.0,
+                        help="fail when the median first render is slower")
+    parser.add_argument("--json", type=Path, default=None, help="also write results here")
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="compare with a run saved by --json")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown as a fraction (0.5 = 50%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args.page, args.repeat)
+    # Same layout as benchmarks.suite, so its compare() applies; one file
+    # can hold several pages.
+    results = {"results": {args.page: report}}
+    print(f"page\t{report['page']}")
+    print(f"render_ms\t{report['render_ms']:.1f} (budget {args.budget_ms:.0f})")
+    print(f"import_ms\t{report['import_ms']:.1f}")
+    print(f"heavy_modules\t{', '.join(report['heavy_modules']) or '-'}")
+    for name, ms in report["slowest_imports"]:
+        print(f"  {ms:8.1f} ms  {name}")
+    if args.json:
+        saved = {"results": {}}
+        if args.json.exists():
+            saved = json.loads(args.json.read_text(encoding="utf-8"))
+        saved.setdefault("results", {})[args.page] = report
+        args.json.write_text(json.dumps(saved, indent=2), encoding="utf-8")
+
+    failures = []
+    if report["errors"]:
+        failures.append(f"page raised: {report['errors']}")
+    if report["render_ms"] > args.budget_ms:
+        failures.append(f"first render {report['render_ms']:.0f} ms > {args.budget_ms:.0f} ms")
+    if args.page in LIGHT_PAGES and report["heavy_modules"]:
+        failures.append(f"heavy imports on {args.page}: {', '.join(report['heavy_modules'])}")
+    if args.baseline:
+        from benchmarks.suite import compare
+
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if args.page not in baseline.get("results", {}):
+            failures.append(f"{args.baseline} has no run for page {args.page!r}")
+        for key, old, now, change in compare(results, baseline, args.tolerance):
+            failures.append(f"{key}: {old:.1f} -> {now:.1f} ms ({change:+.0%})")
+    for f in failures:
+        print(f"FAIL: {f}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,571 @@
+# Offline benchmark suite: search, fuzzy search, preprocessing,
+# post-processing, inference and the GBIF client.
+#
+#   python -m benchmarks.suite --json bench.json
+#   python -m benchmarks.suite --records 1000,10000 --only search     # quick
+#   python -m benchmarks.suite --baseline baseline.json --tolerance 0.5
+#
+# Everything is synthetic and local:
+#   search       NameIndex / PrefixIndex over 1k-1M generated ANIMALS_DATA records
+#                (benchmarks.animal_store.synthetic_animals)
+#   fuzzy        FuzzyNameIndex over the same records (up to 100k), queried
+#                with one or two typos per name
+#   preprocess   decode + resize + normalize of generated JPEGs at several
+#                resolutions (benchmarks.image_cache.synthetic_jpeg)
+#   postprocess  softmax + top-k over random logits
+#   inference    ORT session on --model, else a tiny generated model (needs
+#                the onnx package), else the cached MobileNet in MODEL_DIR
+#   gbif         GbifClient against a stub HTTP server with a fixed delay
+#
+# Each section runs in a fresh interpreter, so peak_rss_mb is that
+# section's own peak. Results are written as JSON; with --baseline, every
+# *_ms, *_per_s and peak_rss_mb value is compared with the stored run and
+# the exit status is 1 when any is worse by more than --tolerance.
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from itertools import cycle
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESOLUTIONS = ((640, 480), (1920, 1080), (4032, 3024))
+SECTIONS = ("search", "fuzzy", "preprocess", "postprocess", "inference", "gbif")
+# The fuzzy index holds every delete variant; past this it is slow to build.
+FUZZY_MAX_RECORDS = 100_000
+MIN_SAMPLES = 3
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _rss_mb():
+    # Peak RSS of this process image. VmHWM starts over at exec; ru_maxrss
+    # (KiB on Linux) is inherited from the parent, so it is only a fallback.
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(times, items: int = 1) -> dict:
+    """p50/p99/mean in ms per call, items per second and the sample count."""
+    total = sum(times)
+    return {
+        "p50_ms": _percentile(times, 50) * 1000,
+        "p99_ms": _percentile(times, 99) * 1000,
+        "mean_ms": total / len(times) * 1000,
+        "items_per_s": items * len(times) / total if total else 0.0,
+        "samples": len(times),
+    }
+
+
+def measure(fn, repeat: int, warmup: int = 1, items: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return summarize(times, items)
+
+
+# -----------------------------
+# Sections (run inside the child)
+# -----------------------------
+def bench_search(records: int, repeat: int) -> dict:
+    import random
+
+    from benchmarks.animal_store import synthetic_animals
+    from search_index import TypeAhead, build_name_index, build_prefix_index
+
+    animals = dict(synthetic_animals(records))
+    # Builds are repeated (except at 1M+, where one takes most of a minute);
+    # compare() ignores timings with fewer than MIN_SAMPLES samples.
+    builds = 3 if records < 1_000_000 else 1
+    built = {}
+    build = measure(lambda: built.update(index=build_name_index(animals)), builds, warmup=0)
+    index = built["index"]
+    prefix_build = measure(lambda: built.update(prefix=build_prefix_index(index)), builds,
+                           warmup=0)
+    prefix = built["prefix"]
+
+    rng = random.Random(0)
+    names = [a["name"] for a in rng.sample(list(animals.values()), min(200, records))]
+    queries = (
+        names[:50]                                      # exact
+        + [n[:3] for n in names[50:100]]                # short prefix
+        + [n.split()[-1] for n in names[100:150]]       # a word inside the name
+        + ["zzqx", "no such animal"] * 25               # misses
+    )
+    next_query = cycle(queries).__next__
+    out = {"records": records, "build": build, "prefix_build": prefix_build}
+    out["name_search"] = measure(lambda: index.search(next_query()), repeat)
+
+    # One sample per keystroke: each name typed one character at a time.
+    typed = [[n[:i] for i in range(1, min(len(n), 8) + 1)] for n in names[:50]]
+    times = []
+    while len(times) < repeat:
+        for keystrokes in typed:
+            ta = TypeAhead(prefix)
+            for q in keystrokes:
+                t0 = time.perf_counter()
+                ta.suggest(q)
+                times.append(time.perf_counter() - t0)
+    out["typeahead"] = summarize(times)
+    return out
+
+
+def _typo(rng, name: str, edits: int) -> str:
+    chars = list(name)
+    for _ in range(edits):
+        i = rng.randrange(len(chars))
+        op = rng.choice("dsit") if len(chars) > 3 else "i"
+        if op == "d":
+            del chars[i]
+        elif op == "s":
+            chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+        elif op == "i":
+            chars.insert(i, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+        elif i + 1 < len(chars):
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+def bench_fuzzy(records: int, repeat: int) -> dict:
+    import random
+
+    from benchmarks.animal_store import synthetic_animals
+    from search_index import build_fuzzy_index, build_name_index
+
+    animals = dict(synthetic_animals(records))
+    index = build_name_index(animals)
+    builds = 3 if records < FUZZY_MAX_RECORDS else 1
+    built = {}
+    build = measure(lambda: built.update(fuzzy=build_fuzzy_index(index)), builds, warmup=0)
+    fuzzy = built["fuzzy"]
+
+    rng = random.Random(0)
+    names = [a["name"] for a in rng.sample(list(animals.values()), min(200, records))]
+    queries = (
+        [_typo(rng, n, 1) for n in names[:80]]
+        + [_typo(rng, n, 2) for n in names[80:160]]
+        + ["zzqx", "no such animal"] * 20               # misses
+    )
+    next_query = cycle(queries).__next__
+    return {"records": records, "build": build,
+            "lookup": measure(lambda: fuzzy.lookup(next_query(), limit=5), repeat)}
+
+
+def bench_preprocess(corpus: Path, repeat: int) -> dict:
+    import io
+
+    from PIL import Image
+
+    from image_preprocess import preprocess_batch
+
+    out = {}
+    for w, h in RESOLUTIONS:
+        blobs = [p.read_bytes() for p in sorted(corpus.glob(f"{w}x{h}_*.jpg"))]
+        next_blob = cycle(blobs).__next__
+        # What the identifier does: lazy open, draft decode, resize, normalize.
+        out[f"{w}x{h}"] = measure(
+            lambda: preprocess_batch([Image.open(io.BytesIO(next_blob()))]), repeat
+        )
+        out[f"{w}x{h}_batch8"] = measure(
+            lambda: preprocess_batch([Image.open(io.BytesIO(b)) for b in blobs[:8]]),
+            max(1, repeat // 8), items=min(8, len(blobs)),
+        )
+    return out
+
+
+def bench_postprocess(repeat: int) -> dict:
+    import numpy as np
+
+    from imagenet_model import softmax, topk_labels
+
+    rng = np.random.default_rng(0)
+    labels = [f"class {i}" for i in range(1000)]
+    out = {}
+    for batch in (1, 32):
+        logits = rng.standard_normal((batch, 1000), dtype=np.float32)
+
+        def run():
+            for row in softmax(logits):
+                topk_labels(row, labels, 5)
+
+        out[f"batch{batch}"] = measure(run, repeat, items=batch)
+    return out
+
+
+def tiny_model(path: Path) -> Path:
+    """A 5-node MobileNet stand-in (same input/output shapes); needs `onnx`."""
+    import numpy as np
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    inits = [
+        numpy_helper.from_array(rng.standard_normal((32, 3, 3, 3)).astype(np.float32), "W"),
+        numpy_helper.from_array(rng.standard_normal((32, 1000)).astype(np.float32), "G"),
+        numpy_helper.from_array(np.zeros(1000, np.float32), "B"),
+    ]
+    nodes = [
+        helper.make_node("Conv", ["input", "W"], ["c"], strides=[2, 2]),
+        helper.make_node("Relu", ["c"], ["r"]),
+        helper.make_node("GlobalAveragePool", ["r"], ["g"]),
+        helper.make_node("Flatten", ["g"], ["f"]),
+        helper.make_node("Gemm", ["f", "G", "B"], ["logits"]),
+    ]
+    graph = helper.make_graph(
+        nodes, "tiny_mobilenet",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["N", 3, 224, 224])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, ["N", 1000])],
+        inits,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return path
+
+
+def find_model(tmp: Path, model: str = None):
+    # (path, description) or (None, reason)
+    if model:
+        return Path(model), "given"
+    try:
+        return tiny_model(tmp / "tiny.onnx"), "tiny"
+    except ImportError:
+        pass
+    import model_assets
+
+    cached = model_assets.asset_path("mobilenet_v2")
+    if cached.exists():
+        return cached, "cached mobilenet_v2"
+    return None, "no --model, onnx not installed and no cached MobileNet"
+
+
+def bench_inference(model: Path, corpus: Path, repeat: int) -> dict:
+    import io
+
+    import numpy as np
+    from PIL import Image
+
+    import imagenet_model
+    from onnx_session import create_session
+
+    t0 = time.perf_counter()
+    sess = create_session(model)
+    out = {"session_ms": (time.perf_counter() - t0) * 1000}
+    rng = np.random.default_rng(0)
+    for batch in (1, 8):
+        inp = rng.standard_normal((batch, 3, 224, 224), dtype=np.float32)
+        out[f"batch{batch}"] = measure(
+            lambda: imagenet_model.run_onnx_batch(sess, inp), max(1, repeat // batch), items=batch
+        )
+
+    # End to end, as the batch identifier runs it.
+    labels = [f"class {i}" for i in range(1000)]
+    blobs = [p.read_bytes() for p in sorted(corpus.glob("640x480_*.jpg"))]
+
+    def classify():
+        images = (Image.open(io.BytesIO(b)) for b in blobs)
+        for _ in imagenet_model.classify_batch(sess, labels, images, 5, batch_size=8):
+            pass
+
+    out["classify_640x480"] = measure(classify, max(1, repeat // len(blobs)), items=len(blobs))
+    return out
+
+
+class StubGbifServer:
+    """Answers species/search, species/match and species/<key>/<part> after `delay` seconds."""
+
+    def __init__(self, delay: float):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.requests = 0
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with lock:
+                    stub.requests += 1
+                time.sleep(delay)
+                path = self.path.split("?", 1)[0]
+                if path.endswith("/species/search"):
+                    body = {"results": [{"key": 5219404 + i, "canonicalName": f"Panthera {i}"}
+                                        for i in range(10)]}
+                elif path.endswith("/species/match"):
+                    body = {"usageKey": 5219404, "scientificName": "Panthera tigris",
+                            "rank": "SPECIES", "matchType": "EXACT"}
+                else:
+                    body = {"results": [{"vernacularName": "Tiger", "language": "eng"}]}
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def close(self):
+        self.server.shutdown()
+
+
+def bench_gbif(delay_ms: float, repeat: int) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+
+    from disk_cache import open_cache
+    from gbif_client import GbifClient
+
+    stub = StubGbifServer(delay_ms / 1000)
+    out = {"stub_delay_ms": delay_ms}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Unthrottled, so the numbers are the client's own overhead + stub delay.
+            plain = GbifClient(base_url=stub.url, rate_limit=0)
+            n = iter(range(10 ** 9))
+            out["search_uncached"] = measure(
+                lambda: plain.species_search(f"tiger {next(n)}"), repeat
+            )
+
+            cached = GbifClient(base_url=stub.url, rate_limit=0,
+                                cache=open_cache(str(Path(tmp) / "gbif.sqlite"), ttl=3600))
+            cached.species_match("Panthera tigris")
+            out["match_cached"] = measure(lambda: cached.species_match("Panthera tigris"), repeat)
+
+            # 16 sessions asking the same question at once share one request.
+            before = stub.requests
+            with ThreadPoolExecutor(16) as ex:
+                t0 = time.perf_counter()
+                list(ex.map(lambda _: plain.species_search("same query"), range(16)))
+                out["burst16_wall_ms"] = (time.perf_counter() - t0) * 1000
+            out["burst16_upstream_requests"] = stub.requests - before
+            plain.close()
+            cached.close()
+    finally:
+        stub.close()
+    return out
+
+
+def run_child(section: str, args) -> dict:
+    sys.path.insert(0, str(ROOT))
+    rss0 = _rss_mb()
+    if section == "search":
+        out = bench_search(args.param, args.repeat)
+    elif section == "fuzzy":
+        out = bench_fuzzy(args.param, args.repeat)
+    elif section == "preprocess":
+        out = bench_preprocess(Path(args.corpus), args.repeat)
+    elif section == "postprocess":
+        out = bench_postprocess(args.repeat * 10)
+    elif section == "inference":
+        out = bench_inference(Path(args.model), Path(args.corpus), args.repeat)
+    elif section == "gbif":
+        out = bench_gbif(args.param, args.repeat)
+    else:
+        raise SystemExit(f"unknown section {section!r}")
+    out["peak_rss_mb"] = _rss_mb()
+    out["start_rss_mb"] = rss0
+    return out
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def write_corpus(folder: Path, per_resolution: int):
+    from benchmarks.image_cache import synthetic_jpeg
+
+    for w, h in RESOLUTIONS:
+        for i in range(per_resolution):
+            path = folder / f"{w}x{h}_{i}.jpg"
+            if not path.exists():
+                path.write_bytes(synthetic_jpeg(i, (w, h)))
+
+
+def _spawn(section: str, param, args, corpus: Path, model) -> dict:
+    cmd = [sys.executable, "-m", "benchmarks.suite", "--child", section,
+           "--repeat", str(args.repeat), "--corpus", str(corpus)]
+    if param is not None:
+        cmd += ["--param", str(param)]
+    if model:
+        cmd += ["--model", str(model)]
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _meta(args) -> dict:
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    for mod in ("numpy", "PIL", "onnxruntime"):
+        try:
+            meta[mod] = __import__(mod).__version__
+        except Exception:
+            meta[mod] = None
+    return meta
+
+
+def run(args) -> dict:
+    sys.path.insert(0, str(ROOT))
+    only = set(args.only.split(",")) if args.only else set(SECTIONS)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        corpus = Path(args.corpus) if args.corpus else tmp / "corpus"
+        corpus.mkdir(parents=True, exist_ok=True)
+        if only & {"preprocess", "inference"}:
+            write_corpus(corpus, args.images)
+
+        if "search" in only:
+            for n in args.records:
+                results[f"search_{n}"] = _spawn("search", n, args, corpus, None)
+        if "fuzzy" in only:
+            for n in args.records:
+                if n <= FUZZY_MAX_RECORDS:
+                    results[f"fuzzy_{n}"] = _spawn("fuzzy", n, args, corpus, None)
+        for section in ("preprocess", "postprocess"):
+            if section in only:
+                results[section] = _spawn(section, None, args, corpus, None)
+        if "inference" in only:
+            model, how = find_model(tmp, args.model)
+            if model is None:
+                results["inference"] = {"skipped": how}
+            else:
+                results["inference"] = _spawn("inference", None, args, corpus, model)
+                results["inference"]["model"] = how
+        if "gbif" in only:
+            results["gbif"] = _spawn("gbif", args.gbif_delay_ms, args, corpus, None)
+    return {"meta": _meta(args), "results": results}
+
+
+def _flatten(d: dict, prefix: str = ""):
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            yield from _flatten(v, f"{key}.")
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield key, v
+
+
+def compare(current: dict, baseline: dict, tolerance: float, floor_ms: float = 0.05):
+    """[(metric, baseline, current, change)] for values worse than tolerance allows.
+
+    *_ms and peak_rss_mb are lower-is-better, *_per_s higher-is-better;
+    other numbers (counts, settings) are not compared, and neither are the
+    p99/mean timings, which swing too much between runs on shared CI
+    machines to gate on, nor measurements with fewer than MIN_SAMPLES
+    samples. Timings below floor_ms in both runs are noise.
+    """
+    base = dict(_flatten(baseline.get("results", {})))
+    flat = dict(_flatten(current.get("results", {})))
+    worse = []
+    for key, now in flat.items():
+        old = base.get(key)
+        group, _, name = key.rpartition(".")
+        if not old or name in ("p99_ms", "mean_ms"):
+            continue
+        if flat.get(f"{group}.samples", MIN_SAMPLES) < MIN_SAMPLES:
+            continue  # a single build timing is too noisy to gate on
+        if name.endswith("_ms") or name == "peak_rss_mb":
+            if name.endswith("_ms") and max(old, now) < floor_ms:
+                continue
+            change = now / old - 1
+        elif name.endswith("_per_s"):
+            change = old / now - 1 if now else float("inf")
+        else:
+            continue
+        if change > tolerance:
+            worse.append((key, old, now, change))
+    return worse
+
+
+def _print(report: dict):
+    for key, v in _flatten(report["results"]):
+        print(f"{key}\t{v:.3f}" if isinstance(v, float) else f"{key}\t{v}")
+    for section, out in report["results"].items():
+        for note in ("error", "skipped"):
+            if note in out:
+                print(f"{section}\t{note}: {out[note]}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--only", default="", help=f"comma-separated subset of {','.join(SECTIONS)}")
+    parser.add_argument("--records", default="1000,10000,100000,1000000",
+                        help="synthetic ANIMALS_DATA sizes for the search section")
+    parser.add_argument("--images", type=int, default=8, help="images per resolution")
+    parser.add_argument("--repeat", type=int, default=200, help="timed calls per measurement")
+    parser.add_argument("--model", default=None, help="ONNX model for the inference section")
+    parser.add_argument("--corpus", default=None, help="keep generated images here between runs")
+    parser.add_argument("--gbif-delay-ms", type=float, default=20.0, help="stub server latency")
+    parser.add_argument("--json", type=Path, default=None, help="also write results here")
+    parser.add_argument("--baseline", type=Path, default=None, help="compare with this results file")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown as a fraction (0.5 = 50%%)")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--param", type=float, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        if args.child in ("search", "fuzzy"):
+            args.param = int(args.param)
+        print(json.dumps(run_child(args.child, args)))
+        return 0
+
+    args.records = [int(float(n)) for n in args.records.split(",") if n]
+    report = run(args)
+    _print(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    failed = [s for s, out in report["results"].items() if "error" in out]
+    if args.baseline:
+        worse = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")),
+                        args.tolerance)
+        for key, old, now, change in worse:
+            print(f"REGRESSION {key}: {old:.3f} -> {now:.3f} ({change:+.0%})", file=sys.stderr)
+        if worse:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
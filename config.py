@@ -1,5 +1,17 @@
 import os
 
+
+def _env_int(name: str):
+    value = os.getenv(name, "")
+    return int(value) if value else None
+
+
+def _env_bool(name: str, default=None):
+    value = os.getenv(name, "")
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 # Optional cloud vision (not required for this app to work)
 DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY", "")
 DASHSCOPE_BASE_URL = os.getenv(
@@ -8,6 +20,134 @@ DASHSCOPE_BASE_URL = os.getenv(
 )
 QWEN_MODEL = os.getenv("QWEN_MODEL", "qwen3-vl-plus")
 
+# Compiled featured collection (see animal_store.py); rebuilt from
+# featured_animals.py when missing or older than it, unless it was built
+# from a JSON Lines catalog.
+ANIMAL_STORE_PATH = os.getenv("ANIMAL_STORE_PATH", ".cache/featured_animals.bin")
+
+# Downloaded model assets (see model_assets.py / model_manifest.json)
+MODEL_DIR = os.getenv("MODEL_DIR", ".cache/models")
+# Assets without a SHA-256 in the manifest are refused unless this is set
+# (e.g. once, to download them before `python model_assets.py pin`).
+MODEL_ALLOW_UNPINNED = _env_bool("MODEL_ALLOW_UNPINNED", False)
+
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "temp_uploads")
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "bmp", "webp"}
-MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(16 * 1024 * 1024)))
+
+# Upload ingestion (see uploads.py)
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", "40000000"))
+UPLOAD_SPILL_BYTES = int(os.getenv("UPLOAD_SPILL_BYTES", str(4 * 1024 * 1024)))
+UPLOAD_STALE_S = int(os.getenv("UPLOAD_STALE_S", "3600"))
+UPLOAD_PREVIEW_SIDE = int(os.getenv("UPLOAD_PREVIEW_SIDE", "1024"))
+
+# GBIF HTTP client (see gbif_client.py)
+GBIF_API_URL = os.getenv("GBIF_API_URL", "https://api.gbif.org/v1")
+GBIF_TIMEOUT = float(os.getenv("GBIF_TIMEOUT", "15"))
+GBIF_MAX_RETRIES = int(os.getenv("GBIF_MAX_RETRIES", "3"))
+GBIF_BACKOFF = float(os.getenv("GBIF_BACKOFF", "0.5"))
+GBIF_POOL_SIZE = int(os.getenv("GBIF_POOL_SIZE", "10"))
+# Client-side token bucket for GBIF API calls, per process (0 disables).
+GBIF_RATE_LIMIT = float(os.getenv("GBIF_RATE_LIMIT", "10"))
+GBIF_RATE_BURST = int(os.getenv("GBIF_RATE_BURST", "20"))
+
+# Name Explorer fan-out (see gbif_lookup.py): match, search and enrichment of
+# the top hits run concurrently and are cut off after the deadline (seconds).
+GBIF_LOOKUP_WORKERS = int(os.getenv("GBIF_LOOKUP_WORKERS", str(GBIF_POOL_SIZE)))
+GBIF_LOOKUP_DEADLINE = float(os.getenv("GBIF_LOOKUP_DEADLINE", "8"))
+GBIF_ENRICH_TOP = int(os.getenv("GBIF_ENRICH_TOP", "3"))
+
+# Name Explorer type-ahead: the query box commits after NAME_EXPLORER_LIVE of
+# no typing (Streamlit duration string; needs a Streamlit with live inputs).
+# GBIF is only asked once the query has stayed the same for GBIF_DEBOUNCE_MS
+# and has at least GBIF_MIN_QUERY_CHARS characters, or on explicit submit.
+NAME_EXPLORER_LIVE = os.getenv("NAME_EXPLORER_LIVE", "250ms")
+GBIF_DEBOUNCE_MS = int(os.getenv("GBIF_DEBOUNCE_MS", "600"))
+GBIF_MIN_QUERY_CHARS = int(os.getenv("GBIF_MIN_QUERY_CHARS", "3"))
+
+# Optional persistent GBIF response cache (SQLite, shared across processes).
+# Leave GBIF_CACHE_PATH empty to disable.
+GBIF_CACHE_PATH = os.getenv("GBIF_CACHE_PATH", "")
+GBIF_CACHE_TTL = float(os.getenv("GBIF_CACHE_TTL", str(60 * 60)))
+GBIF_CACHE_STALE_TTL = float(os.getenv("GBIF_CACHE_STALE_TTL", str(24 * 60 * 60)))
+GBIF_CACHE_MAX_ENTRIES = int(os.getenv("GBIF_CACHE_MAX_ENTRIES", "50000"))
+GBIF_CACHE_MAX_MB = int(os.getenv("GBIF_CACHE_MAX_MB", "200"))
+
+# Local GBIF backbone taxonomy (see taxonomy_db.py). When this file exists,
+# GBIF searches and matches are answered from it first.
+TAXONOMY_DB_PATH = os.getenv("TAXONOMY_DB_PATH", "")
+
+# Featured photo cache (see image_cache.py): WebP variants of each image URL,
+# revalidated with a conditional GET after IMAGE_REVALIDATE_S. Leave
+# IMAGE_CACHE_DIR empty to show the original URLs instead.
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", ".cache/images")
+IMAGE_THUMB_WIDTH = int(os.getenv("IMAGE_THUMB_WIDTH", "400"))
+IMAGE_DETAIL_WIDTH = int(os.getenv("IMAGE_DETAIL_WIDTH", "800"))
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+IMAGE_REVALIDATE_S = float(os.getenv("IMAGE_REVALIDATE_S", str(24 * 60 * 60)))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "5"))
+IMAGE_RETRY_AFTER_S = float(os.getenv("IMAGE_RETRY_AFTER_S", "300"))
+# Serve cached WebP files directly (image_cache.py serve); IMAGE_PROXY_URL is
+# the address browsers use, http://localhost:<port> by default.
+IMAGE_PROXY_PORT = _env_int("IMAGE_PROXY_PORT")
+IMAGE_PROXY_HOST = os.getenv("IMAGE_PROXY_HOST", "127.0.0.1")
+IMAGE_PROXY_URL = os.getenv("IMAGE_PROXY_URL", "")
+
+# Visual similarity references (see embeddings.py). Above EMBEDDING_IVF_MIN
+# references the index is split into k-means lists and a query scores the
+# EMBEDDING_NPROBE closest lists only.
+EMBEDDING_INDEX_PATH = os.getenv("EMBEDDING_INDEX_PATH", ".cache/embeddings/featured")
+EMBEDDING_IVF_MIN = int(os.getenv("EMBEDDING_IVF_MIN", "100000"))
+EMBEDDING_NPROBE = int(os.getenv("EMBEDDING_NPROBE", "32"))
+EMBEDDING_MIN_SIMILARITY = float(os.getenv("EMBEDDING_MIN_SIMILARITY", "0.5"))
+
+# Image identifier: images per ONNX call in batch mode
+IDENTIFIER_BATCH_SIZE = int(os.getenv("IDENTIFIER_BATCH_SIZE", "16"))
+
+# Minimum summed probability before a featured animal is suggested
+# for an identified image (see label_map.py).
+FEATURED_MATCH_MIN_PROB = float(os.getenv("FEATURED_MATCH_MIN_PROB", "0.15"))
+
+# MobileNet variant: fp32 (default) or int8. The int8 file is downloaded from
+# MOBILENET_INT8_ONNX_URL when set (overriding model_manifest.json), or built
+# with `python quantize_model.py`.
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", "fp32")
+MOBILENET_INT8_ONNX_URL = os.getenv("MOBILENET_INT8_ONNX_URL", "")
+
+# ONNX Runtime session tuning (see onnx_session.py).
+# ORT_PROFILE picks a preset: default, latency or throughput.
+# The remaining variables override single preset values when set.
+ORT_PROFILE = os.getenv("ORT_PROFILE", "latency")
+ORT_INTRA_OP_THREADS = _env_int("ORT_INTRA_OP_THREADS")
+ORT_INTER_OP_THREADS = _env_int("ORT_INTER_OP_THREADS")
+ORT_EXECUTION_MODE = os.getenv("ORT_EXECUTION_MODE") or None  # sequential | parallel
+ORT_GRAPH_OPTIMIZATION = os.getenv("ORT_GRAPH_OPTIMIZATION") or None  # disable | basic | extended | all
+ORT_CPU_MEM_ARENA = _env_bool("ORT_CPU_MEM_ARENA")
+ORT_MEM_PATTERN = _env_bool("ORT_MEM_PATTERN")
+ORT_SAVE_OPTIMIZED = _env_bool("ORT_SAVE_OPTIMIZED", True)
+
+# Load the identifier model in a background thread after the first page
+# renders, so the Identifier page opens without waiting for it.
+PREWARM_IDENTIFIER = _env_bool("PREWARM_IDENTIFIER", True)
+
+# Per-stage latency histograms (see metrics.py). METRICS_PORT serves them in
+# Prometheus text format; DEBUG_SIDEBAR shows them (and a one-rerun
+# profiler) in the app sidebar.
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+METRICS_PORT = _env_int("METRICS_PORT")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+DEBUG_SIDEBAR = _env_bool("DEBUG_SIDEBAR", False)
+
+# Shared inference server (see inference_server.py). When INFERENCE_SOCKET
+# is set, the identifier sends batches to that Unix socket instead of
+# loading its own model; the max batch/wait values are server defaults.
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "")
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "32"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+
+# Identifier result cache, keyed by a BLAKE2 hash of the uploaded bytes.
+# RESULT_CACHE_PATH (optional) also persists results in SQLite.
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "")
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(30 * 24 * 60 * 60)))
+RESULT_CACHE_DISK_ENTRIES = int(os.getenv("RESULT_CACHE_DISK_ENTRIES", "100000"))
@@ -0,0 +1,201 @@
+# Persistent key/value cache on SQLite (WAL mode).
+# Safe to share between processes on one host: a redeploy starts warm and
+# worker replicas read each other's entries instead of refetching.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at);
+CREATE INDEX IF NOT EXISTS cache_stored ON cache (stored_at);
+"""
+
+# Expired entries and the size bounds are checked once every EVICT_EVERY
+# writes per process, so a busy cache may briefly hold that many extra
+# entries; a write never scans the whole table.
+EVICT_EVERY = 64
+
+
+def _norm_value(v):
+    if isinstance(v, str):
+        return " ".join(v.split()).lower()
+    return v
+
+
+def make_key(namespace: str, params=None) -> str:
+    # Case, surrounding and repeated whitespace, and parameter order do not
+    # change a GBIF answer, so they must not change the key either.
+    params = {k: _norm_value(v) for k, v in (params or {}).items()}
+    return f"{namespace}?{json.dumps(params, sort_keys=True, separators=(',', ':'))}"
+
+
+class DiskCache:
+    def __init__(
+        self,
+        path,
+        ttl: float = 3600,
+        stale_ttl: float = 0,
+        max_entries: int = 50_000,
+        max_bytes: int = 200 * 1024 * 1024,
+        evict_every: int = EVICT_EVERY,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        # Entries older than ttl but younger than ttl + stale_ttl are served
+        # immediately while a background refresh runs.
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_every = max(1, evict_every)
+        self._writes = 0
+
+        self._local = threading.local()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, field: str):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def get(self, key: str):
+        """Return (value, age_seconds), or None if missing or fully expired."""
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, stored_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, stored_at = row
+        age = now - stored_at
+        if age > self.ttl + self.stale_ttl:
+            return None
+        conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return value, age
+
+    def set(self, key: str, value):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, stored_at, accessed_at, size) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, value, now, now, len(value)),
+        )
+        with self._stats_lock:
+            # The first write after opening checks too, so a cache left over
+            # its bounds by an earlier run is trimmed right away.
+            due = self._writes % self.evict_every == 0
+            self._writes += 1
+        if due:
+            self._evict(now)
+
+    def _evict(self, now: float):
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM cache WHERE stored_at < ?", (now - self.ttl - self.stale_ttl,)
+        )
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # Least recently used first, until both bounds hold again.
+        drop = max(count - self.max_entries, 0)
+        excess = total - self.max_bytes
+        if excess > 0:
+            freed = 0
+            rows = conn.execute("SELECT size FROM cache ORDER BY accessed_at")
+            n = 0
+            for (size,) in rows:
+                if freed >= excess:
+                    break
+                freed += size
+                n += 1
+            rows.close()
+            drop = max(drop, n)
+        if drop:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (drop,),
+            )
+
+    def get_or_fetch(self, key: str, fetch):
+        found = self.get(key)
+        if found is not None:
+            value, age = found
+            if age <= self.ttl:
+                self._count("hits")
+            else:
+                self._count("stale_hits")
+                self._refresh_async(key, fetch)
+            return value
+
+        self._count("misses")
+        value = fetch()
+        self.set(key, value)
+        return value
+
+    def _refresh_async(self, key: str, fetch):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.set(key, fetch())
+            except Exception:
+                # Keep serving the stale copy; the next reader retries.
+                pass
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name="cache-refresh", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+            }
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+
+
+def open_cache(path, **kwargs):
+    # Empty path means "disabled", which keeps the backend opt-in.
+    if not path:
+        return None
+    return DiskCache(os.path.expanduser(path), **kwargs)
@@ -0,0 +1,377 @@
+# Visual similarity search over MobileNet embeddings.
+#
+#   python embeddings.py build                        # featured photos
+#   python embeddings.py build --folder refs/         # + refs/<animal_id>/*.jpg
+#   python embeddings.py query photo.jpg
+#
+# The classifier's last layer only knows the 1000 ImageNet classes. The
+# features it is fed (the penultimate layer) describe what a photo looks
+# like, so a featured animal that is not an ImageNet class (an axolotl, say)
+# can still be recognised by comparing them with reference photos.
+#
+# embedding_model_path() rewrites the ONNX graph (onnx package) so its only
+# output is the classifier's input tensor. References are L2-normalized and
+# stored as a float16 .npy matrix that is memory-mapped, with a JSON sidecar
+# of row ids. A query is one matrix-vector product (cosine similarity), in
+# row chunks so the float16 matrix is never upcast whole. Above
+# EMBEDDING_IVF_MIN references, rows are grouped by spherical k-means
+# centroids (IVF) and only the EMBEDDING_NPROBE closest groups are scored.
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+import config
+
+FORMAT_VERSION = 1
+SEARCH_CHUNK_ROWS = 16384
+
+# Nodes between the classifier and the graph output that do not change
+# which tensor holds the features.
+_PASS_THROUGH = {"Softmax", "LogSoftmax", "Identity", "Reshape", "Flatten", "Squeeze", "Add"}
+_CLASSIFIERS = {"Gemm", "MatMul", "Conv"}
+
+
+class EmbeddingError(Exception):
+    pass
+
+
+# -----------------------------
+# Model
+# -----------------------------
+def feature_tensor_name(model) -> str:
+    """Name of the tensor feeding the final classifier of an ONNX model."""
+    producers = {out: node for node in model.graph.node for out in node.output}
+    name = model.graph.output[0].name
+    for _ in range(len(model.graph.node)):
+        node = producers.get(name)
+        if node is None:
+            break
+        if node.op_type in _CLASSIFIERS:
+            return node.input[0]
+        if node.op_type not in _PASS_THROUGH:
+            break
+        name = node.input[0]
+    raise EmbeddingError("could not find the classifier layer in the model graph")
+
+
+def embedding_model_path(model_path) -> Path:
+    """Write (once) a copy of the model whose output is the feature tensor."""
+    model_path = Path(model_path)
+    out = model_path.with_suffix(".embed.onnx")
+    if out.exists() and out.stat().st_mtime >= model_path.stat().st_mtime:
+        return out
+    try:
+        import onnx
+    except ImportError as e:
+        raise EmbeddingError("embedding mode needs the onnx package (pip install onnx)") from e
+
+    model = onnx.load(str(model_path))
+    graph = model.graph
+    name = feature_tensor_name(model)
+    del graph.output[:]
+    graph.output.append(onnx.helper.make_tensor_value_info(name, onnx.TensorProto.FLOAT, None))
+
+    # Drop the classifier: keep only the nodes the feature tensor depends on.
+    producers = {out: i for i, node in enumerate(graph.node) for out in node.output}
+    needed, stack = set(), [name]
+    while stack:
+        i = producers.get(stack.pop())
+        if i is not None and i not in needed:
+            needed.add(i)
+            stack.extend(graph.node[i].input)
+    kept = [n for i, n in enumerate(graph.node) if i in needed]
+    used = {t for n in kept for t in n.input}
+    inits = [t for t in graph.initializer if t.name in used]
+    del graph.node[:]
+    graph.node.extend(kept)
+    del graph.initializer[:]
+    graph.initializer.extend(inits)
+    tmp = out.with_name(f"{out.name}.{os.getpid()}.tmp")
+    onnx.save(model, str(tmp))
+    os.replace(tmp, out)
+    return out
+
+
+def embedding_model_for(variant: str = None) -> Path:
+    import imagenet_model
+
+    return embedding_model_path(imagenet_model.model_path_for(variant))
+
+
+def load_embedding_session(variant: str = None, profile: str = None):
+    from onnx_session import create_session
+
+    return create_session(embedding_model_for(variant), profile=profile)
+
+
+def normalize_rows(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32).reshape(len(x), -1)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def embed_batch(sess, batch: np.ndarray) -> np.ndarray:
+    """(N, D) L2-normalized float32 features for a preprocessed batch."""
+    from imagenet_model import run_onnx_batch
+
+    return normalize_rows(run_onnx_batch(sess, batch))
+
+
+def embed_images(sess, pil_images, batch_size: int = None) -> np.ndarray:
+    from itertools import islice
+
+    from image_preprocess import preprocess_batch
+
+    batch_size = max(1, batch_size or config.IDENTIFIER_BATCH_SIZE)
+    it = iter(pil_images)
+    out = []
+    while True:
+        chunk = list(islice(it, batch_size))
+        if not chunk:
+            break
+        out.append(embed_batch(sess, preprocess_batch(chunk)))
+    return np.concatenate(out) if out else np.empty((0, 0), np.float32)
+
+
+def embed_references(sess, references, batch_size: int = None):
+    """(ids, vectors) for (id, PIL image) pairs, embedded batch by batch.
+
+    At most one batch of images is open at a time; each image is closed as
+    soon as it has been preprocessed.
+    """
+    from itertools import islice
+
+    from image_preprocess import preprocess_batch
+
+    batch_size = max(1, batch_size or config.IDENTIFIER_BATCH_SIZE)
+    it = iter(references)
+    ids, out = [], []
+    while True:
+        chunk = list(islice(it, batch_size))
+        if not chunk:
+            break
+        try:
+            batch = preprocess_batch(image for _, image in chunk)
+        finally:
+            for _, image in chunk:
+                image.close()
+        out.append(embed_batch(sess, batch))
+        ids.extend(animal_id for animal_id, _ in chunk)
+    return ids, np.concatenate(out) if out else np.empty((0, 0), np.float32)
+
+
+# -----------------------------
+# Reference index
+# -----------------------------
+def _spherical_kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    sample = x[rng.choice(len(x), size=min(len(x), max(k * 32, 10_000)), replace=False)]
+    sample = sample.astype(np.float32)
+    centroids = sample[rng.choice(len(sample), size=k, replace=False)]
+    for _ in range(iters):
+        assign = _assign(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=k)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = sample[rng.choice(len(sample), size=k)]  # reseeds empty lists
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), SEARCH_CHUNK_ROWS):
+        part = x[start:start + SEARCH_CHUNK_ROWS].astype(np.float32)
+        out[start:start + len(part)] = np.argmax(part @ centroids.T, axis=1)
+    return out
+
+
+def build_index(ids, vectors: np.ndarray, path, model: str = "", ivf_min: int = None) -> Path:
+    """Write ids + (N, D) vectors as <path>.npy (float16) and <path>.json."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ids = list(ids)
+    vectors = normalize_rows(vectors).astype(np.float16)
+    if len(ids) != len(vectors):
+        raise EmbeddingError("ids and vectors differ in length")
+    ivf_min = config.EMBEDDING_IVF_MIN if ivf_min is None else ivf_min
+
+    meta = {"version": FORMAT_VERSION, "model": model, "count": len(ids),
+            "dim": int(vectors.shape[1]) if len(vectors) else 0, "built_at": time.time()}
+    if len(ids) > ivf_min:
+        # Rows are stored grouped by list so each list is a contiguous slice.
+        nlist = int(2 * np.sqrt(len(ids)))
+        centroids = _spherical_kmeans(vectors, nlist)
+        assign = _assign(vectors, centroids)
+        order = np.argsort(assign, kind="stable")
+        vectors = vectors[order]
+        ids = [ids[i] for i in order]
+        meta["ivf_offsets"] = np.searchsorted(assign[order], np.arange(nlist + 1)).tolist()
+        np.save(path.with_suffix(".centroids.npy"), centroids.astype(np.float32))
+    meta["ids"] = ids
+
+    for suffix, write in ((".npy", lambda p: np.save(p, vectors)),
+                          (".json", lambda p: p.write_text(json.dumps(meta), encoding="utf-8"))):
+        final = path.with_suffix(suffix)
+        tmp = final.with_name(f"{final.stem}.{os.getpid()}.tmp{suffix}")
+        write(tmp)
+        os.replace(tmp, final)
+    return path
+
+
+class ReferenceIndex:
+    def __init__(self, path, nprobe: int = None, model: str = None):
+        # model: file name of the embedding model queries will come from;
+        # vectors from another model (or variant) are not comparable.
+        path = Path(path)
+        meta = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+        if meta.get("version") != FORMAT_VERSION:
+            raise EmbeddingError(f"{path} was built by another version; rebuild it")
+        if model is not None and meta.get("model") != model:
+            raise EmbeddingError(
+                f"{path} was built with {meta.get('model') or 'an unknown model'}, "
+                f"not {model}; rebuild it with `python embeddings.py build`"
+            )
+        self.model = meta.get("model", "")
+        self.ids = meta["ids"]
+        self.matrix = np.load(path.with_suffix(".npy"), mmap_mode="r")
+        self.offsets = meta.get("ivf_offsets")
+        self.centroids = np.load(path.with_suffix(".centroids.npy")) if self.offsets else None
+        self.nprobe = config.EMBEDDING_NPROBE if nprobe is None else nprobe
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+    def _ranges(self, q: np.ndarray):
+        if self.centroids is None:
+            return [(0, len(self.ids))]
+        probe = np.argsort(self.centroids @ q)[::-1][:self.nprobe]
+        return [(self.offsets[i], self.offsets[i + 1]) for i in sorted(probe)]
+
+    def search(self, query: np.ndarray, k: int = 5):
+        """[(id, cosine similarity)], best first; each id appears once."""
+        q = normalize_rows(query.reshape(1, -1))[0]
+        if q.shape[0] != self.dim:
+            raise EmbeddingError(f"query has {q.shape[0]} dims, index has {self.dim}")
+        rows, scores = [], []
+        for lo, hi in self._ranges(q):
+            for start in range(lo, hi, SEARCH_CHUNK_ROWS):
+                stop = min(hi, start + SEARCH_CHUNK_ROWS)
+                s = self.matrix[start:stop].astype(np.float32) @ q
+                # Several rows may share an id; keep enough to fill k ids.
+                keep = min(len(s), k * 4)
+                top = np.argpartition(-s, keep - 1)[:keep] if keep < len(s) else np.arange(len(s))
+                rows.append(top + start)
+                scores.append(s[top])
+        if not rows:
+            return []
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        best = {}
+        for i in np.argsort(-scores):
+            animal_id = self.ids[rows[i]]
+            if animal_id not in best:
+                best[animal_id] = float(scores[i])
+                if len(best) == k:
+                    break
+        return list(best.items())
+
+
+def open_reference_index(path=None, model: str = None):
+    """The reference index at EMBEDDING_INDEX_PATH, or None if not built
+    (or built with a model other than `model`)."""
+    path = Path(path or config.EMBEDDING_INDEX_PATH)
+    if not path.with_suffix(".json").exists():
+        return None
+    try:
+        return ReferenceIndex(path, model=model)
+    except (OSError, ValueError, EmbeddingError):
+        return None
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _featured_references(folder=None):
+    """Yield (animal_id, PIL image) for featured photos and optional extras."""
+    from PIL import Image
+
+    from animal_data import ANIMALS_DATA
+    from image_cache import ImageCache, get_image_cache
+    from imagenet_model import iter_image_paths
+
+    cache = get_image_cache() or ImageCache(".cache/images")
+    urls = {animal_id: a["image"] for animal_id, a in ANIMALS_DATA.items() if a.get("image")}
+    paths = cache.prefetch(urls.values(), "detail")
+    for animal_id, url in urls.items():
+        if paths.get(url) is None:
+            print(f"  no photo for {animal_id}: {url}", file=sys.stderr)
+            continue
+        yield animal_id, Image.open(paths[url])
+    if folder:
+        for path in iter_image_paths(folder):
+            animal_id = path.relative_to(folder).parts[0]
+            if animal_id not in ANIMALS_DATA:
+                print(f"  skipping {path}: unknown animal id {animal_id!r}", file=sys.stderr)
+                continue
+            yield animal_id, Image.open(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query featured image embeddings.")
+    parser.add_argument("--index", type=Path, default=Path(config.EMBEDDING_INDEX_PATH))
+    parser.add_argument("--variant", default=None, help="fp32 or int8 (default: MODEL_VARIANT)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="embed the featured photos")
+    b.add_argument("--folder", type=Path, default=None,
+                   help="extra reference photos in <folder>/<animal_id>/")
+    q = sub.add_parser("query", help="most similar featured animals for a photo")
+    q.add_argument("image", type=Path)
+    q.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    from onnx_session import create_session
+
+    model_file = embedding_model_for(args.variant)
+    sess = create_session(model_file)
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        ids, vectors = embed_references(sess, _featured_references(args.folder))
+        if not ids:
+            print("No reference photos could be loaded.", file=sys.stderr)
+            return 1
+        build_index(ids, vectors, args.index, model=model_file.name)
+        print(f"Embedded {len(ids)} photos ({vectors.shape[1]} dims) in "
+              f"{time.perf_counter() - t0:.1f}s -> {args.index.with_suffix('.npy')}")
+        return 0
+
+    from PIL import Image
+
+    if not args.index.with_suffix(".json").exists():
+        print(f"No index at {args.index}; run `python embeddings.py build` first.", file=sys.stderr)
+        return 1
+    try:
+        index = ReferenceIndex(args.index, model=model_file.name)
+    except EmbeddingError as e:
+        print(e, file=sys.stderr)
+        return 1
+    with Image.open(args.image) as im:
+        vec = embed_images(sess, [im])[0]
+    for animal_id, score in index.search(vec, k=args.k):
+        print(f"{score:.3f}\t{animal_id}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# Indexed, read-only view of the featured collection.
+#
+# Secondary indexes (category, conservation status, region) are built once
+# at import. Lookups return MappingProxyType views over precomputed dicts,
+# so a category page costs the same with 15 or 50,000 featured animals and
+# callers cannot mutate the shared data by accident. Compound filters start
+# from the smallest matching index and are memoized; the collection never
+# changes after import.
+
+import re
+from collections import Counter
+from types import MappingProxyType
+
+EMPTY = MappingProxyType({})
+
+IUCN_CODES = {
+    "least concern": "LC",
+    "near threatened": "NT",
+    "vulnerable": "VU",
+    "endangered": "EN",
+    "critically endangered": "CR",
+    "extinct in the wild": "EW",
+    "extinct": "EX",
+    "data deficient": "DD",
+    "not evaluated": "NE",
+}
+
+_CODE_RE = re.compile(r"\(([A-Za-z]{2})\)")
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_REGION_SPLIT_RE = re.compile(r"[;,/]|\band\b|&")
+# "North America" is a name; "northern India" is a part of India.
+_DIRECTIONS = {
+    "central", "northern", "southern", "eastern", "western",
+    "northeastern", "northwestern", "southeastern", "southwestern",
+}
+_VAGUE_REGIONS = {"beyond", "elsewhere", "introduced elsewhere", "parts", "hemisphere"}
+MAX_MEMOIZED_FILTERS = 4096
+
+
+def status_key(status: str) -> str:
+    """"Vulnerable (VU)", "vulnerable" and "VU" all map to "VU"."""
+    status = (status or "").strip()
+    m = _CODE_RE.search(status)
+    if m and m.group(1).upper() in IUCN_CODES.values():
+        return m.group(1).upper()
+    if status.upper() in IUCN_CODES.values():
+        return status.upper()
+    text = _PAREN_RE.sub("", status).strip().lower()
+    return IUCN_CODES.get(text, text)
+
+
+def region_keys(distribution: str):
+    """Region keys for a free-text distribution.
+
+    "Himalayas and southwestern China" -> {"himalayas", "southwestern china",
+    "china"}: each listed place, plus the broader region when it starts
+    with a compass direction.
+    """
+    keys = set()
+    text = _PAREN_RE.sub("", distribution or "").lower()
+    for part in _REGION_SPLIT_RE.split(text):
+        part = " ".join(part.split())
+        if not part or part in _VAGUE_REGIONS:
+            continue
+        keys.add(part)
+        words = part.split()
+        broader = " ".join(words[1:])
+        if len(words) > 1 and words[0] in _DIRECTIONS and broader not in _VAGUE_REGIONS:
+            keys.add(broader)
+    return keys
+
+
+class FeaturedStore:
+    def __init__(self, animals):
+        self._animals = animals
+        self.all = MappingProxyType(animals)
+
+        by_category, by_status, by_region = {}, {}, {}
+        self.status_labels = {}
+        self._attrs = {}
+        for animal_id, a in animals.items():
+            by_category.setdefault(a.get("category"), {})[animal_id] = a
+            s = status_key(a.get("conservation_status"))
+            regions = sorted(region_keys(a.get("distribution")))
+            self._attrs[animal_id] = (s, tuple(regions))
+            self.status_labels.setdefault(s, a.get("conservation_status"))
+            by_status.setdefault(s, {})[animal_id] = a
+            for r in regions:
+                by_region.setdefault(r, {})[animal_id] = a
+
+        self._by_category = {k: MappingProxyType(v) for k, v in by_category.items()}
+        self._by_status = {k: MappingProxyType(v) for k, v in by_status.items()}
+        self._by_region = {k: MappingProxyType(v) for k, v in by_region.items()}
+        self._filters = {}
+        self._facets = {}
+
+    def __len__(self):
+        return len(self._animals)
+
+    def get(self, animal_id):
+        return self._animals.get(animal_id)
+
+    def by_category(self, category):
+        return self._by_category.get(category, EMPTY)
+
+    def by_status(self, status):
+        return self._by_status.get(status_key(status), EMPTY)
+
+    def by_region(self, region):
+        return self._by_region.get(" ".join((region or "").lower().split()), EMPTY)
+
+    def filter(self, category=None, status=None, region=None):
+        """Animals matching every given attribute (None means any), in collection order."""
+        key = (
+            category,
+            status_key(status) if status else None,
+            " ".join(region.lower().split()) if region else None,
+        )
+        view = self._filters.get(key)
+        if view is not None:
+            return view
+
+        parts = []
+        if category is not None:
+            parts.append(self.by_category(category))
+        if status:
+            parts.append(self.by_status(status))
+        if region:
+            parts.append(self.by_region(region))
+        if not parts:
+            view = self.all
+        elif len(parts) == 1:
+            view = parts[0]
+        else:
+            smallest = min(parts, key=len)
+            rest = [p for p in parts if p is not smallest]
+            view = MappingProxyType({
+                k: v for k, v in smallest.items() if all(k in p for p in rest)
+            })
+        if len(self._filters) >= MAX_MEMOIZED_FILTERS:
+            self._filters.clear()
+        self._filters[key] = view
+        return view
+
+    def categories(self):
+        return {k: len(v) for k, v in self._by_category.items()}
+
+    def facets(self, category=None):
+        """({status key: count}, {region: count}) for a category (or everything).
+
+        Computed once per category, for filter widgets.
+        """
+        found = self._facets.get(category)
+        if found is None:
+            statuses, regions = Counter(), Counter()
+            for animal_id in self.filter(category=category):
+                s, r = self._attrs[animal_id]
+                statuses[s] += 1
+                regions.update(r)
+            found = self._facets[category] = (dict(statuses), dict(regions))
+        return found
+
+
+def build_featured_store(animals) -> FeaturedStore:
+    return FeaturedStore(animals)
@@ -0,0 +1,294 @@
+# Shared HTTP client for GBIF.
+# One pooled requests.Session per process: keep-alive connections are
+# reused across queries, and 429/5xx responses are retried with backoff.
+# With GBIF_CACHE_PATH set, JSON answers also go through a shared on-disk
+# cache (disk_cache.py).
+#
+# Identical concurrent API calls (same normalized parameters, see
+# disk_cache.make_key) are coalesced: one thread fetches, the others wait
+# for its answer. API calls also pass a token bucket (GBIF_RATE_LIMIT per
+# second, bursts of GBIF_RATE_BURST) so a busy host stays under GBIF's limits.
+
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+import metrics
+from disk_cache import make_key, open_cache
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class ClientStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.coalesced = 0
+        self.throttled = 0
+        self.throttle_wait_total = 0.0
+        self.rate_limited = 0
+
+    def record(self, seconds: float, retries: int, error: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+            if error:
+                self.errors += 1
+            self.latency_total += seconds
+            self.latency_max = max(self.latency_max, seconds)
+
+    def record_coalesced(self):
+        with self._lock:
+            self.coalesced += 1
+
+    def record_throttle(self, waited: float, rejected: bool = False):
+        with self._lock:
+            if rejected:
+                self.rate_limited += 1
+            elif waited > 0:
+                self.throttled += 1
+                self.throttle_wait_total += waited
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.latency_total / self.requests if self.requests else 0.0
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "latency_avg_s": avg,
+                "latency_max_s": self.latency_max,
+                "coalesced": self.coalesced,
+                "throttled": self.throttled,
+                "throttle_wait_s": self.throttle_wait_total,
+                "rate_limited": self.rate_limited,
+            }
+
+
+class RateLimited(requests.RequestException):
+    """The local token bucket would have delayed the call past its timeout."""
+
+
+class FlightTimeout(requests.Timeout):
+    """Gave up waiting for another thread's identical call."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float):
+        """Take a token; return seconds to wait before using it, or None.
+
+        None means the wait would exceed max_wait; nothing is taken then.
+        Waiters queue in order because each reservation can drive the
+        balance negative.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run fn once per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout: float = None):
+        """Return (value, shared); shared is True for callers that waited.
+
+        Waiters give up after `timeout` seconds with FlightTimeout; the
+        call itself carries on for the thread running it.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not call.done.wait(remaining):
+                raise FlightTimeout(f"no answer for a shared call within {timeout:g}s")
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+            return call.value, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def _retry_count(response) -> int:
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    return len(retries.history) if retries is not None else 0
+
+
+class GbifClient:
+    def __init__(
+        self,
+        base_url: str = None,
+        timeout: float = None,
+        max_retries: int = None,
+        backoff_factor: float = None,
+        pool_size: int = None,
+        cache=None,
+        rate_limit: float = None,
+        rate_burst: int = None,
+    ):
+        self.base_url = (base_url or config.GBIF_API_URL).rstrip("/")
+        self.timeout = config.GBIF_TIMEOUT if timeout is None else timeout
+        self.stats = ClientStats()
+        self.cache = cache
+        self._flights = SingleFlight()
+        rate_limit = config.GBIF_RATE_LIMIT if rate_limit is None else rate_limit
+        self.limiter = TokenBucket(
+            rate_limit, config.GBIF_RATE_BURST if rate_burst is None else rate_burst
+        ) if rate_limit > 0 else None
+
+        retry = Retry(
+            total=config.GBIF_MAX_RETRIES if max_retries is None else max_retries,
+            backoff_factor=config.GBIF_BACKOFF if backoff_factor is None else backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        pool_size = pool_size or config.GBIF_POOL_SIZE
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _throttle(self, timeout: float):
+        wait = self.limiter.reserve(max_wait=timeout)
+        if wait is None:
+            self.stats.record_throttle(0.0, rejected=True)
+            raise RateLimited(f"GBIF rate limit ({self.limiter.rate:g}/s) reached")
+        self.stats.record_throttle(wait)
+        if wait:
+            time.sleep(wait)
+
+    def get(self, url: str, params=None, timeout: float = None, **kwargs):
+        timeout = self.timeout if timeout is None else timeout
+        # Absolute URLs (model assets) share the same pool as API paths but
+        # are not GBIF API calls, so they skip the rate limiter.
+        stage = "http_get"
+        if not url.startswith(("http://", "https://")):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+            stage = "gbif_http"
+            if self.limiter is not None:
+                self._throttle(timeout)
+
+        start = time.perf_counter()
+        try:
+            r = self.session.get(
+                url,
+                params=params,
+                timeout=timeout,
+                **kwargs,
+            )
+        except requests.RequestException:
+            elapsed = time.perf_counter() - start
+            self.stats.record(elapsed, 0, error=True)
+            metrics.observe(stage, elapsed)
+            raise
+        elapsed = time.perf_counter() - start
+        self.stats.record(elapsed, _retry_count(r), error=not r.ok)
+        metrics.observe(stage, elapsed)
+        return r
+
+    def _fetch_text(self, path: str, params=None, timeout: float = None) -> str:
+        r = self.get(path, params=params, timeout=timeout)
+        r.raise_for_status()
+        return r.content.decode(r.encoding or "utf-8")
+
+    def get_json(self, path: str, params=None, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        key = make_key(path, params)
+
+        def fetch():
+            if self.cache is None:
+                return self._fetch_text(path, params, timeout)
+            return self.cache.get_or_fetch(key, lambda: self._fetch_text(path, params, timeout))
+
+        # Shared callers get the same text and parse their own copy.
+        raw, shared = self._flights.do(key, fetch, timeout)
+        if shared:
+            self.stats.record_coalesced()
+        return json.loads(raw)
+
+    def species_search(self, query: str, limit: int = 10, timeout: float = None):
+        data = self.get_json("species/search", {"q": query, "limit": limit}, timeout)
+        return data.get("results", [])
+
+    def species_match(self, name: str, timeout: float = None):
+        return self.get_json("species/match", {"name": name, "verbose": "true"}, timeout)
+
+    def species_part(self, key: int, part: str, limit: int = 20, timeout: float = None):
+        # part: vernacularNames, distributions, media, ...
+        data = self.get_json(f"species/{int(key)}/{part}", {"limit": limit}, timeout)
+        return data.get("results", [])
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GbifClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GbifClient(cache=open_cache(
+                    config.GBIF_CACHE_PATH,
+                    ttl=config.GBIF_CACHE_TTL,
+                    stale_ttl=config.GBIF_CACHE_STALE_TTL,
+                    max_entries=config.GBIF_CACHE_MAX_ENTRIES,
+                    max_bytes=config.GBIF_CACHE_MAX_MB * 1024 * 1024,
+                ))
+                metrics.add_collector("gbif_client", _client.stats.snapshot)
+    return _client
@@ -0,0 +1,245 @@
+# Concurrent GBIF lookups for the Name Explorer.
+#
+# Match and search are sent together, and enrichment for the best hits
+# (vernacular names, distributions, media) starts as soon as their keys are
+# known. A lookup therefore costs about one round trip for the names plus
+# one for the enrichment, instead of 2 + 3 per hit one after another. An
+# overall deadline bounds the wait: whatever has not arrived is cancelled
+# and the partial result is returned with timed_out set.
+#
+# The local taxonomy copy (taxonomy_db.py), when configured, answers match
+# and search first; the API is used when it has no answer.
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import config
+from gbif_client import get_client
+
+ENRICHMENT = ("vernacularNames", "distributions", "media")
+
+_executor = None
+_executor_lock = threading.Lock()
+_taxonomy = None
+_taxonomy_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config.GBIF_LOOKUP_WORKERS,
+                    thread_name_prefix="gbif-lookup",
+                )
+    return _executor
+
+
+def get_taxonomy_db():
+    """The local backbone copy (TAXONOMY_DB_PATH), or None."""
+    global _taxonomy
+    if _taxonomy is None:
+        with _taxonomy_lock:
+            if _taxonomy is None:
+                from taxonomy_db import open_taxonomy_db
+
+                _taxonomy = open_taxonomy_db() or False
+    return _taxonomy or None
+
+
+# -----------------------------
+# Local-first single calls
+# -----------------------------
+def species_search(query: str, limit: int = 10, timeout: float = None):
+    db = get_taxonomy_db()
+    local = db.species_search(query, limit=limit) if db is not None else None
+    if local:
+        return local
+    try:
+        return get_client().species_search(query, limit=limit, timeout=timeout)
+    except Exception:
+        if local is not None:
+            return local  # offline: the local "nothing found" stands
+        raise
+
+
+def species_match(name: str, timeout: float = None):
+    db = get_taxonomy_db()
+    local = db.species_match(name) if db is not None else None
+    if local and local.get("usageKey"):
+        return local
+    try:
+        return get_client().species_match(name, timeout=timeout)
+    except Exception:
+        if local is not None:
+            return local
+        raise
+
+
+def _trim(part: str, rows):
+    if part == "vernacularNames":
+        rows = sorted(rows, key=lambda r: r.get("language") not in ("eng", "en"))
+        return [
+            {"vernacularName": r.get("vernacularName"), "language": r.get("language", "")}
+            for r in rows if r.get("vernacularName")
+        ][:10]
+    if part == "distributions":
+        return [
+            {k: r.get(k) for k in ("locality", "country", "establishmentMeans", "threatStatus")}
+            for r in rows if r.get("locality") or r.get("country")
+        ][:10]
+    if part == "media":
+        return [
+            {k: r.get(k) for k in ("identifier", "title", "license", "rightsHolder")}
+            for r in rows
+            if r.get("identifier") and r.get("type", "StillImage") == "StillImage"
+        ][:3]
+    return rows
+
+
+def fetch_part(key: int, part: str, timeout: float = None):
+    return _trim(part, get_client().species_part(key, part, timeout=timeout))
+
+
+# -----------------------------
+# Fan-out
+# -----------------------------
+class _Results:
+    # Complete lookups only; a lookup cut off by its deadline is not reused.
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            found = self._data.get(key)
+            if found is None or time.monotonic() - found[0] > self.ttl:
+                return None
+            self._data.move_to_end(key)
+            return found[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+_results = _Results()
+
+
+def iter_lookup(query: str, limit: int = 5, enrich_top: int = None, deadline: float = None,
+                cancel: threading.Event = None):
+    """Match + search + enrichment, all in flight at once.
+
+    Yields the growing result after every answer, so a page can show the
+    match before the enrichment arrives; the last value is complete. The
+    result is {"match", "results", "enrichment": {key: {part: [...]}},
+    "errors", "timed_out", "elapsed_s", "pending"}; pending is 0 on the
+    last value. `deadline` is seconds from now;
+    setting `cancel`, or closing the generator (e.g. on a Streamlit rerun),
+    stops waiting and cancels the calls not started yet.
+    """
+    enrich_top = config.GBIF_ENRICH_TOP if enrich_top is None else enrich_top
+    deadline = config.GBIF_LOOKUP_DEADLINE if deadline is None else deadline
+    cache_key = (" ".join(query.lower().split()), limit, enrich_top)
+    cached = _results.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    start = time.monotonic()
+    end = start + deadline
+    pool = _pool()
+    out = {"match": None, "results": [], "enrichment": {}, "errors": [], "timed_out": False,
+           "elapsed_s": 0.0, "pending": 0}
+
+    def remaining():
+        return min(config.GBIF_TIMEOUT, max(0.1, end - time.monotonic()))
+
+    pending = {}  # future -> (kind, key, part)
+    enriched = set()
+    match_done = False
+
+    def submit(kind, fn, *args, key=None, part=None):
+        pending[pool.submit(fn, *args, timeout=remaining())] = (kind, key, part)
+
+    def enrich(key):
+        if key is None or key in enriched:
+            return
+        enriched.add(key)
+        out["enrichment"][key] = {}
+        for part in ENRICHMENT:
+            submit("part", fetch_part, key, part, key=key, part=part)
+
+    def enrich_search():
+        # Search hits are only shown when the match has no usageKey, so
+        # they are only enriched once that is known.
+        for r in out["results"][:enrich_top]:
+            enrich(r.get("key"))
+
+    submit("match", species_match, query)
+    submit("search", species_search, query, limit)
+    try:
+        while pending:
+            if cancel is not None and cancel.is_set():
+                break
+            left = end - time.monotonic()
+            if left <= 0:
+                out["timed_out"] = True
+                break
+            done, _ = wait(list(pending), timeout=min(left, 0.1), return_when=FIRST_COMPLETED)
+            for fut in done:
+                kind, key, part = pending.pop(fut)
+                try:
+                    value = fut.result()
+                except Exception as e:
+                    label = f"{part} for {key}" if kind == "part" else kind
+                    out["errors"].append(f"{label}: {e}")
+                    if kind == "match":
+                        match_done = True
+                        enrich_search()
+                    continue
+                if kind == "match":
+                    match_done = True
+                    out["match"] = value
+                    if value and value.get("usageKey"):
+                        enrich(value["usageKey"])  # always rendered; not capped
+                    else:
+                        enrich_search()
+                elif kind == "search":
+                    out["results"] = value
+                    if match_done and not (out["match"] or {}).get("usageKey"):
+                        enrich_search()
+                else:
+                    out["enrichment"][key][part] = value
+            if done:
+                out["elapsed_s"] = time.monotonic() - start
+                out["pending"] = len(pending)
+                yield out
+    finally:
+        # Calls not started yet are dropped; running ones finish within
+        # their own timeout and are ignored.
+        for fut in pending:
+            fut.cancel()
+
+    out["elapsed_s"] = time.monotonic() - start
+    out["pending"] = 0
+    if not pending and not out["errors"]:
+        _results.put(cache_key, out)
+    yield out
+
+
+def lookup(query: str, limit: int = 5, enrich_top: int = None, deadline: float = None,
+           cancel: threading.Event = None) -> dict:
+    """The complete (or deadline-cut) result of iter_lookup."""
+    out = None
+    for out in iter_lookup(query, limit, enrich_top, deadline, cancel):
+        pass
+    return out
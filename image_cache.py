@@ -0,0 +1,327 @@
+# Local cache of resized featured animal photos.
+#
+#   python image_cache.py warm            # fetch every featured photo now
+#   python image_cache.py info
+#   python image_cache.py serve --port 8601
+#
+# Each source URL is downloaded once and stored as WebP variants (a small
+# grid thumbnail and a detail-size image). Variant files are named by the
+# BLAKE2 hash of their bytes, so identical photos share one file and a file
+# never changes once written. A small JSON record per URL remembers the
+# variants and the source's ETag / Last-Modified. Records older than
+# IMAGE_REVALIDATE_S are still served, and revalidated in the background
+# with a conditional GET; a 304 costs no download at all.
+#
+# Layout under IMAGE_CACHE_DIR:
+#   blobs/ab/abcdef....webp      variant bytes, content-addressed
+#   urls/<hash of url>.json      {"url", "etag", "last_modified", "checked_at",
+#                                 "source": digest, "variants": {name: digest}}
+#
+# st.image re-encodes local files to JPEG/PNG. With IMAGE_PROXY_PORT set,
+# blobs are served as-is by a small HTTP server instead; their names never
+# change, so browsers keep them for a year without asking again.
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import config
+import metrics
+
+# name -> maximum width in pixels (never upscaled)
+VARIANTS = {
+    "thumb": config.IMAGE_THUMB_WIDTH,
+    "detail": config.IMAGE_DETAIL_WIDTH,
+}
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+
+
+class ImageCacheError(Exception):
+    pass
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def render_variant(source: bytes, width: int, quality: int = None) -> bytes:
+    """Decode `source` and re-encode it as WebP at most `width` pixels wide."""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(source))
+    # JPEGs decode straight at a reduced scale (see image_preprocess.py).
+    img.draft("RGB", (width, width))
+    img = img.convert("RGB") if img.mode not in ("RGB", "RGBA") else img
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, "WEBP", quality=config.IMAGE_WEBP_QUALITY if quality is None else quality,
+             method=4)
+    return out.getvalue()
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class ImageCache:
+    def __init__(self, root, revalidate_after: float = None, timeout: float = None):
+        self.root = Path(root)
+        self.revalidate_after = (
+            config.IMAGE_REVALIDATE_S if revalidate_after is None else revalidate_after
+        )
+        self.timeout = config.IMAGE_FETCH_TIMEOUT if timeout is None else timeout
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._failed = {}  # url -> time of the last failed download
+        self._stats_lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "revalidated": 0, "not_modified": 0,
+                       "downloaded_bytes": 0, "errors": 0}
+        from gbif_client import SingleFlight
+
+        self._flights = SingleFlight()
+
+    def _count(self, field: str, n: int = 1):
+        with self._stats_lock:
+            self.counts[field] += n
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self.counts)
+
+    def _record_path(self, url: str) -> Path:
+        return self.root / "urls" / f"{_digest(url.encode('utf-8'))}.json"
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / "blobs" / digest[:2] / f"{digest}.webp"
+
+    def _load_record(self, url: str):
+        try:
+            record = json.loads(self._record_path(url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if any(not self.blob_path(d).exists() for d in record.get("variants", {}).values()):
+            return None  # blobs were cleaned up; fetch again
+        return record
+
+    def _download(self, url: str, record=None):
+        # Returns (status, body, headers); body is None on 304.
+        from gbif_client import get_client
+
+        headers = {}
+        if record and record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
+        if record and record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+        r = get_client().get(url, headers=headers, stream=True, timeout=self.timeout)
+        try:
+            if r.status_code == 304:
+                return 304, None, r.headers
+            r.raise_for_status()
+            body = bytearray()
+            for chunk in r.iter_content(64 * 1024):
+                body.extend(chunk)
+                if len(body) > MAX_SOURCE_BYTES:
+                    raise ImageCacheError(f"{url} is larger than {MAX_SOURCE_BYTES} bytes")
+            self._count("downloaded_bytes", len(body))
+            return r.status_code, bytes(body), r.headers
+        finally:
+            r.close()
+
+    def _store(self, url: str, old, status: int, body, headers) -> dict:
+        record = dict(old or {}, url=url, checked_at=time.time())
+        for field, header in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+            if headers.get(header):
+                record[field] = headers[header]
+        if status == 304:
+            self._count("not_modified")
+        else:
+            source = _digest(body)
+            if not old or old.get("source") != source or set(old.get("variants", {})) != set(VARIANTS):
+                variants = {}
+                for name, width in VARIANTS.items():
+                    data = render_variant(body, width)
+                    digest = variants[name] = _digest(data)
+                    path = self.blob_path(digest)
+                    if not path.exists():
+                        _write_atomic(path, data)
+                record["variants"] = variants
+                record["source"] = source
+        _write_atomic(self._record_path(url), json.dumps(record).encode("utf-8"))
+        return record
+
+    def _fetch(self, url: str, old=None) -> dict:
+        status, body, headers = self._download(url, old)
+        return self._store(url, old, status, body, headers)
+
+    def _revalidate_async(self, url: str, old):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        def run():
+            try:
+                self._fetch(url, old)
+                self._count("revalidated")
+            except Exception:
+                # Keep serving the cached variants; the next reader retries.
+                self._count("errors")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(url)
+
+        threading.Thread(target=run, name="image-revalidate", daemon=True).start()
+
+    def get(self, url: str, variant: str = "thumb"):
+        """Path of the cached variant for `url`, fetching it if needed; None on failure."""
+        if variant not in VARIANTS:
+            raise ValueError(f"unknown variant {variant!r}")
+        record = self._load_record(url)
+        if record is not None:
+            self._count("hits")
+            if time.time() - record.get("checked_at", 0) > self.revalidate_after:
+                self._revalidate_async(url, record)
+        else:
+            self._count("misses")
+            failed_at = self._failed.get(url)
+            if failed_at is not None and time.time() - failed_at < config.IMAGE_RETRY_AFTER_S:
+                return None  # do not stall every render on an unreachable host
+            try:
+                # Concurrent sessions asking for the same photo share one download.
+                record, _ = self._flights.do(url, lambda: self._fetch(url), self.timeout)
+            except Exception:
+                self._count("errors")
+                self._failed[url] = time.time()
+                return None
+            self._failed.pop(url, None)
+        return self.blob_path(record["variants"][variant])
+
+    def prefetch(self, urls, variant: str = "thumb", workers: int = 8) -> dict:
+        """{url: path or None}, fetching missing images in parallel."""
+        urls = list(dict.fromkeys(u for u in urls if u))
+        if len(urls) <= 1:
+            return {u: self.get(u, variant) for u in urls}
+        with ThreadPoolExecutor(max_workers=min(workers, len(urls)),
+                                thread_name_prefix="image-fetch") as ex:
+            return dict(zip(urls, ex.map(lambda u: self.get(u, variant), urls)))
+
+    def size_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.root.rglob("*") if p.is_file())
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    """The process-wide cache, or None when IMAGE_CACHE_DIR is empty."""
+    global _cache
+    if _cache is None and config.IMAGE_CACHE_DIR:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ImageCache(config.IMAGE_CACHE_DIR)
+                metrics.add_collector("image_cache", _cache.stats)
+    return _cache
+
+
+# -----------------------------
+# Proxy
+# -----------------------------
+class _ProxyHandler(BaseHTTPRequestHandler):
+    cache = None
+
+    def do_GET(self):
+        name = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+        digest = name[:-len(".webp")] if name.endswith(".webp") else ""
+        if len(digest) != 32 or not all(c in "0123456789abcdef" for c in digest):
+            self.send_error(404)
+            return
+        etag = f'"{digest}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        try:
+            data = self.cache.blob_path(digest).read_bytes()
+        except OSError:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/webp")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_proxy(cache: ImageCache, host: str, port: int) -> ThreadingHTTPServer:
+    """Serve cache blobs over HTTP from a daemon thread."""
+    handler = type("ProxyHandler", (_ProxyHandler,), {"cache": cache})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="image-proxy", daemon=True).start()
+    return server
+
+
+def proxy_url(path: Path) -> str:
+    base = config.IMAGE_PROXY_URL or f"http://localhost:{config.IMAGE_PROXY_PORT}"
+    return f"{base.rstrip('/')}/{path.name}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the featured photo cache.")
+    parser.add_argument("--dir", type=Path, default=Path(config.IMAGE_CACHE_DIR or ".cache/images"))
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("warm", help="fetch every featured photo")
+    w.add_argument("--workers", type=int, default=8)
+    sub.add_parser("info", help="summarize the cache")
+    s = sub.add_parser("serve", help="run the image proxy in the foreground")
+    s.add_argument("--host", default=config.IMAGE_PROXY_HOST)
+    s.add_argument("--port", type=int, default=config.IMAGE_PROXY_PORT or 8601)
+    args = parser.parse_args(argv)
+
+    cache = ImageCache(args.dir)
+    if args.cmd == "warm":
+        from animal_data import ANIMALS_DATA
+
+        urls = [a["image"] for a in ANIMALS_DATA.values() if a.get("image")]
+        start = time.perf_counter()
+        paths = cache.prefetch(urls, workers=args.workers)
+        failed = [u for u, p in paths.items() if p is None]
+        print(f"{len(paths) - len(failed)}/{len(paths)} photos cached in "
+              f"{time.perf_counter() - start:.1f}s; {cache.stats()}")
+        for u in failed:
+            print(f"  failed: {u}", file=sys.stderr)
+        return 1 if failed else 0
+    if args.cmd == "serve":
+        server = start_proxy(cache, args.host, args.port)
+        print(f"Serving {args.dir} on http://{args.host}:{args.port}", file=sys.stderr)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return 0
+    records = list((args.dir / "urls").glob("*.json"))
+    print(f"{args.dir}: {len(records)} photos, {cache.size_bytes() / 1e6:.2f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# ImageNet preprocessing for the ONNX classifier.
+#
+# Large phone photos used to spend longer in decode/resize than in the
+# model. Here JPEGs are decoded at a reduced scale (draft), other formats
+# are shrunk with a cheap integer reduce() before the final resample, and
+# scale + mean/std normalization is a single multiply-add written straight
+# into a reusable NCHW float32 buffer.
+
+import threading
+
+import numpy as np
+from PIL import Image
+
+import config
+
+INPUT_SIZE = (224, 224)
+
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# (x / 255 - mean) / std  ==  x * SCALE + BIAS, per channel
+SCALE = (1.0 / (255.0 * STD)).reshape(3, 1, 1)
+BIAS = (-MEAN / STD).reshape(3, 1, 1)
+
+# Keep at least this multiple of the target size before the final
+# resample, so the bicubic filter still has real pixels to average.
+REDUCE_GAP = 2
+
+
+def prepare_image(pil_image: Image.Image, size=INPUT_SIZE) -> Image.Image:
+    """Return an RGB image of exactly `size`, decoding as little as possible.
+
+    draft() only has an effect on JPEGs that have not been loaded yet; it
+    is a no-op otherwise.
+    """
+    w, h = size
+    pil_image.draft("RGB", (w * REDUCE_GAP, h * REDUCE_GAP))
+    img = pil_image.convert("RGB") if pil_image.mode != "RGB" else pil_image
+
+    factor = min(img.width // (w * REDUCE_GAP), img.height // (h * REDUCE_GAP))
+    if factor > 1:
+        img = img.reduce(factor)
+    if img.size != (w, h):
+        img = img.resize((w, h), Image.BICUBIC)
+    return img
+
+
+def normalize_into(img: Image.Image, out: np.ndarray):
+    # HWC uint8 view -> CHW float32, fused scale + normalize, no temporaries.
+    chw = np.asarray(img).transpose(2, 0, 1)
+    np.multiply(chw, SCALE, out=out)
+    np.add(out, BIAS, out=out)
+
+
+class Preprocessor:
+    """Reusable NCHW buffer; grows to the largest batch seen, up to max_capacity.
+
+    Batches larger than max_capacity (default IDENTIFIER_BATCH_SIZE) get a
+    fresh array that is not kept, so one oversized request does not pin
+    its memory for the life of the thread.
+    """
+
+    def __init__(self, size=INPUT_SIZE, capacity: int = 1, max_capacity: int = None):
+        self.size = size
+        self.max_capacity = max(1, config.IDENTIFIER_BATCH_SIZE if max_capacity is None
+                                else max_capacity)
+        self._buf = np.empty((min(capacity, self.max_capacity), 3, size[1], size[0]),
+                             dtype=np.float32)
+
+    def __call__(self, pil_images) -> np.ndarray:
+        """(N, 3, H, W) batch for the images.
+
+        Up to max_capacity images, the result is a view of the reusable
+        buffer: the next call overwrites it. Copy it if it must outlive that.
+        """
+        pil_images = list(pil_images)
+        n = len(pil_images)
+        if n > self.max_capacity:
+            out = np.empty((n, *self._buf.shape[1:]), dtype=np.float32)
+        else:
+            if n > len(self._buf):
+                self._buf = np.empty((n, *self._buf.shape[1:]), dtype=np.float32)
+            out = self._buf[:n]
+        for i, im in enumerate(pil_images):
+            normalize_into(prepare_image(im, self.size), out[i])
+        return out
+
+
+_local = threading.local()
+
+
+def preprocess_batch(pil_images) -> np.ndarray:
+    """Preprocess images into an (N, 3, 224, 224) float32 batch.
+
+    The result is a view of a per-thread buffer that the next call in the
+    same thread overwrites; copy it if it must outlive that.
+    """
+    pre = getattr(_local, "pre", None)
+    if pre is None:
+        pre = _local.pre = Preprocessor()
+    return pre(pil_images)
+
+
+def preprocess_imagenet(pil_image: Image.Image) -> np.ndarray:
+    # Same buffer as preprocess_batch: valid until the next call in this thread.
+    return preprocess_batch([pil_image])
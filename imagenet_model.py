@@ -0,0 +1,181 @@
+# No-key ImageNet classifier via ONNX.
+# Kept free of Streamlit so the app, scripts and benchmarks share it;
+# app.py wraps the loaders in st.cache_resource.
+
+import os
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+import config
+import metrics
+import model_assets
+from animal_data import ANIMALS_DATA
+from image_preprocess import preprocess_batch, preprocess_imagenet  # noqa: F401
+from label_map import LabelMap
+
+MODEL_PATH = model_assets.asset_path("mobilenet_v2")
+INT8_MODEL_PATH = model_assets.asset_path("mobilenet_v2_int8")
+LABELS_PATH = model_assets.asset_path("imagenet_labels")
+
+MODEL_VARIANTS = ("fp32", "int8")
+ASSET_NAMES = {"fp32": "mobilenet_v2", "int8": "mobilenet_v2_int8"}
+
+
+def iter_image_paths(folder):
+    exts = {f".{e}" for e in config.ALLOWED_EXTENSIONS}
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if Path(name).suffix.lower() in exts:
+                yield Path(root) / name
+
+
+def load_labels():
+    try:
+        path = model_assets.ensure_asset("imagenet_labels")
+        return path.read_text(encoding="utf-8").splitlines()
+    except model_assets.IntegrityError:
+        raise
+    except Exception:
+        return []
+
+
+def resolve_variant(variant: str = None) -> str:
+    # The variant load_session() will actually use.
+    variant =(variant or config.MODEL_VARIANT).lower()
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant: {variant!r}")
+    if variant == "int8":
+        try:
+            model_assets.ensure_asset(ASSET_NAMES["int8"])
+        except model_assets.IntegrityError:
+            raise
+        except model_assets.AssetError:
+            # No int8 file and no URL for one: keep working on fp32.
+            return "fp32"
+    return variant
+
+
+def model_path_for(variant: str = None) -> Path:
+    """Return the local model file for a variant, fetching it if needed.
+
+    int8 is either downloaded (MOBILENET_INT8_ONNX_URL / manifest) or
+    produced offline by quantize_model.py; without either, fp32 is used so
+    the identifier keeps working.
+    """
+    return model_assets.ensure_asset(ASSET_NAMES[resolve_variant(variant)])
+
+
+def load_session(variant: str = None, profile: str = None):
+    try:
+        from onnx_session import create_session
+
+        name = ASSET_NAMES[resolve_variant(variant)]
+        try:
+            return create_session(model_assets.ensure_asset(name), profile=profile)
+        except model_assets.AssetError:
+            raise
+        except Exception:
+            # A file ORT cannot read (e.g. truncated by an older release):
+            # fetch it again once, if it can be fetched at all.
+            if not model_assets.load_manifest()[name].get("url"):
+                raise
+            model_assets.invalidate(name)
+            return create_session(model_assets.ensure_asset(name), profile=profile)
+    except model_assets.IntegrityError:
+        raise
+    except Exception:
+        return None
+
+
+def softmax(x):
+    # Row-wise over the last axis, so it works for a single logit vector
+    # and for a whole batch.
+    x = x - np.max(x, axis=-1, keepdims=True)
+    e = np.exp(x)
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+
+def topk_labels(probs, labels, topk: int = 5):
+    idxs = np.argsort(probs)[::-1][:topk]
+    results = []
+    for i in idxs:
+        label = labels[i] if i < len(labels) else f"class_{i}"
+        results.append((label, float(probs[i])))
+    return results
+
+
+def _fixed_batch_dim(sess):
+    # Some exported models pin the batch dimension (usually to 1).
+    dim = sess.get_inputs()[0].shape[0]
+    return dim if isinstance(dim, int) and dim > 0 else None
+
+
+def run_onnx_batch(sess, batch: np.ndarray) -> np.ndarray:
+    input_name = sess.get_inputs()[0].name
+    fixed = _fixed_batch_dim(sess)
+    if fixed is None or fixed == len(batch):
+        return sess.run(None, {input_name: batch})[0]
+
+    # Static-shape model: feed it slices of the size it was exported with.
+    outs = []
+    for start in range(0, len(batch), fixed):
+        part = batch[start:start + fixed]
+        n = len(part)
+        if n < fixed:
+            pad = np.zeros((fixed - n, *part.shape[1:]), dtype=part.dtype)
+            part = np.concatenate([part, pad])
+        outs.append(sess.run(None, {input_name: part})[0][:n])
+    return np.concatenate(outs)
+
+
+def predict_probs(sess, batch: np.ndarray) -> np.ndarray:
+    """Softmax probabilities for a preprocessed batch.
+
+    `sess` is an ORT session or anything with its own predict_probs(),
+    such as inference_server.InferenceClient.
+    """
+    remote = getattr(sess, "predict_probs", None)
+    if remote is not None:
+        return remote(batch)
+    return softmax(run_onnx_batch(sess, batch))
+
+
+def build_label_map(labels):
+    # Built once per label set, next to the session (see label_map.py).
+    return LabelMap(labels, ANIMALS_DATA)
+
+
+def featured_matches(label_map, probs):
+    """Per-row featured matches for an (N, classes) probability batch."""
+    if label_map is None:
+        return [[] for _ in range(len(probs))]
+    scores = label_map.aggregate(probs)
+    return [label_map.rank(row, min_prob=config.FEATURED_MATCH_MIN_PROB) for row in scores]
+
+
+def classify_batch(sess, labels, pil_images, topk: int = 5, batch_size: int = None,
+                   label_map=None):
+    """Classify an iterable of images, yielding one list per batch.
+
+    Each item is (top-k [(label, prob)], featured [(featured_id, bucket, prob)]).
+    Images are consumed lazily, so a generator that decodes uploads on
+    demand only keeps one batch of pixels in memory.
+    """
+    if sess is None or not labels:
+        return
+
+    batch_size = max(1, batch_size or config.IDENTIFIER_BATCH_SIZE)
+    it = iter(pil_images)
+    while True:
+        chunk = list(islice(it, batch_size))
+        if not chunk:
+            return
+        with metrics.timer("preprocess"):  # includes the (reduced-scale) decode
+            inp = preprocess_batch(chunk)
+        with metrics.timer("inference"):
+            probs = predict_probs(sess, inp)
+        featured = featured_matches(label_map, probs)
+        yield [(topk_labels(p, labels, topk), f) for p, f in zip(probs, featured)]
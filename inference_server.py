@@ -0,0 +1,296 @@
+# Local inference service shared by all app processes on a host.
+#
+#   python inference_server.py --socket /tmp/animal-explorer.sock
+#
+# One process owns the only InferenceSession (and ORT thread pool). App
+# workers send preprocessed NCHW tensors over a Unix socket; concurrent
+# requests are merged into micro-batches of up to --max-batch images,
+# waiting at most --max-wait-ms for company, and each caller gets its own
+# rows of softmax probabilities back. Set INFERENCE_SOCKET in the app's
+# environment to use it (see InferenceClient).
+#
+# Wire format (big-endian):
+#   request   b"INF1" | u32 payload bytes | float32 (n, 3, 224, 224)
+#   response  b"OK01" | u32 rows | u32 payload bytes | float32 (rows, classes)
+#             b"ERR1" | u32 0    | u32 payload bytes | utf-8 message
+
+import argparse
+import os
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from image_preprocess import INPUT_SIZE
+
+REQUEST_MAGIC = b"INF1"
+OK_MAGIC = b"OK01"
+ERR_MAGIC = b"ERR1"
+REQ_HEADER = struct.Struct("!4sI")
+RESP_HEADER = struct.Struct("!4sII")
+IMAGE_SHAPE = (3, INPUT_SIZE[1], INPUT_SIZE[0])
+IMAGE_BYTES = 4 * IMAGE_SHAPE[0] * IMAGE_SHAPE[1] * IMAGE_SHAPE[2]
+MAX_REQUEST_IMAGES = 256
+
+
+class InferenceError(RuntimeError):
+    pass
+
+
+class ModelUnavailable(InferenceError):
+    """The server cannot be reached and there is no local model to use."""
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if not k:
+            raise ConnectionError("socket closed")
+        got += k
+    return bytes(buf)
+
+
+class MicroBatcher:
+    """Collects concurrent requests and runs them as one batch."""
+
+    def __init__(self, predict, max_batch: int = 32, max_wait: float = 0.005):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.images = 0
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, batch: np.ndarray) -> Future:
+        fut = Future()
+        self._queue.put((batch, fut))
+        return fut
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        items = [first]
+        rows = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stop.set()
+                break
+            items.append(item)
+            rows += len(item[0])
+        return items
+
+    def _loop(self):
+        while not self._stop.is_set():
+            items = self._collect()
+            if not items:
+                break
+            try:
+                batch = np.concatenate([b for b, _ in items]) if len(items) > 1 else items[0][0]
+                probs = self.predict(batch)
+            except Exception as e:
+                for _, fut in items:
+                    fut.set_exception(e)
+                continue
+            start = 0
+            for b, fut in items:
+                fut.set_result(probs[start:start + len(b)])
+                start += len(b)
+            with self._lock:
+                self.batches += 1
+                self.requests += len(items)
+                self.images += len(batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "images": self.images,
+                "mean_batch": self.images / self.batches if self.batches else 0.0,
+            }
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        batcher = self.server.batcher
+        while True:
+            try:
+                magic, length = REQ_HEADER.unpack(_recv_exact(sock, REQ_HEADER.size))
+            except ConnectionError:
+                return
+            try:
+                if magic != REQUEST_MAGIC:
+                    raise InferenceError("bad request header")
+                if length == 0 or length % IMAGE_BYTES or length // IMAGE_BYTES > MAX_REQUEST_IMAGES:
+                    raise InferenceError(f"bad payload size: {length}")
+                payload = _recv_exact(sock, length)
+                batch = np.frombuffer(payload, dtype=np.float32).reshape(-1, *IMAGE_SHAPE)
+                probs = np.ascontiguousarray(batcher.submit(batch).result(), dtype=np.float32)
+                body = probs.tobytes()
+                sock.sendall(RESP_HEADER.pack(OK_MAGIC, len(probs), len(body)) + body)
+            except ConnectionError:
+                return
+            except Exception as e:
+                msg = f"{type(e).__name__}: {e}".encode("utf-8")
+                sock.sendall(RESP_HEADER.pack(ERR_MAGIC, 0, len(msg)) + msg)
+                if isinstance(e, InferenceError):
+                    return  # framing is unreliable after a bad request
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, predict, max_batch: int = 32, max_wait: float = 0.005):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.batcher = MicroBatcher(predict, max_batch=max_batch, max_wait=max_wait)
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+class InferenceClient:
+    """Talks to an InferenceServer; one persistent connection per thread.
+
+    `fallback` (optional) returns a local session to use when the server
+    cannot be reached, so the app keeps working if the service is down.
+    Without one (or when it returns None), connection errors surface as
+    ModelUnavailable.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0, fallback=None):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._fallback = fallback
+        self._local_session = None
+        self._local = threading.local()
+
+    def _sock(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def ping(self) -> bool:
+        try:
+            self._sock()
+            return True
+        except OSError:
+            self._drop()
+            return False
+
+    def _remote(self, batch: np.ndarray) -> np.ndarray:
+        body = np.ascontiguousarray(batch, dtype=np.float32).tobytes()
+        sock = self._sock()
+        sock.sendall(REQ_HEADER.pack(REQUEST_MAGIC, len(body)) + body)
+        magic, rows, length = RESP_HEADER.unpack(_recv_exact(sock, RESP_HEADER.size))
+        payload = _recv_exact(sock, length)
+        if magic != OK_MAGIC:
+            raise InferenceError(payload.decode("utf-8", "replace"))
+        return np.frombuffer(payload, dtype=np.float32).reshape(rows, -1)
+
+    def predict_probs(self, batch: np.ndarray) -> np.ndarray:
+        """Softmax probabilities for an (N, 3, 224, 224) batch."""
+        out = []
+        for start in range(0, len(batch), MAX_REQUEST_IMAGES):
+            part = batch[start:start + MAX_REQUEST_IMAGES]
+            try:
+                out.append(self._remote(part))
+            except (OSError, ConnectionError) as e:
+                self._drop()
+                if self._local_session is None and self._fallback is not None:
+                    self._local_session = self._fallback()
+                if self._local_session is None:
+                    raise ModelUnavailable("inference server unreachable and no local model") from e
+                import imagenet_model
+
+                out.append(imagenet_model.predict_probs(self._local_session, part))
+        return np.concatenate(out) if len(out) > 1 else out[0]
+
+
+def main(argv=None):
+    import config
+    import imagenet_model
+
+    parser = argparse.ArgumentParser(description="Shared ONNX inference service.")
+    parser.add_argument("--socket", default=config.INFERENCE_SOCKET or "/tmp/animal-explorer.sock")
+    parser.add_argument("--max-batch", type=int, default=config.INFERENCE_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=config.INFERENCE_MAX_WAIT_MS)
+    parser.add_argument("--variant", default=None, help="fp32 or int8 (default: MODEL_VARIANT)")
+    parser.add_argument("--profile", default="latency", help="ONNX Runtime profile (see onnx_session.py)")
+    parser.add_argument("--model", default=None, help="use this ONNX file instead of --variant")
+    args = parser.parse_args(argv)
+
+    if args.model:
+        from onnx_session import create_session
+
+        sess = create_session(args.model, profile=args.profile)
+    else:
+        sess = imagenet_model.load_session(args.variant, profile=args.profile)
+    if sess is None:
+        raise SystemExit("Model assets could not be loaded.")
+
+    server = InferenceServer(
+        args.socket,
+        lambda batch: imagenet_model.predict_probs(sess, batch),
+        max_batch=args.max_batch,
+        max_wait=args.max_wait_ms / 1000.0,
+    )
+    print(f"Serving on {args.socket} (max batch {args.max_batch}, max wait {args.max_wait_ms} ms)",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Stats: {server.batcher.stats()}", file=sys.stderr)
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
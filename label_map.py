@@ -0,0 +1,123 @@
+# ImageNet class -> Featured animal mapping, precomputed once per label set.
+#
+# Every ImageNet class id is assigned to at most one target: a featured
+# animal (direct match on its name/aliases) or a taxon bucket such as
+# "owls" whose members are the featured animals sharing its keywords.
+# Mapping a prediction is then one matrix product over the full
+# probability vector, so probability mass is summed per target and a
+# featured animal at rank 2 or lower still counts.
+
+import numpy as np
+
+from search_index import normalize
+
+# ImageNet spellings that differ from our names/aliases.
+LABEL_OVERRIDES = {
+    "monarch": "monarch_butterfly",
+    "lesser panda": "red_panda",
+    "black-footed ferret": "ferret",
+    "polecat": "ferret",
+    "african crocodile": "nile_crocodile",
+}
+
+# Bucket -> keywords. A label joins a bucket when its head noun (last
+# words) is one of the keywords, so "tiger shark" is a shark, not a tiger.
+TAXON_BUCKETS = {
+    "owls": ("owl",),
+    "eagles": ("eagle",),
+    "penguins": ("penguin",),
+    "big cats": ("tiger", "lion", "leopard", "jaguar", "cheetah", "cougar"),
+    "otters": ("otter",),
+    "mustelids": ("ferret", "polecat", "weasel", "mink"),
+    "pandas": ("panda",),
+    "sharks": ("shark", "hammerhead"),
+    "crocodilians": ("crocodile", "alligator"),
+    "monitor lizards": ("dragon", "monitor"),
+    "salamanders": ("axolotl", "salamander", "newt", "eft"),
+    "butterflies": ("butterfly", "monarch", "admiral", "ringlet", "lycaenid"),
+}
+
+
+def _names(animal):
+    fields = [animal.get("name", ""), animal.get("scientific_name", ""), *(animal.get("aliases") or [])]
+    return {normalize(f) for f in fields if f}
+
+
+def _head_matches(label: str, keywords) -> bool:
+    words = label.replace("-", " ").split()
+    return any(words[-len(k.split()):] == k.split() for k in keywords if words)
+
+
+class LabelMap:
+    def __init__(self, labels, animals):
+        # Targets are (featured_id, bucket); bucket is None for direct hits.
+        self.targets = []
+        target_ids = {}
+
+        def target(featured_id, bucket=None):
+            key = (featured_id, bucket)
+            if key not in target_ids:
+                target_ids[key] = len(self.targets)
+                self.targets.append(key)
+            return target_ids[key]
+
+        by_name = {}
+        for animal_id, a in animals.items():
+            for n in _names(a):
+                by_name.setdefault(n, animal_id)
+        for label, animal_id in LABEL_OVERRIDES.items():
+            if animal_id in animals:
+                by_name[label] = animal_id
+
+        bucket_members = {}
+        for bucket, keywords in TAXON_BUCKETS.items():
+            members = [
+                animal_id for animal_id, a in animals.items()
+                if any(_head_matches(n, keywords) for n in _names(a))
+            ]
+            if members:
+                bucket_members[bucket] = members
+        self.bucket_members = bucket_members
+
+        self.index = np.full(len(labels), -1, dtype=np.int32)
+        self._label_ids = {}
+        for class_id, raw in enumerate(labels):
+            label = normalize(raw)
+            self._label_ids.setdefault(label, class_id)
+            if label in by_name:
+                self.index[class_id] = target(by_name[label])
+                continue
+            for bucket, members in bucket_members.items():
+                if _head_matches(label, TAXON_BUCKETS[bucket]):
+                    self.index[class_id] = target(members[0], bucket)
+                    break
+
+        # One-hot (classes x targets): probs @ matrix sums mass per target.
+        self.matrix = np.zeros((len(labels), max(len(self.targets), 1)), dtype=np.float32)
+        mapped = np.nonzero(self.index >= 0)[0]
+        self.matrix[mapped, self.index[mapped]] = 1.0
+
+    def aggregate(self, probs) -> np.ndarray:
+        """Probability per target for a (classes,) or (N, classes) array."""
+        return np.asarray(probs, dtype=np.float32) @ self.matrix
+
+    def rank(self, scores, min_prob: float = 0.0, limit: int = 3):
+        """Turn one row of aggregate() into [(featured_id, bucket, prob), ...]."""
+        if not self.targets:
+            return []
+        order = np.argsort(scores)[::-1][:limit]
+        return [
+            (*self.targets[t], float(scores[t]))
+            for t in order
+            if scores[t] > 0 and scores[t] >= min_prob
+        ]
+
+    def matches(self, probs, min_prob: float = 0.0, limit: int = 3):
+        """Ranked featured matches for a single (classes,) probability vector."""
+        return self.rank(self.aggregate(probs), min_prob, limit)
+
+    def featured_for_label(self, label: str):
+        class_id = self._label_ids.get(normalize(label))
+        if class_id is None or self.index[class_id] < 0:
+            return None
+        return self.targets[self.index[class_id]][0]
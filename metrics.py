@@ -0,0 +1,247 @@
+# Per-stage latency histograms.
+#
+#   with metrics.timer("gbif_search"): ...
+#   @metrics.timed()                  # stage = function name
+#
+# Each stage keeps cumulative counts over fixed buckets plus a sum, which
+# is all a Prometheus histogram needs; recording is a bisect and a few
+# additions under a lock. With METRICS_PORT set, /metrics serves the text
+# exposition format from a daemon thread. Collectors add point-in-time
+# values (cache hits, GBIF client counters) to the same page.
+#
+# Stdlib only, so importing it costs nothing on pages that never time
+# anything (see benchmarks/startup.py).
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+import config
+
+PREFIX = "animal_explorer"
+# Seconds; roughly x2.5 steps from 0.5 ms (cache hits) to 30 s (cold GBIF).
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+           0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum, self.max
+
+    def quantile(self, q: float, counts=None) -> float:
+        """Estimate from the buckets (linear within a bucket, like histogram_quantile)."""
+        counts = counts or self.snapshot()[0]
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                lo = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return self.max  # +Inf bucket: best we know
+                return min(lo + (self.buckets[i] - lo) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.collectors = {}
+
+    def histogram(self, stage: str) -> Histogram:
+        h = self.histograms.get(stage)
+        if h is None:
+            with self._lock:
+                h = self.histograms.setdefault(stage, Histogram())
+        return h
+
+    def observe(self, stage: str, seconds: float):
+        if config.METRICS_ENABLED:
+            self.histogram(stage).observe(seconds)
+
+    def add_collector(self, name: str, fn):
+        """fn() -> {key: number}; exported as <prefix>_<name>_<key> gauges."""
+        self.collectors[name] = fn
+
+    def summary(self) -> list:
+        """Rows of stage, count, mean/p50/p95/max in milliseconds, slowest total first."""
+        rows = []
+        for stage, h in list(self.histograms.items()):
+            counts, n, total, peak = h.snapshot()
+            if not n:
+                continue
+            rows.append({
+                "stage": stage,
+                "count": n,
+                "total_ms": total * 1000,
+                "mean_ms": total / n * 1000,
+                "p50_ms": h.quantile(0.5, counts) * 1000,
+                "p95_ms": h.quantile(0.95, counts) * 1000,
+                "max_ms": peak * 1000,
+            })
+        return sorted(rows, key=lambda r: -r["total_ms"])
+
+    def collect(self) -> dict:
+        values = {}
+        for name, fn in list(self.collectors.items()):
+            try:
+                found = fn() or {}
+            except Exception:
+                continue  # a broken collector must not break the scrape
+            for key, v in found.items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    values[f"{name}_{key}"] = v
+        return values
+
+    def prometheus_text(self) -> str:
+        metric = f"{PREFIX}_stage_seconds"
+        lines = [
+            f"# HELP {metric} Time spent per request stage.",
+            f"# TYPE {metric} histogram",
+        ]
+        for stage, h in sorted(self.histograms.items()):
+            counts, n, total, _ = h.snapshot()
+            cumulative = 0
+            for le, c in zip(h.buckets + (float("inf"),), counts):
+                cumulative += c
+                bound = "+Inf" if le == float("inf") else repr(le)
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {total!r}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {n}')
+        for key, v in sorted(self.collect().items()):
+            name = f"{PREFIX}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {v!r}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+
+REGISTRY = Registry()
+
+
+class timer:
+    """Context manager that records its block under `stage`, even on exceptions
+    (Streamlit's st.rerun/st.stop end a page by raising)."""
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        REGISTRY.observe(self.stage, time.perf_counter() - self.start)
+
+
+def timed(stage: str = None):
+    """Decorator form of timer(); the stage defaults to the function name."""
+    def wrap(fn):
+        name = stage or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with timer(name):
+                return fn(*args, **kwargs)
+
+        return inner
+
+    return wrap
+
+
+def observe(stage: str, seconds: float):
+    REGISTRY.observe(stage, seconds)
+
+
+def add_collector(name: str, fn):
+    REGISTRY.add_collector(name, fn)
+
+
+# -----------------------------
+# /metrics endpoint
+# -----------------------------
+def start_server(host: str, port: int, registry: Registry = REGISTRY):
+    """Serve GET /metrics from a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+# -----------------------------
+# Profiling one rerun
+# -----------------------------
+def profile_call(fn, *args, **kwargs):
+    """Run fn under pyinstrument (if installed) or cProfile.
+
+    Returns (result, text report). Exceptions from fn (including Streamlit's
+    rerun/stop) propagate after the report is discarded.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler(interval=0.001)
+        profiler.start()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profiler.stop()
+        return result, profiler.output_text(unicode=True, color=False)
+
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+    return result, out.getvalue()
@@ -0,0 +1,284 @@
+# Model asset manager.
+#
+# Assets are listed in model_manifest.json (file name, URL, optional
+# SHA-256). Downloads stream in chunks to "<file>.part", resume with HTTP
+# Range requests after an interruption, are checked against the manifest
+# hash and only then renamed into place, so a half-written file is never
+# mistaken for a good one. A per-file lock keeps concurrent workers from
+# fetching the same asset twice. A file that does not match its pinned hash
+# is never used or silently replaced: ChecksumMismatch is raised instead.
+# Assets with no pinned hash are refused (UnpinnedAsset) unless
+# MODEL_ALLOW_UNPINNED is set.
+#
+#   python model_assets.py prefetch          # bake assets into an image
+#   python model_assets.py pin               # record hashes of local files
+#   MODEL_ALLOW_UNPINNED=1 python model_assets.py prefetch   # before the first pin
+#   python model_assets.py verify
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import config
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+MANIFEST_PATH = Path(__file__).with_name("model_manifest.json")
+MODEL_DIR = Path(config.MODEL_DIR)
+
+CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_ATTEMPTS = 3
+
+_verified = set()
+
+
+class AssetError(RuntimeError):
+    pass
+
+
+class IntegrityError(AssetError):
+    """The asset cannot be trusted; never fall back or retry silently."""
+
+
+class ChecksumMismatch(IntegrityError):
+    """A local or downloaded file differs from the pinned SHA-256."""
+
+
+class UnpinnedAsset(IntegrityError):
+    """The manifest has no SHA-256 for the asset and MODEL_ALLOW_UNPINNED is off."""
+
+
+def load_manifest() -> dict:
+    manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    if config.MOBILENET_INT8_ONNX_URL:
+        manifest["mobilenet_v2_int8"]["url"] = config.MOBILENET_INT8_ONNX_URL
+    return manifest
+
+
+def asset_path(name: str, model_dir=None) -> Path:
+    entry = load_manifest()[name]
+    return Path(model_dir or MODEL_DIR) / entry["file"]
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@contextmanager
+def file_lock(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "w") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _is_valid(path: Path, sha256: str = None) -> bool:
+    """True if the file is there and matches sha256 (when given).
+
+    Raises ChecksumMismatch for a present file with the wrong hash.
+    """
+    if not path.exists() or path.stat().st_size == 0:
+        return False
+    if not sha256:
+        return True
+    key = (str(path), sha256)
+    if key not in _verified:
+        actual = sha256_file(path)
+        if actual != sha256:
+            raise ChecksumMismatch(
+                f"{path} has SHA-256 {actual}, expected {sha256}; delete it to download "
+                f"it again, or run 'python model_assets.py pin' if the new file is trusted"
+            )
+        _verified.add(key)
+    return True
+
+
+def _total_size(r, offset: int):
+    """Expected final file size, -1 if unknown, None if the range is wrong."""
+    if r.status_code == 206:
+        # Content-Range: bytes <start>-<end>/<total>
+        rng = r.headers.get("Content-Range", "")
+        start = rng.split(" ", 1)[-1].split("-", 1)[0]
+        if not start.isdigit() or int(start) != offset:
+            return None
+        total = rng.rsplit("/", 1)[-1]
+        return int(total) if total.isdigit() else -1
+    length = r.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else -1
+
+
+def _fetch_part(url: str, part: Path) -> None:
+    offset = part.stat().st_size if part.exists() else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    from gbif_client import get_client  # pooled session; imports requests
+
+    r = get_client().get(url, headers=headers, stream=True, timeout=(10, 60))
+    with r:
+        if r.status_code == 416 and offset:
+            # Nothing past our offset. That means "complete" only if the
+            # server's size (Content-Range: bytes */N) is exactly ours.
+            total = r.headers.get("Content-Range", "").rsplit("/", 1)[-1]
+            if total.isdigit() and int(total) == offset:
+                return
+            r.close()
+            part.unlink(missing_ok=True)
+            return _fetch_part(url, part)  # start over without a Range header
+        r.raise_for_status()
+
+        if r.status_code == 206:
+            total = _total_size(r, offset)
+            if total is None:
+                part.unlink(missing_ok=True)
+                raise AssetError(f"Unexpected Content-Range from {url}")
+        else:
+            # No range support (or a fresh start): write from the beginning.
+            offset = 0
+            total = _total_size(r, 0)
+        with open(part, "ab" if offset else "wb") as fh:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                fh.write(chunk)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    size = part.stat().st_size
+    if total != -1 and size != total:
+        raise AssetError(f"Incomplete download of {url}: {size} of {total} bytes")
+
+
+def download_file(url: str, dest: Path, sha256: str = None) -> Path:
+    """Download url to dest atomically; resumes and verifies as needed."""
+    dest = Path(dest)
+    if _is_valid(dest, sha256):
+        return dest
+
+    with file_lock(dest):
+        # Another worker may have finished while we waited for the lock.
+        if _is_valid(dest, sha256):
+            return dest
+
+        part = dest.with_name(dest.name + ".part")
+        last_error = None
+        for _ in range(DOWNLOAD_ATTEMPTS):
+            try:
+                _fetch_part(url, part)
+                break
+            except Exception as e:
+                last_error = e
+        else:
+            raise AssetError(f"Could not download {url}: {last_error}")
+
+        if sha256:
+            actual = sha256_file(part)
+            if actual != sha256:
+                part.unlink(missing_ok=True)
+                raise ChecksumMismatch(
+                    f"Download of {url} has SHA-256 {actual}, expected {sha256}"
+                )
+            _verified.add((str(dest), sha256))
+        os.replace(part, dest)
+    return dest
+
+
+def ensure_asset(name: str, model_dir=None) -> Path:
+    entry = load_manifest()[name]
+    dest = Path(model_dir or MODEL_DIR) / entry["file"]
+    if not entry.get("sha256") and not config.MODEL_ALLOW_UNPINNED:
+        # A missing local-only asset still reports "missing" below.
+        if entry.get("url") or _is_valid(dest):
+            raise UnpinnedAsset(
+                f"{name} has no SHA-256 in {MANIFEST_PATH.name}; download it with "
+                f"MODEL_ALLOW_UNPINNED=1 and run 'python model_assets.py pin {name}'"
+            )
+    if entry.get("url"):
+        return download_file(entry["url"], dest, entry.get("sha256"))
+    if not _is_valid(dest, entry.get("sha256")):
+        raise AssetError(f"{dest} is missing and has no download URL")
+    return dest
+
+
+def invalidate(name: str, model_dir=None):
+    # For files that turned out unusable (e.g. left by an older release).
+    path = asset_path(name, model_dir)
+    with file_lock(path):
+        path.unlink(missing_ok=True)
+    _verified.difference_update({k for k in _verified if k[0] == str(path)})
+
+
+def prefetch(names=None, model_dir=None, log=print) -> int:
+    failures = 0
+    for name, entry in load_manifest().items():
+        if names and name not in names:
+            continue
+        if not entry.get("url") and not names:
+            continue  # optional asset without a source
+        try:
+            path = ensure_asset(name, model_dir)
+            log(f"ok      {name}: {path} ({path.stat().st_size / 1e6:.1f} MB)")
+        except Exception as e:
+            failures += 1
+            log(f"FAILED  {name}: {e}")
+    return failures
+
+
+def pin(model_dir=None, log=print, names=None):
+    manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    for name, entry in manifest.items():
+        if names and name not in names:
+            continue
+        path = Path(model_dir or MODEL_DIR) / entry["file"]
+        if path.exists():
+            entry["sha256"] = sha256_file(path)
+            log(f"pinned  {name}: {entry['sha256']}")
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+
+
+def verify(model_dir=None, log=print) -> int:
+    failures = 0
+    for name, entry in load_manifest().items():
+        path = Path(model_dir or MODEL_DIR) / entry["file"]
+        if not path.exists():
+            log(f"missing {name}: {path}")
+            continue
+        if not entry.get("sha256"):
+            log(f"unpinned {name}: {path}")
+        elif sha256_file(path) != entry["sha256"]:
+            failures += 1
+            log(f"BAD     {name}: {path}")
+        else:
+            log(f"ok      {name}: {path}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage model assets.")
+    parser.add_argument("command", choices=["prefetch", "pin", "verify"])
+    parser.add_argument("names", nargs="*", help="asset names (default: all)")
+    parser.add_argument("--dir", type=Path, default=None, help=f"asset directory (default: {MODEL_DIR})")
+    args = parser.parse_args(argv)
+
+    if args.command == "prefetch":
+        return 1 if prefetch(args.names, args.dir) else 0
+    if args.command == "pin":
+        pin(args.dir, names=args.names)
+        return 0
+    return 1 if verify(args.dir) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
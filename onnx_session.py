@@ -0,0 +1,144 @@
+# ONNX Runtime session factory with named tuning presets.
+#
+#   latency     one request at a time, every core on that request
+#   throughput  many concurrent sessions/processes, few threads each
+#   default     ONNX Runtime's own defaults
+#
+# Individual ORT_* variables in config.py override the chosen preset.
+# The optimized graph is saved next to the source model, so later cold
+# starts load it directly and skip graph optimization. Only the portable
+# levels (up to "extended") are saved; "all" adds hardware-specific layout
+# transforms, which are re-applied on load instead.
+
+import os
+from pathlib import Path
+
+import onnxruntime as ort
+
+import config
+
+_CPU_COUNT = os.cpu_count() or 1
+
+PRESETS = {
+    "default": {},
+    "latency": {
+        "intra_op_threads": _CPU_COUNT,
+        "inter_op_threads": 1,
+        "execution_mode": "sequential",
+        "graph_optimization": "all",
+        "cpu_mem_arena": True,
+        "mem_pattern": True,
+    },
+    "throughput": {
+        "intra_op_threads": min(2, _CPU_COUNT),
+        "inter_op_threads": 1,
+        "execution_mode": "sequential",
+        "graph_optimization": "all",
+        "cpu_mem_arena": True,
+        "mem_pattern": True,
+    },
+}
+
+OPT_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def resolve_settings(profile: str = None) -> dict:
+    profile = (profile or config.ORT_PROFILE or "default").lower()
+    if profile not in PRESETS:
+        raise ValueError(f"Unknown ONNX Runtime profile: {profile!r}")
+
+    settings = {
+        "profile": profile,
+        "graph_optimization": "all",
+        "save_optimized": config.ORT_SAVE_OPTIMIZED,
+        **PRESETS[profile],
+    }
+    overrides = {
+        "intra_op_threads": config.ORT_INTRA_OP_THREADS,
+        "inter_op_threads": config.ORT_INTER_OP_THREADS,
+        "execution_mode": config.ORT_EXECUTION_MODE,
+        "graph_optimization": config.ORT_GRAPH_OPTIMIZATION,
+        "cpu_mem_arena": config.ORT_CPU_MEM_ARENA,
+        "mem_pattern": config.ORT_MEM_PATTERN,
+    }
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    return settings
+
+
+def session_options(settings: dict) -> ort.SessionOptions:
+    so = ort.SessionOptions()
+    if settings.get("intra_op_threads"):
+        so.intra_op_num_threads = int(settings["intra_op_threads"])
+    if settings.get("inter_op_threads"):
+        so.inter_op_num_threads = int(settings["inter_op_threads"])
+    if settings.get("execution_mode"):
+        so.execution_mode = EXECUTION_MODES[settings["execution_mode"]]
+    if "cpu_mem_arena" in settings:
+        so.enable_cpu_mem_arena = bool(settings["cpu_mem_arena"])
+    if "mem_pattern" in settings:
+        so.enable_mem_pattern = bool(settings["mem_pattern"])
+    so.graph_optimization_level = OPT_LEVELS[settings["graph_optimization"]]
+    return so
+
+
+def _saved_level(settings: dict) -> str:
+    level = settings["graph_optimization"]
+    return "extended" if level == "all" else level
+
+
+def optimized_model_path(model_path, settings: dict) -> Path:
+    # Optimized graphs are specific to the ORT version and level that
+    # produced them, so both are part of the file name.
+    model_path = Path(model_path)
+    tag = f"ort{ort.__version__}-{_saved_level(settings)}"
+    return model_path.with_name(f"{model_path.stem}.{tag}.opt.onnx")
+
+
+def create_session(model_path, profile: str = None, providers=None):
+    settings = resolve_settings(profile)
+    providers = providers or ["CPUExecutionProvider"]
+    model_path = Path(model_path)
+
+    if not settings["save_optimized"] or settings["graph_optimization"] == "disable":
+        return ort.InferenceSession(
+            str(model_path), sess_options=session_options(settings), providers=providers
+        )
+
+    level = settings["graph_optimization"]
+    opt_path = optimized_model_path(model_path, settings)
+    if opt_path.exists() and opt_path.stat().st_mtime >= model_path.stat().st_mtime:
+        so = session_options(settings)
+        so.graph_optimization_level = OPT_LEVELS["all" if level == "all" else "disable"]
+        try:
+            return ort.InferenceSession(str(opt_path), sess_options=so, providers=providers)
+        except Exception:
+            # Unreadable or stale: rebuild it from the source model below.
+            opt_path.unlink(missing_ok=True)
+
+    # Write the portable optimized graph once, then build the real session
+    # from it.
+    so = session_options(settings)
+    so.graph_optimization_level = OPT_LEVELS[_saved_level(settings)]
+    tmp_path = opt_path.with_name(f"{opt_path.name}.{os.getpid()}.tmp")
+    so.optimized_model_filepath = str(tmp_path)
+    sess = ort.InferenceSession(str(model_path), sess_options=so, providers=providers)
+    try:
+        os.replace(tmp_path, opt_path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+        return sess
+
+    if level != _saved_level(settings):
+        so = session_options(settings)
+        sess = ort.InferenceSession(str(opt_path), sess_options=so, providers=providers)
+    return sess
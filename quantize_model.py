@@ -0,0 +1,101 @@
+# Build the int8 MobileNet variant offline.
+#
+#   python quantize_model.py                      # dynamic (weights only)
+#   python quantize_model.py --calibrate photos/  # static, calibrated
+#
+# Static quantization with a few hundred representative photos is usually
+# both faster and more accurate for a CNN than dynamic quantization.
+# Compare the result with `python -m benchmarks.model_variants`.
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    QuantFormat,
+    QuantType,
+    quantize_dynamic,
+    quantize_static,
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+import imagenet_model
+import model_assets
+
+
+class FolderCalibrationReader(CalibrationDataReader):
+    def __init__(self, folder, input_name: str, limit: int):
+        self._paths = list(imagenet_model.iter_image_paths(folder))[:limit]
+        self._input_name = input_name
+        self._it = iter(self._paths)
+
+    def get_next(self):
+        for path in self._it:
+            try:
+                with Image.open(path) as im:
+                    return {self._input_name: imagenet_model.preprocess_imagenet(im).copy()}
+            except Exception:
+                continue
+        return None
+
+    def rewind(self):
+        self._it = iter(self._paths)
+
+
+def quantize(src: Path, dst: Path, calibrate=None, limit: int = 300):
+    import onnxruntime as ort
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    # Next to dst, so the final os.replace never crosses filesystems (EXDEV).
+    with tempfile.TemporaryDirectory(dir=dst.parent) as tmp:
+        prepped = Path(tmp) / "prepped.onnx"
+        # MobileNet has static shapes; ONNX shape inference is enough.
+        quant_pre_process(str(src), str(prepped), skip_symbolic_shape=True)
+        out = Path(tmp) / "int8.onnx"
+
+        if calibrate:
+            input_name = ort.InferenceSession(
+                str(prepped), providers=["CPUExecutionProvider"]
+            ).get_inputs()[0].name
+            reader = FolderCalibrationReader(calibrate, input_name, limit)
+            if not reader._paths:
+                raise SystemExit(f"No calibration images found in {calibrate}")
+            quantize_static(
+                str(prepped),
+                str(out),
+                reader,
+                quant_format=QuantFormat.QDQ,
+                per_channel=True,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+            )
+        else:
+            quantize_dynamic(str(prepped), str(out), weight_type=QuantType.QUInt8)
+
+        os.replace(out, dst)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the int8 MobileNet variant.")
+    parser.add_argument("--src", type=Path, default=None, help="fp32 model (default: download)")
+    parser.add_argument("--dst", type=Path, default=imagenet_model.INT8_MODEL_PATH)
+    parser.add_argument("--calibrate", type=Path, default=None,
+                        help="folder of representative images for static quantization")
+    parser.add_argument("--limit", type=int, default=300, help="max calibration images")
+    args = parser.parse_args(argv)
+
+    src = args.src or imagenet_model.model_path_for("fp32")
+    quantize(src, args.dst, calibrate=args.calibrate, limit=args.limit)
+    print(f"Wrote {args.dst} ({args.dst.stat().st_size / 1e6:.1f} MB)")
+    name = imagenet_model.ASSET_NAMES["int8"]
+    if args.dst.resolve() == model_assets.asset_path(name).resolve():
+        print(f"Pin it before use: python model_assets.py pin {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# Identification results keyed by a hash of the uploaded bytes.
+# A repeat upload (or the same viral photo from another user) skips the
+# PIL decode and the ONNX run entirely.
+# Values are (top-k results, featured matches), both lists of tuples.
+# Keys carry the model variant that is actually loaded and a fingerprint of
+# the labels, label map and match threshold, so a changed catalog or
+# setting never serves results computed under the old one.
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import config
+from disk_cache import open_cache
+
+
+def image_digest(data) -> str:
+    # Accepts bytes or a memoryview, so callers need not copy the upload.
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def results_fingerprint(labels, label_map=None, min_prob: float = 0.0) -> str:
+    # The label map is built from the catalog, so it changes with any
+    # catalog edit that can change a featured match.
+    h = hashlib.blake2b(json.dumps([list(labels), min_prob]).encode("utf-8"), digest_size=8)
+    if label_map is not None:
+        h.update(json.dumps(label_map.targets).encode("utf-8"))
+        h.update(label_map.index.tobytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 1024, disk=None, namespace: str = ""):
+        self.max_entries = max_entries
+        self.disk = disk
+        self.namespace = namespace
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, digest: str, topk: int) -> str:
+        # v2: values carry featured matches as well as top-k labels.
+        return f"{self.namespace}:v2:{topk}:{digest}"
+
+    def get(self, digest: str, topk: int):
+        key = self._key(digest, topk)
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.disk is not None:
+            found = self.disk.get(key)
+            if found is not None:
+                results, featured = json.loads(found[0])
+                value = ([tuple(r) for r in results], [tuple(f) for f in featured])
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, digest: str, topk: int, value):
+        key = self._key(digest, topk)
+        self._remember(key, value)
+        if self.disk is not None:
+            self.disk.set(key, json.dumps(value))
+
+    def _remember(self, key: str, value):
+        with self._lock:
+            self._mem[key] = value
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._mem),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+def build_result_cache(variant: str = None, fingerprint: str = "") -> ResultCache:
+    # Results depend on the model, so each variant gets its own keys; pass
+    # the variant that was loaded (int8 falls back to fp32 when missing).
+    disk = open_cache(
+        config.RESULT_CACHE_PATH,
+        ttl=config.RESULT_CACHE_TTL,
+        max_entries=config.RESULT_CACHE_DISK_ENTRIES,
+    )
+    return ResultCache(
+        config.RESULT_CACHE_SIZE,
+        disk=disk,
+        namespace=f"{variant or config.MODEL_VARIANT}:{fingerprint}",
+    )
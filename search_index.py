@@ -0,0 +1,374 @@
+# Precomputed name indexes for the Featured collection.
+# Built once when animal_data is imported, so each keystroke in the
+# Name Explorer is a few dict/set lookups instead of a full scan.
+
+import heapq
+
+NGRAM = 3
+
+# SymSpell settings: deletes are only generated for the first
+# FUZZY_PREFIX_LENGTH characters, which keeps the dictionary small. More
+# than FUZZY_GROUP_SIZE names sharing a prefix (a genus, "red fox 1",
+# "red fox 2", ...) are split again by deletes of their last
+# FUZZY_PREFIX_LENGTH characters, so a lookup does not verify the whole
+# genus. At most FUZZY_MAX_CANDIDATES names are verified per lookup.
+FUZZY_MAX_DISTANCE = 2
+FUZZY_PREFIX_LENGTH = 7
+FUZZY_GROUP_SIZE = 64
+FUZZY_MAX_CANDIDATES = 1000
+
+# Type-ahead trie depth: longer prefixes are matched by filtering the
+# entries stored at this depth, which bounds the number of trie nodes.
+TRIE_DEPTH = 4
+
+# Match ranks: lower is better.
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_SUBSTRING = 2
+
+
+def normalize(s: str) -> str:
+    return (s or "").strip().lower()
+
+
+def _grams(text: str, n: int):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NameIndex:
+    def __init__(self, animals):
+        # Every distinct normalized name gets a term id; each term remembers
+        # which animals use it (an alias may be shared).
+        self._terms = []
+        self._term_animals = []
+        self._term_ids = {}
+        self._order = {}
+
+        # exact: normalized name -> term id
+        # grams[n]: n-gram -> set of term ids, for n = 1..NGRAM
+        self._grams = {n: {} for n in range(1, NGRAM + 1)}
+
+        for pos, (animal_id, a) in enumerate(animals.items()):
+            self._order[animal_id] = pos
+            fields = [
+                a.get("name", ""),
+                a.get("scientific_name", ""),
+                *(a.get("aliases", []) or []),
+            ]
+            for f in fields:
+                term = normalize(f)
+                if term:
+                    self._add(term, animal_id)
+
+    def _add(self, term: str, animal_id: str):
+        tid = self._term_ids.get(term)
+        if tid is None:
+            tid = len(self._terms)
+            self._term_ids[term] = tid
+            self._terms.append(term)
+            self._term_animals.append({})  # insertion-ordered set of animal ids
+            for n, table in self._grams.items():
+                for g in _grams(term, n):
+                    table.setdefault(g, set()).add(tid)
+        self._term_animals[tid][animal_id] = None
+
+    def __len__(self):
+        return len(self._terms)
+
+    def terms(self):
+        return list(self._terms)
+
+    def _candidate_terms(self, q: str):
+        n = min(len(q), NGRAM)
+        table = self._grams[n]
+        postings = []
+        for g in _grams(q, n):
+            p = table.get(g)
+            if not p:
+                return set()
+            postings.append(p)
+        postings.sort(key=len)
+        cands = set(postings[0])
+        for p in postings[1:]:
+            cands &= p
+            if not cands:
+                break
+        return cands
+
+    def search(self, query: str):
+        """Return animal ids whose names contain the query, best match first.
+
+        Exact matches rank before prefix matches, which rank before plain
+        substring matches; ties keep the collection order.
+        """
+        q = normalize(query)
+        if not q:
+            return []
+
+        best = {}
+        exact = self._term_ids.get(q)
+        if exact is not None:
+            for animal_id in self._term_animals[exact]:
+                best[animal_id] = RANK_EXACT
+
+        for tid in self._candidate_terms(q):
+            term = self._terms[tid]
+            # n-grams only give candidates; confirm the real substring.
+            if q not in term:
+                continue
+            rank = RANK_PREFIX if term.startswith(q) else RANK_SUBSTRING
+            for animal_id in self._term_animals[tid]:
+                if rank < best.get(animal_id, RANK_SUBSTRING + 1):
+                    best[animal_id] = rank
+
+        return sorted(best, key=lambda k: (best[k], self._order[k]))
+
+
+def _deletes(word: str, max_distance: int):
+    """word and its delete variants, fewest deletions first."""
+    out = [word]
+    seen = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1
+                    for i in range(len(w))} - seen
+        seen |= frontier
+        out.extend(frontier)
+    return out
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count as one edit).
+
+    Returns max_distance + 1 as soon as the distance is known to exceed it.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    # Shared prefixes and suffixes never change the distance.
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while (end < len(a) - start and end < len(b) - start
+           and a[-1 - end] == b[-1 - end]):
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if not a or not b:
+        return min(len(a) + len(b), max_distance + 1)
+
+    # Only cells within max_distance of the diagonal can stay under the
+    # limit; everything outside the band counts as "too far".
+    k = max_distance
+    far = k + 1
+    m = len(b)
+    prev2 = None
+    prev = [j if j <= k else far for j in range(m + 1)]
+    for i in range(1, len(a) + 1):
+        lo, hi = max(1, i - k), min(m, i + k)
+        cur = [far] * (m + 1)
+        if i <= k:
+            cur[0] = i
+        row_min = cur[0]
+        ai = a[i - 1]
+        for j in range(lo, hi + 1):
+            v = prev[j - 1] + (ai != b[j - 1])
+            if prev[j] + 1 < v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1 < v:
+                v = cur[j - 1] + 1
+            if (prev2 is not None and j > 1
+                    and ai == b[j - 2] and a[i - 2] == b[j - 1] and prev2[j - 2] + 1 < v):
+                v = prev2[j - 2] + 1
+            cur[j] = v if v < far else far
+            if v < row_min:
+                row_min = v
+        if row_min > k:
+            return far
+        prev2, prev = prev, cur
+    return min(prev[-1], max_distance + 1)
+
+
+class FuzzyNameIndex:
+    """SymSpell-style deletion dictionary over the indexed names."""
+
+    def __init__(self, name_index: NameIndex,
+                 max_distance: int = FUZZY_MAX_DISTANCE,
+                 prefix_length: int = FUZZY_PREFIX_LENGTH,
+                 group_size: int = FUZZY_GROUP_SIZE,
+                 max_candidates: int = FUZZY_MAX_CANDIDATES):
+        self._names = name_index
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.max_candidates = max_candidates
+        # Terms sharing a prefix share its delete variants.
+        by_prefix = {}
+        for tid, term in enumerate(name_index._terms):
+            by_prefix.setdefault(term[:prefix_length], []).append(tid)
+
+        # delete variant of a term prefix -> term ids (small groups) or
+        # prefixes (large groups); large prefix -> suffix delete -> term ids
+        self._deletes = {}
+        self._group_deletes = {}
+        self._groups = {}
+        for prefix, tids in by_prefix.items():
+            if len(tids) > group_size:
+                self._groups[prefix] = self._index(
+                    {}, ((name_index._terms[tid][-prefix_length:], [tid]) for tid in tids))
+                self._index(self._group_deletes, [(prefix, [prefix])])
+            else:
+                self._index(self._deletes, [(prefix, tids)])
+
+    def _index(self, table: dict, parts) -> dict:
+        for part, values in parts:
+            for d in _deletes(part, self.max_distance):
+                bucket = table.get(d)
+                if bucket is None:
+                    table[d] = list(values)
+                else:
+                    bucket.extend(values)
+        return table
+
+    def _candidates(self, q: str, max_distance: int):
+        """Term ids whose prefix (and, in large groups, suffix) shares a
+        delete variant with the query's, closest variants first."""
+        suffix_deletes = None
+        for d in _deletes(q[:self.prefix_length], max_distance):
+            yield from self._deletes.get(d, ())
+            for prefix in self._group_deletes.get(d, ()):
+                if suffix_deletes is None:
+                    suffix_deletes = _deletes(q[-self.prefix_length:], max_distance)
+                group = self._groups[prefix]
+                for s in suffix_deletes:
+                    yield from group.get(s, ())
+
+    def lookup(self, query: str, max_distance: int = None, limit: int = 10):
+        """Return [(animal_id, matched_name, distance), ...], closest first.
+
+        Each animal appears once, with its closest name.
+        """
+        q = normalize(query)
+        if not q:
+            return []
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        terms = self._names._terms
+        seen = set()
+        found = []
+        for tid in self._candidates(q, max_distance):
+            if tid in seen:
+                continue
+            seen.add(tid)
+            dist = edit_distance(q, terms[tid], max_distance)
+            if dist <= max_distance:
+                found.append((dist, tid))
+            if len(seen) >= self.max_candidates:
+                break
+
+        order = self._names._order
+        best = {}
+        for dist, tid in found:
+            term = terms[tid]
+            for animal_id in self._names._term_animals[tid]:
+                cur = best.get(animal_id)
+                if cur is None or dist < cur[1]:
+                    best[animal_id] = (term, dist)
+
+        ranked = heapq.nsmallest(limit, best.items(), key=lambda kv: (kv[1][1], order[kv[0]]))
+        return [(animal_id, term, dist) for animal_id, (term, dist) in ranked]
+
+
+class PrefixIndex:
+    """Trie over every indexed name and every word inside it, for type-ahead.
+
+    "sno" and "owl" both complete "snowy owl". Entries are (term id, start
+    offset of the word) pairs, kept at depth min(len(key), TRIE_DEPTH).
+    """
+
+    def __init__(self, name_index: NameIndex, depth: int = TRIE_DEPTH):
+        self._names = name_index
+        self.depth = depth
+        self._root = {}
+        for tid, term in enumerate(name_index._terms):
+            starts = [0] + [i + 1 for i, ch in enumerate(term) if ch in " -"]
+            for start in starts:
+                node = self._root
+                for ch in term[start:start + depth]:
+                    node = node.setdefault(ch, {})
+                node.setdefault("", []).append((tid, start))
+
+    def candidates(self, q: str):
+        """All (term id, start) entries whose word starts with q."""
+        node = self._root
+        for ch in q[:self.depth]:
+            node = node.get(ch)
+            if node is None:
+                return []
+        out = []
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            for k, v in n.items():
+                if k:
+                    stack.append(v)
+                else:
+                    out.extend(v)
+        if len(q) > self.depth:
+            out = self.narrow(out, q)
+        return out
+
+    def narrow(self, entries, q: str):
+        terms = self._names._terms
+        return [(tid, start) for tid, start in entries if terms[tid].startswith(q, start)]
+
+    def rank(self, entries, q: str, limit: int = 8):
+        """Animal ids for the entries: whole-name matches before word matches."""
+        terms = self._names._terms
+        best = {}
+        for tid, start in entries:
+            rank = RANK_EXACT if terms[tid] == q else RANK_PREFIX if start == 0 else RANK_SUBSTRING
+            for animal_id in self._names._term_animals[tid]:
+                if rank < best.get(animal_id, RANK_SUBSTRING + 1):
+                    best[animal_id] = rank
+        order = self._names._order
+        return heapq.nsmallest(limit, best, key=lambda k: (best[k], order[k]))
+
+
+class TypeAhead:
+    """Per-session completion state.
+
+    When the query extends the previous one, the previous candidates are
+    narrowed instead of walking the trie again; any other edit starts over.
+    """
+
+    def __init__(self, prefix_index: PrefixIndex):
+        self._index = prefix_index
+        self._query = None
+        self._entries = []
+
+    def suggest(self, query: str, limit: int = 8):
+        q = normalize(query)
+        if not q:
+            self._query, self._entries = None, []
+            return []
+        if self._query is not None and q.startswith(self._query):
+            if q != self._query:
+                self._entries = self._index.narrow(self._entries, q)
+        else:
+            self._entries = self._index.candidates(q)
+        self._query = q
+        return self._index.rank(self._entries, q, limit)
+
+
+def build_name_index(animals) -> NameIndex:
+    return NameIndex(animals)
+
+
+def build_fuzzy_index(name_index: NameIndex) -> FuzzyNameIndex:
+    return FuzzyNameIndex(name_index)
+
+
+def build_prefix_index(name_index: NameIndex) -> PrefixIndex:
+    return PrefixIndex(name_index)
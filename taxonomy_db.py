@@ -0,0 +1,432 @@
+# Local copy of the GBIF backbone taxonomy (SQLite + FTS5).
+#
+#   python taxonomy_db.py import backbone.zip --kingdom Animalia
+#   python taxonomy_db.py search "snowy owl"
+#
+# The importer streams Taxon.tsv and VernacularName.tsv out of a Darwin Core
+# archive (the zip, or a folder it was unpacked into) and inserts them in
+# fixed-size chunks, so memory stays flat however large the archive is.
+# It writes to a temporary file and renames it into place when done; a
+# running app keeps reading the old database until then.
+#
+# TaxonomyDB answers species_search / species_match in the same JSON shape
+# as the GBIF API, so app.py can ask it first and only go online when it
+# has no answer (TAXONOMY_DB_PATH).
+
+import argparse
+import csv
+import io
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+
+import config
+
+_SCHEMA = """
+CREATE TABLE taxon (
+    key INTEGER PRIMARY KEY,
+    parent_key INTEGER,
+    accepted_key INTEGER,
+    scientific_name TEXT NOT NULL,
+    canonical_name TEXT,
+    authorship TEXT,
+    rank TEXT,
+    status TEXT,
+    kingdom TEXT,
+    phylum TEXT,
+    class TEXT,
+    "order" TEXT,
+    family TEXT,
+    genus TEXT
+);
+CREATE TABLE vernacular (
+    taxon_key INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    language TEXT
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Built after the bulk load; indexing as rows arrive is much slower.
+_INDEXES = """
+CREATE INDEX taxon_canonical ON taxon (canonical_name COLLATE NOCASE);
+CREATE INDEX taxon_scientific ON taxon (scientific_name COLLATE NOCASE);
+CREATE INDEX vernacular_taxon ON vernacular (taxon_key);
+CREATE INDEX vernacular_name ON vernacular (name COLLATE NOCASE);
+CREATE VIRTUAL TABLE name_fts USING fts5 (
+    name, taxon_key UNINDEXED, kind UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+);
+INSERT INTO name_fts (name, taxon_key, kind)
+    SELECT canonical_name, key, 's' FROM taxon WHERE canonical_name <> '';
+INSERT INTO name_fts (name, taxon_key, kind)
+    SELECT name, taxon_key, 'v' FROM vernacular;
+INSERT INTO name_fts (name_fts) VALUES ('optimize');
+"""
+
+# Darwin Core term -> taxon column.
+TAXON_TERMS = {
+    "taxonID": "key",
+    "parentNameUsageID": "parent_key",
+    "acceptedNameUsageID": "accepted_key",
+    "scientificName": "scientific_name",
+    "canonicalName": "canonical_name",
+    "scientificNameAuthorship": "authorship",
+    "taxonRank": "rank",
+    "taxonomicStatus": "status",
+    "kingdom": "kingdom",
+    "phylum": "phylum",
+    "class": "class",
+    "order": "order",
+    "family": "family",
+    "genus": "genus",
+}
+TAXON_COLUMNS = list(TAXON_TERMS.values())
+INT_COLUMNS = {"key", "parent_key", "accepted_key"}
+
+CHUNK_ROWS = 50_000
+# Name rows ranked per search; see TaxonomyDB.species_search.
+SEARCH_CANDIDATES = 10_000
+
+
+class TaxonomyError(Exception):
+    pass
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def _open_member(source: Path, name: str):
+    """Text stream for Taxon.tsv etc. inside a zip or an unpacked folder."""
+    if source.is_dir():
+        path = next((p for p in source.iterdir() if p.name.lower() == name.lower()), None)
+        if path is None:
+            raise TaxonomyError(f"{name} not found in {source}")
+        with open(path, encoding="utf-8", newline="") as f:
+            yield f
+        return
+    with zipfile.ZipFile(source) as zf:
+        member = next((n for n in zf.namelist() if n.rsplit("/", 1)[-1].lower() == name.lower()), None)
+        if member is None:
+            raise TaxonomyError(f"{name} not found in {source}")
+        with zf.open(member) as raw:
+            yield io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def _has_member(source: Path, name: str) -> bool:
+    try:
+        with _open_member(source, name):
+            return True
+    except TaxonomyError:
+        return False
+
+
+def _rows(stream):
+    # GBIF archives are unquoted TSV with a header row of Darwin Core terms
+    # (sometimes written as full URIs).
+    csv.field_size_limit(sys.maxsize)
+    reader = csv.reader(stream, delimiter="\t", quoting=csv.QUOTE_NONE)
+    header = [h.rsplit("/", 1)[-1].strip() for h in next(reader, [])]
+    for row in reader:
+        yield dict(zip(header, row))
+
+
+def _chunks(iterable, size: int):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_archive(source, db_path, kingdoms=None, languages=None,
+                   chunk_rows: int = CHUNK_ROWS, log=print) -> dict:
+    """Import a backbone archive into a new SQLite file at `db_path`.
+
+    kingdoms / languages (optional) restrict taxa and vernacular names.
+    Returns row counts.
+    """
+    source = Path(source)
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = db_path.with_name(f"{db_path.name}.{os.getpid()}.importing")
+    if tmp.exists():
+        tmp.unlink()
+    kingdoms = {k.lower() for k in kingdoms} if kingdoms else None
+    languages = {lang.lower() for lang in languages} if languages else None
+
+    conn = sqlite3.connect(tmp, isolation_level=None)
+    counts = {"taxa": 0, "vernacular_names": 0}
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(_SCHEMA)
+        start = time.perf_counter()
+
+        placeholders = ", ".join("?" for _ in TAXON_COLUMNS)
+        columns = ", ".join(f'"{c}"' for c in TAXON_COLUMNS)
+        insert_taxon = f"INSERT OR REPLACE INTO taxon ({columns}) VALUES ({placeholders})"
+        with _open_member(source, "Taxon.tsv") as f:
+            for chunk in _chunks(_rows(f), chunk_rows):
+                batch = []
+                for rec in chunk:
+                    if kingdoms and rec.get("kingdom", "").lower() not in kingdoms:
+                        continue
+                    values = []
+                    for term, col in TAXON_TERMS.items():
+                        v = rec.get(term) or None
+                        values.append(_int(v) if col in INT_COLUMNS else v)
+                    if values[0] is None or not values[3]:
+                        continue  # no usable key or name
+                    batch.append(values)
+                conn.execute("BEGIN")
+                conn.executemany(insert_taxon, batch)
+                conn.execute("COMMIT")
+                counts["taxa"] += len(batch)
+                log(f"taxa: {counts['taxa']:,}")
+
+        if _has_member(source, "VernacularName.tsv"):
+            # Only names for imported taxa; checked in SQL, so no id set in memory.
+            insert_name = (
+                "INSERT INTO vernacular (taxon_key, name, language) "
+                "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM taxon WHERE key = ?)"
+            )
+            with _open_member(source, "VernacularName.tsv") as f:
+                for chunk in _chunks(_rows(f), chunk_rows):
+                    batch = []
+                    for rec in chunk:
+                        key = _int(rec.get("taxonID"))
+                        name = (rec.get("vernacularName") or "").strip()
+                        lang = (rec.get("language") or "").lower() or None
+                        if key is None or not name:
+                            continue
+                        if languages and lang not in languages:
+                            continue
+                        batch.append((key, name, lang, key))
+                    conn.execute("BEGIN")
+                    before = conn.total_changes
+                    conn.executemany(insert_name, batch)
+                    counts["vernacular_names"] += conn.total_changes - before
+                    conn.execute("COMMIT")
+                    log(f"vernacular names: {counts['vernacular_names']:,}")
+
+        log("building indexes")
+        conn.executescript(f"BEGIN; {_INDEXES} COMMIT;")
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ("source", source.name),
+            ("imported_at", str(int(time.time()))),
+            ("taxa", str(counts["taxa"])),
+            ("vernacular_names", str(counts["vernacular_names"])),
+        ])
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+        conn.close()
+        os.replace(tmp, db_path)
+        counts["seconds"] = time.perf_counter() - start
+        return counts
+    except BaseException:
+        conn.close()
+        if tmp.exists():
+            tmp.unlink()
+        raise
+
+
+def _fts_query(text: str) -> str:
+    # Every word must match, each as a prefix: "snow ow" finds "Snowy Owl".
+    # Single letters match whole words only; as prefixes they hit most rows.
+    words = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{w}"*' if len(w) > 1 else f'"{w}"' for w in words)
+
+
+class TaxonomyDB:
+    def __init__(self, path):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise TaxonomyError(f"{path} does not exist")
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # as_uri() percent-encodes "?", "#" and "%" in the path.
+            uri = self.path.resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _vernacular(self, keys, per_taxon: int = 5):
+        if not keys:
+            return {}
+        marks = ", ".join("?" for _ in keys)
+        rows = self._conn().execute(
+            f"SELECT taxon_key, name, language FROM vernacular WHERE taxon_key IN ({marks}) "
+            "ORDER BY language = 'en' DESC, rowid",
+            list(keys),
+        )
+        out = {}
+        for r in rows:
+            names = out.setdefault(r["taxon_key"], [])
+            if len(names) < per_taxon:
+                names.append({"vernacularName": r["name"], "language": r["language"] or ""})
+        return out
+
+    @staticmethod
+    def _as_gbif(row) -> dict:
+        # Field names as in the GBIF species API.
+        return {
+            "key": row["key"],
+            "parentKey": row["parent_key"],
+            "acceptedKey": row["accepted_key"],
+            "scientificName": row["scientific_name"],
+            "canonicalName": row["canonical_name"],
+            "authorship": row["authorship"] or "",
+            "rank": (row["rank"] or "").upper(),
+            "taxonomicStatus": (row["status"] or "").upper(),
+            "kingdom": row["kingdom"],
+            "phylum": row["phylum"],
+            "class": row["class"],
+            "order": row["order"],
+            "family": row["family"],
+            "genus": row["genus"],
+            "source": "local",
+        }
+
+    def species_search(self, query: str, limit: int = 10):
+        match = _fts_query(query)
+        if not match:
+            return []
+        norm = " ".join(query.lower().split())
+        # FTS candidates are capped at the best SEARCH_CANDIDATES by bm25, so
+        # the join below stays small for a short prefix that matches most of
+        # the backbone; exact names come from the B-tree indexes and are
+        # always included. One row per taxon: exact hits first, then
+        # accepted names, then bm25.
+        rows = self._conn().execute(
+            """
+            WITH m AS (
+                SELECT * FROM (
+                    SELECT taxon_key, rank AS score, 0 AS exact
+                    FROM name_fts WHERE name_fts MATCH ? ORDER BY rank LIMIT ?
+                )
+                UNION ALL
+                SELECT key, 0, 1 FROM taxon WHERE canonical_name = ? COLLATE NOCASE
+                UNION ALL
+                SELECT taxon_key, 0, 1 FROM vernacular WHERE name = ? COLLATE NOCASE
+            ),
+            hits AS (
+                SELECT taxon_key, MIN(score) AS score, MAX(exact) AS exact
+                FROM m GROUP BY taxon_key
+            )
+            SELECT t.* FROM hits JOIN taxon t ON t.key = hits.taxon_key
+            ORDER BY hits.exact DESC, upper(t.status) = 'ACCEPTED' DESC, hits.score
+            LIMIT ?
+            """,
+            (match, SEARCH_CANDIDATES, norm, norm, limit),
+        ).fetchall()
+        results = [self._as_gbif(r) for r in rows]
+        names = self._vernacular([r["key"] for r in results])
+        for r in results:
+            r["vernacularNames"] = names.get(r["key"], [])
+        return results
+
+    def species_match(self, name: str) -> dict:
+        """Exact scientific/canonical name match, like GBIF /species/match.
+
+        Accepted names win over synonyms; a synonym reports its accepted
+        usage, as GBIF does.
+        """
+        name = " ".join((name or "").split())
+        row = self._conn().execute(
+            """
+            SELECT * FROM taxon
+            WHERE canonical_name = ? COLLATE NOCASE OR scientific_name = ? COLLATE NOCASE
+            ORDER BY upper(status) = 'ACCEPTED' DESC, canonical_name = ? COLLATE NOCASE DESC
+            LIMIT 1
+            """,
+            (name, name, name),
+        ).fetchone() if name else None
+        if row is None:
+            return {"matchType": "NONE", "confidence": 100, "synonym": False, "source": "local"}
+
+        t = self._as_gbif(row)
+        result = {
+            "usageKey": t["key"],
+            "scientificName": t["scientificName"],
+            "canonicalName": t["canonicalName"],
+            "rank": t["rank"],
+            "status": t["taxonomicStatus"],
+            "confidence": 100,
+            "matchType": "EXACT",
+            "synonym": t["taxonomicStatus"] not in ("", "ACCEPTED", "DOUBTFUL"),
+            "source": "local",
+        }
+        for k in ("kingdom", "phylum", "class", "order", "family", "genus"):
+            result[k] = t[k]
+        if result["synonym"] and t["acceptedKey"]:
+            result["acceptedUsageKey"] = t["acceptedKey"]
+        return result
+
+    def stats(self) -> dict:
+        return dict(self._conn().execute("SELECT key, value FROM meta").fetchall())
+
+
+def open_taxonomy_db(path=None):
+    """TaxonomyDB for `path` (default TAXONOMY_DB_PATH), or None if not set up."""
+    path = path if path is not None else config.TAXONOMY_DB_PATH
+    if not path or not Path(path).exists():
+        return None
+    return TaxonomyDB(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local GBIF backbone taxonomy.")
+    parser.add_argument("--db", type=Path, default=Path(config.TAXONOMY_DB_PATH or ".cache/taxonomy.sqlite"))
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="import a Darwin Core archive (zip or folder)")
+    imp.add_argument("archive", type=Path)
+    imp.add_argument("--kingdom", action="append", default=None,
+                     help="only import this kingdom (repeatable), e.g. Animalia")
+    imp.add_argument("--language", action="append", default=None,
+                     help="only import vernacular names in this language (repeatable), e.g. en")
+    imp.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    s = sub.add_parser("search", help="query the local database")
+    s.add_argument("query")
+    s.add_argument("--limit", type=int, default=10)
+    m = sub.add_parser("match", help="exact name match")
+    m.add_argument("name")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "import":
+        counts = import_archive(args.archive, args.db, args.kingdom, args.language,
+                                args.chunk_rows, log=lambda msg: print(msg, file=sys.stderr))
+        print(f"Imported {counts['taxa']:,} taxa and {counts['vernacular_names']:,} "
+              f"vernacular names into {args.db} in {counts['seconds']:.1f}s")
+        return 0
+
+    db = TaxonomyDB(args.db)
+    if args.cmd == "search":
+        for r in db.species_search(args.query, args.limit):
+            common = ", ".join(v["vernacularName"] for v in r["vernacularNames"][:2])
+            print(f"{r['key']}\t{r['canonicalName']}\t{r['rank']}\t{r['taxonomicStatus']}\t{common}")
+    else:
+        print(db.species_match(args.name))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+import animal_store
+from animal_store import FEATURED_SOURCE, AnimalStore, build, load_featured, read_source
+
+TIGER = {"name": "Tiger", "category": "mammals", "aliases": ["Panthera tigris"]}
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    path = tmp_path / "featured_animals.py"
+    path.write_text("# stand-in\n")
+    monkeypatch.setattr(animal_store, "SOURCE_PATH", path)
+    return path
+
+
+def touch_newer(path, than):
+    t = than.stat().st_mtime + 10
+    os.utime(path, (t, t))
+
+
+def test_round_trip_records_source(tmp_path):
+    path = build([("tiger", TIGER)], tmp_path / "s.bin", source="catalog.jsonl")
+    store = AnimalStore(path)
+    assert store["tiger"]["name"] == "Tiger"
+    assert store["tiger"]["aliases"] == ["Panthera tigris"]
+    assert store.source == read_source(path) == "catalog.jsonl"
+    assert read_source(tmp_path / "missing.bin") is None
+
+
+def test_featured_store_is_rebuilt_when_source_changes(tmp_path, source):
+    path = build([("old", TIGER)], tmp_path / "s.bin")
+    assert read_source(path) == FEATURED_SOURCE
+    touch_newer(source, path)
+    store = load_featured(path)
+    assert "old" not in store and "tiger" in store
+
+
+def test_jsonl_store_is_kept_when_source_changes(tmp_path, source):
+    path = build([("catalog_only", TIGER)], tmp_path / "s.bin", source="catalog.jsonl")
+    touch_newer(source, path)
+    store = load_featured(path)
+    assert list(store) == ["catalog_only"]
+    assert read_source(path) == "catalog.jsonl"
+
+
+def test_unreadable_jsonl_store_is_not_replaced(tmp_path, source, monkeypatch):
+    path = build([("catalog_only", TIGER)], tmp_path / "s.bin", source="catalog.jsonl")
+    before = path.read_bytes()
+    monkeypatch.setattr(animal_store, "FORMAT_VERSION", animal_store.FORMAT_VERSION + 1)
+    with pytest.warns(UserWarning, match="catalog.jsonl"):
+        data = load_featured(path)
+    assert isinstance(data, dict) and "tiger" in data
+    assert path.read_bytes() == before
+
+
+def test_store_without_recorded_source_counts_as_featured(tmp_path, source):
+    # Written before the header had a source.
+    path = build([("old", TIGER)], tmp_path / "s.bin")
+    raw = path.read_bytes()
+    m = len(animal_store.MAGIC)
+    hlen = int.from_bytes(raw[m:m + 4], "little")
+    header = json.loads(raw[m + 4:m + 4 + hlen])
+    del header["source"]
+    padded = json.dumps(header).encode().ljust(hlen)
+    path.write_bytes(raw[:m + 4] + padded + raw[m + 4 + hlen:])
+    assert AnimalStore(path).source == FEATURED_SOURCE
+    touch_newer(source, path)
+    assert "tiger" in load_featured(path)
@@ -0,0 +1,70 @@
+import csv
+import json
+
+import pytest
+
+from batch_identify import ResultWriter, _cut_partial_line, load_checkpoint
+
+
+def write_rows(path, fmt, rows):
+    writer = ResultWriter(path, fmt)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+
+
+ROWS = [
+    {"path": "a.jpg", "label": "tiger", "probability": 0.9},
+    {"path": "b.jpg", "error": "OSError: truncated"},
+    {"path": "c.jpg", "label": "lion", "probability": 0.8},
+]
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_errors_are_not_done(tmp_path, fmt):
+    path = tmp_path / f"out.{fmt}"
+    write_rows(path, fmt, ROWS)
+    assert load_checkpoint(path, fmt) == {"a.jpg", "c.jpg"}
+    # A retry that succeeds is appended and counts.
+    write_rows(path, fmt, [{"path": "b.jpg", "label": "owl", "probability": 0.5}])
+    assert load_checkpoint(path, fmt) == {"a.jpg", "b.jpg", "c.jpg"}
+
+
+def test_partial_last_line_is_cut(tmp_path):
+    path = tmp_path / "out.jsonl"
+    write_rows(path, "jsonl", ROWS)
+    whole = path.read_bytes()
+    with open(path, "ab") as fh:
+        fh.write(b'{"path": "d.jpg", "lab')
+    assert load_checkpoint(path, "jsonl") == {"a.jpg", "c.jpg"}
+    assert path.read_bytes() == whole
+
+
+@pytest.mark.parametrize("data, kept", [
+    (b"", b""),
+    (b"no newline at all", b""),
+    (b"one\n", b"one\n"),
+    (b"one\n" + b"x" * 50, b"one\n"),
+    (b"x" * 50 + b"\n" + b"y" * 7, b"x" * 50 + b"\n"),
+])
+def test_cut_scans_back_in_chunks(tmp_path, data, kept):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(data)
+    _cut_partial_line(path, chunk_size=4)
+    assert path.read_bytes() == kept
+
+
+def test_csv_rows_survive_a_cut(tmp_path):
+    path = tmp_path / "out.csv"
+    write_rows(path, "csv", ROWS)
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write("d.jpg,owl,0.")
+    assert load_checkpoint(path, "csv") == {"a.jpg", "c.jpg"}
+    with open(path, encoding="utf-8", newline="") as fh:
+        assert [r["path"] for r in csv.DictReader(fh)] == ["a.jpg", "b.jpg", "c.jpg"]
+
+
+def test_unparseable_lines_are_skipped(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text("not json\n" + json.dumps(ROWS[0]) + "\n[1]\n", encoding="utf-8")
+    assert load_checkpoint(path, "jsonl") == {"a.jpg"}
@@ -0,0 +1,72 @@
+import time
+
+from disk_cache import DiskCache, make_key
+
+
+def count(cache):
+    return cache._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def test_keys_ignore_case_whitespace_and_order():
+    assert make_key("species/search", {"q": " Snowy  Owl", "limit": 5}) == \
+        make_key("species/search", {"limit": 5, "q": "snowy owl"})
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskCache(tmp_path / "c.sqlite", max_entries=3, evict_every=1)
+    for k in "abc":
+        cache.set(k, b"x")
+        time.sleep(0.01)
+    assert cache.get("a") is not None  # a is now the most recent
+    cache.set("d", b"x")
+    assert count(cache) == 3
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_byte_bound(tmp_path):
+    cache = DiskCache(tmp_path / "c.sqlite", max_bytes=100, evict_every=1)
+    for i in range(5):
+        cache.set(str(i), b"x" * 40)
+        time.sleep(0.01)
+    assert count(cache) == 2
+    assert cache.get("4") is not None
+
+
+def test_bounds_are_checked_every_n_writes(tmp_path):
+    cache = DiskCache(tmp_path / "c.sqlite", max_entries=5, evict_every=10)
+    for i in range(25):
+        cache.set(str(i), b"x")
+        assert count(cache) <= 5 + 10
+    # The check on write 21 trimmed to 5; four writes came after it.
+    assert count(cache) == 9
+
+
+def test_first_write_trims_an_oversized_cache(tmp_path):
+    path = tmp_path / "c.sqlite"
+    big = DiskCache(path, max_entries=100)
+    for i in range(20):
+        big.set(str(i), b"x")
+    small = DiskCache(path, max_entries=5, evict_every=1000)
+    small.set("new", b"x")
+    assert count(small) == 5
+
+
+def test_expired_entries(tmp_path):
+    cache = DiskCache(tmp_path / "c.sqlite", ttl=0.05, stale_ttl=0.05, evict_every=1)
+    cache.set("old", b"x")
+    time.sleep(0.06)
+    value, age = cache.get("old")  # stale but still served
+    assert value == b"x" and age > 0.05
+    time.sleep(0.05)
+    assert cache.get("old") is None
+    cache.set("new", b"x")
+    assert count(cache) == 1
+
+
+def test_stored_at_is_indexed(tmp_path):
+    cache = DiskCache(tmp_path / "c.sqlite")
+    plan = cache._conn().execute(
+        "EXPLAIN QUERY PLAN DELETE FROM cache WHERE stored_at < ?", (0,)
+    ).fetchall()
+    assert any("cache_stored" in row[-1] for row in plan)
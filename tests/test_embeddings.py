@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import embeddings
+from embeddings import EmbeddingError, ReferenceIndex, build_index, open_reference_index
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    rng = np.random.default_rng(0)
+    path = tmp_path / "featured"
+    build_index(["tiger", "lion", "axolotl"], rng.normal(size=(3, 8)), path,
+                model="mobilenet_v2.embed.onnx")
+    return path
+
+
+def test_search_finds_the_same_vector(index_path):
+    index = ReferenceIndex(index_path, model="mobilenet_v2.embed.onnx")
+    query = np.asarray(index.matrix[1], dtype=np.float32)
+    assert index.search(query, k=1)[0][0] == index.ids[1]
+
+
+def test_index_from_another_model_is_refused(index_path):
+    with pytest.raises(EmbeddingError, match="mobilenet_v2.embed.onnx"):
+        ReferenceIndex(index_path, model="mobilenet_v2.int8.embed.onnx")
+    assert open_reference_index(index_path, model="mobilenet_v2.int8.embed.onnx") is None
+    assert open_reference_index(index_path, model="mobilenet_v2.embed.onnx") is not None
+    assert open_reference_index(index_path) is not None
+
+
+def test_references_are_embedded_in_batches_and_closed(monkeypatch):
+    batches = []
+
+    def fake_embed(sess, batch):
+        batches.append(len(batch))
+        return embeddings.normalize_rows(batch.reshape(len(batch), -1)[:, :4] + 1)
+
+    monkeypatch.setattr(embeddings, "embed_batch", fake_embed)
+    opened = []
+
+    def references():
+        for i in range(5):
+            image = Image.new("RGB", (32, 32), (i * 40, 0, 0))
+            opened.append(image)
+            yield f"animal{i}", image
+
+    ids, vectors = embeddings.embed_references(None, references(), batch_size=2)
+    assert ids == [f"animal{i}" for i in range(5)]
+    assert vectors.shape == (5, 4)
+    assert batches == [2, 2, 1]
+    for image in opened:
+        with pytest.raises(ValueError):
+            image.load()  # closed
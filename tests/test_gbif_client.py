@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from gbif_client import FlightTimeout, GbifClient, SingleFlight
+
+
+class StubGbif:
+    """Keep-alive JSON server with scripted failures.
+
+    `fail[path]` is a list of status codes answered before the first 200;
+    `delay[path]` is a sleep before answering.
+    """
+
+    def __init__(self):
+        self.requests = []  # (path, client port)
+        self.fail = {}
+        self.delay = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                with stub._lock:
+                    stub.requests.append((path, self.client_address[1]))
+                    pending = stub.fail.get(path)
+                    status = pending.pop(0) if pending else 200
+                time.sleep(stub.delay.get(path, 0))
+                data = json.dumps({"path": path, "status": status}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def hits(self, path):
+        return sum(1 for p, _ in self.requests if p == path)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubGbif()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client(stub):
+    c = GbifClient(base_url=stub.url, timeout=5, max_retries=3, backoff_factor=0,
+                   rate_limit=0)
+    yield c
+    c.close()
+
+
+def test_sequential_calls_reuse_one_connection(stub, client):
+    for i in range(5):
+        assert client.get_json("species/match", {"name": f"owl {i}"})["status"] == 200
+    ports = {port for _, port in stub.requests}
+    assert len(stub.requests) == 5
+    assert len(ports) == 1
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_transient_statuses(stub, client, status):
+    stub.fail["/v1/species/search"] = [status, status]
+    assert client.species_search("owl") == []  # stub answers have no "results"
+    assert stub.hits("/v1/species/search") == 3
+    snap = client.stats.snapshot()
+    assert snap["retries"] == 2
+    assert snap["errors"] == 0
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.fail["/v1/species/match"] = [503] * 5
+    client = GbifClient(base_url=stub.url, max_retries=1, backoff_factor=0, rate_limit=0)
+    with pytest.raises(requests.HTTPError):
+        client.species_match("owl")
+    assert stub.hits("/v1/species/match") == 2
+    assert client.stats.snapshot()["errors"] == 1
+    client.close()
+
+
+def test_client_errors_are_not_retried(stub, client):
+    stub.fail["/v1/species/1/media"] = [404]
+    with pytest.raises(requests.HTTPError):
+        client.species_part(1, "media")
+    assert stub.hits("/v1/species/1/media") == 1
+
+
+def test_slow_answer_times_out(stub):
+    stub.delay["/v1/species/match"] = 1.0
+    client = GbifClient(base_url=stub.url, max_retries=0, rate_limit=0)
+    start = time.perf_counter()
+    with pytest.raises(requests.RequestException):
+        client.species_match("owl", timeout=0.2)
+    assert time.perf_counter() - start < 0.9
+    assert client.stats.snapshot()["errors"] == 1
+    client.close()
+
+
+def test_identical_concurrent_calls_share_one_request(stub, client):
+    stub.delay["/v1/species/search"] = 0.3
+    barrier = threading.Barrier(8)
+    results = []
+
+    def call():
+        barrier.wait()
+        results.append(client.get_json("species/search", {"q": "owl", "limit": 5}))
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 8
+    assert stub.hits("/v1/species/search") == 1
+    assert client.stats.snapshot()["coalesced"] == 7
+    # Each caller parsed its own copy.
+    assert len({id(r) for r in results}) == 8
+
+
+def test_waiters_give_up_after_their_timeout():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "late"
+
+    leader = threading.Thread(target=flights.do, args=("k", slow))
+    leader.start()
+    started.wait(5)
+    start = time.perf_counter()
+    with pytest.raises(FlightTimeout):
+        flights.do("k", lambda: "unused", timeout=0.1)
+    assert time.perf_counter() - start < 1
+    release.set()
+    leader.join()
+    # The key is free again once the leader finishes.
+    assert flights.do("k", lambda: "fresh", timeout=0.1) == ("fresh", False)
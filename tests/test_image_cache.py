@@ -0,0 +1,100 @@
+import time
+
+import pytest
+from PIL import Image
+
+import config
+import gbif_client
+from benchmarks.image_cache import StubImageServer
+from image_cache import VARIANTS, ImageCache
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = StubImageServer(2)
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def client(monkeypatch):
+    # A private client without the on-disk GBIF cache.
+    c = gbif_client.GbifClient(max_retries=0, rate_limit=0)
+    monkeypatch.setattr(gbif_client, "_client", c)
+    yield c
+    c.close()
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.02)
+
+
+def test_cold_fetch_resizes_every_variant(stub, tmp_path):
+    cache = ImageCache(tmp_path, revalidate_after=3600)
+    url = stub.urls[0]
+    before = stub.requests
+
+    thumb = cache.get(url, "thumb")
+    detail = cache.get(url, "detail")
+
+    assert stub.requests == before + 1  # one download serves both variants
+    with Image.open(thumb) as img:
+        assert img.format == "WEBP"
+        assert img.width == VARIANTS["thumb"]
+    with Image.open(detail) as img:
+        assert img.width == VARIANTS["detail"]
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_warm_hit_reads_disk_only(stub, tmp_path):
+    url = stub.urls[1]
+    path = ImageCache(tmp_path, revalidate_after=3600).get(url)
+    before = stub.requests
+
+    # A new instance (e.g. after a restart) finds the record on disk.
+    cache = ImageCache(tmp_path, revalidate_after=3600)
+    assert cache.get(url) == path
+    assert stub.requests == before
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["downloaded_bytes"] == 0
+
+
+def test_stale_record_revalidates_with_etag(stub, tmp_path):
+    cache = ImageCache(tmp_path, revalidate_after=3600)
+    url = stub.urls[0]
+    path = cache.get(url)
+    not_modified = stub.not_modified
+    downloaded = cache.stats()["downloaded_bytes"]
+
+    cache.revalidate_after = 0
+    assert cache.get(url) == path  # served at once, checked in the background
+    wait_for(lambda: cache.stats()["revalidated"] == 1)
+
+    assert stub.not_modified == not_modified + 1
+    assert cache.stats()["not_modified"] == 1
+    assert cache.stats()["downloaded_bytes"] == downloaded
+
+
+def test_failed_download_is_not_retried_until_retry_after(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "IMAGE_RETRY_AFTER_S", 3600)
+    host, port = stub.server.server_address
+    url = f"http://{host}:{port}/img/late.jpg"
+    cache = ImageCache(tmp_path, revalidate_after=3600)
+
+    assert cache.get(url) is None  # 404
+    assert cache.stats()["errors"] == 1
+
+    monkeypatch.setitem(stub.images, "/img/late.jpg", stub.images["/img/0.jpg"])
+    before = stub.requests
+    assert cache.get(url) is None  # still inside the retry window
+    assert stub.requests == before
+
+    monkeypatch.setattr(config, "IMAGE_RETRY_AFTER_S", 0)
+    assert cache.get(url) is not None
+    assert stub.requests == before + 1
+    assert cache.stats()["errors"] == 1
@@ -0,0 +1,34 @@
+import numpy as np
+from PIL import Image
+
+from image_preprocess import BIAS, SCALE, Preprocessor, preprocess_batch
+
+
+def solid(color, size=(300, 200)):
+    return Image.new("RGB", size, color)
+
+
+def test_normalizes_to_nchw():
+    out = preprocess_batch([solid((255, 0, 128))])
+    assert out.shape == (1, 3, 224, 224)
+    assert out.dtype == np.float32
+    expected = np.array([255, 0, 128]).reshape(3, 1, 1) * SCALE + BIAS
+    np.testing.assert_allclose(out[0, :, 0, 0], expected[:, 0, 0], rtol=1e-5)
+
+
+def test_small_batches_reuse_the_buffer():
+    pre = Preprocessor(max_capacity=4)
+    first = pre([solid((0, 0, 0))] * 3)
+    second = pre([solid((255, 255, 255))] * 2)
+    assert np.shares_memory(first, second)  # documented: the next call overwrites
+    assert len(pre._buf) == 3
+
+
+def test_oversized_batches_are_not_kept():
+    pre = Preprocessor(max_capacity=2)
+    big = pre([solid((10, 20, 30))] * 5)
+    assert big.shape[0] == 5
+    assert len(pre._buf) == 1
+    small = pre([solid((0, 0, 0))] * 2)
+    assert not np.shares_memory(big, small)
+    assert len(pre._buf) == 2
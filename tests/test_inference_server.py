@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from inference_server import InferenceClient, ModelUnavailable
+
+BATCH = np.zeros((2, 3, 224, 224), dtype=np.float32)
+
+
+class LocalModel:
+    def predict_probs(self, batch):
+        return np.full((len(batch), 4), 0.25, dtype=np.float32)
+
+
+@pytest.fixture
+def down(tmp_path):
+    return str(tmp_path / "nobody-listening.sock")
+
+
+def test_unreachable_server_without_fallback(down):
+    with pytest.raises(ModelUnavailable) as exc:
+        InferenceClient(down).predict_probs(BATCH)
+    assert isinstance(exc.value.__cause__, OSError)
+
+
+def test_unreachable_server_with_no_local_model(down):
+    calls = []
+
+    def fallback():
+        calls.append(1)
+        return None
+
+    client = InferenceClient(down, fallback=fallback)
+    for _ in range(2):
+        with pytest.raises(ModelUnavailable):
+            client.predict_probs(BATCH)
+    assert len(calls) == 2  # tried again, in case the model appears
+
+
+def test_unreachable_server_falls_back_to_local_model(down):
+    client = InferenceClient(down, fallback=LocalModel)
+    assert client.predict_probs(BATCH).shape == (2, 4)
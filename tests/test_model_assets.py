@@ -0,0 +1,160 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import config
+import gbif_client
+import model_assets
+from model_assets import AssetError, ChecksumMismatch, UnpinnedAsset, ensure_asset
+
+GOOD = b"tiger\nlion\n"
+GOOD_SHA = hashlib.sha256(GOOD).hexdigest()
+
+
+@pytest.fixture
+def server():
+    # body["range_416"]: what to send in Content-Range with a 416 (None: no header)
+    body = {"data": GOOD, "ranges": [], "range_416": "exact"}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            data = body["data"]
+            rng = self.headers.get("Range")
+            body["ranges"].append(rng)
+            if rng:
+                start = int(rng.split("=", 1)[1].rstrip("-"))
+                if start >= len(data):
+                    self.send_response(416)
+                    if body["range_416"] == "exact":
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                data = data[start:]
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.body = body
+    httpd.url = "http://%s:%d/labels.txt" % httpd.server_address
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    path = tmp_path / "manifest.json"
+    monkeypatch.setattr(model_assets, "MANIFEST_PATH", path)
+    monkeypatch.setattr(model_assets, "_verified", set())
+    client = gbif_client.GbifClient(max_retries=0, rate_limit=0)
+    monkeypatch.setattr(gbif_client, "_client", client)
+
+    def write(url=None, sha256=GOOD_SHA):
+        entry = {"file": "labels.txt", "url": url, "sha256": sha256}
+        path.write_text(json.dumps({"labels": entry, "mobilenet_v2_int8": {
+            "file": "int8.onnx", "url": None, "sha256": None}}))
+
+    yield write
+    client.close()
+
+
+def test_download_matching_pin(server, manifest, tmp_path):
+    manifest(url=server.url)
+    path = ensure_asset("labels", tmp_path / "models")
+    assert path.read_bytes() == GOOD
+
+
+def test_download_with_wrong_hash_is_rejected(server, manifest, tmp_path):
+    manifest(url=server.url)
+    server.body["data"] = b"something else\n"
+    with pytest.raises(ChecksumMismatch):
+        ensure_asset("labels", tmp_path / "models")
+    assert not (tmp_path / "models" / "labels.txt").exists()
+    assert not (tmp_path / "models" / "labels.txt.part").exists()
+
+
+def test_local_file_with_wrong_hash_is_not_replaced(server, manifest, tmp_path):
+    manifest(url=server.url)
+    models = tmp_path / "models"
+    models.mkdir()
+    (models / "labels.txt").write_bytes(b"tampered\n")
+    with pytest.raises(ChecksumMismatch, match="expected " + GOOD_SHA):
+        ensure_asset("labels", models)
+    assert (models / "labels.txt").read_bytes() == b"tampered\n"
+
+
+def test_local_only_asset(manifest, tmp_path):
+    manifest(url=None)
+    with pytest.raises(AssetError, match="missing"):
+        ensure_asset("labels", tmp_path)
+    (tmp_path / "labels.txt").write_bytes(b"tampered\n")
+    with pytest.raises(ChecksumMismatch):
+        ensure_asset("labels", tmp_path)
+    (tmp_path / "labels.txt").write_bytes(GOOD)
+    assert ensure_asset("labels", tmp_path) == tmp_path / "labels.txt"
+
+
+def test_unpinned_asset_is_refused_by_default(server, manifest, tmp_path):
+    manifest(url=server.url, sha256=None)
+    with pytest.raises(UnpinnedAsset, match="MODEL_ALLOW_UNPINNED"):
+        ensure_asset("labels", tmp_path)
+    assert server.body["ranges"] == []  # nothing was downloaded
+
+
+def test_unpinned_asset_with_opt_in(server, manifest, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "MODEL_ALLOW_UNPINNED", True)
+    manifest(url=server.url, sha256=None)
+    server.body["data"] = b"anything\n"
+    assert ensure_asset("labels", tmp_path).read_bytes() == b"anything\n"
+
+
+def test_missing_local_only_asset_is_reported_as_missing(manifest, tmp_path):
+    manifest(url=None, sha256=None)
+    with pytest.raises(AssetError, match="missing"):
+        ensure_asset("labels", tmp_path)
+    (tmp_path / "labels.txt").write_bytes(GOOD)
+    with pytest.raises(UnpinnedAsset):
+        ensure_asset("labels", tmp_path)
+
+
+def test_resume_from_partial_download(server, manifest, tmp_path):
+    manifest(url=server.url)
+    (tmp_path / "labels.txt.part").write_bytes(GOOD[:4])
+    assert ensure_asset("labels", tmp_path).read_bytes() == GOOD
+    assert server.body["ranges"] == ["bytes=4-"]
+
+
+def test_complete_part_file_is_kept_on_416(server, manifest, tmp_path):
+    manifest(url=server.url)
+    (tmp_path / "labels.txt.part").write_bytes(GOOD)
+    assert ensure_asset("labels", tmp_path).read_bytes() == GOOD
+    assert server.body["ranges"] == [f"bytes={len(GOOD)}-"]
+
+
+@pytest.mark.parametrize("range_416", ["exact", None])
+def test_oversized_or_unconfirmed_part_file_restarts(server, manifest, tmp_path, range_416):
+    manifest(url=server.url)
+    server.body["range_416"] = range_416
+    part = tmp_path / "labels.txt.part"
+    # Longer than the file (the 416 says so), or a 416 that does not say.
+    if range_416:
+        part.write_bytes(GOOD + b"stale tail\n")
+    else:
+        part.write_bytes(GOOD)
+    assert ensure_asset("labels", tmp_path).read_bytes() == GOOD
+    assert server.body["ranges"][-1] is None  # fetched again from the start
+    assert not part.exists()
@@ -0,0 +1,36 @@
+import config
+from label_map import LabelMap
+from result_cache import ResultCache, build_result_cache, results_fingerprint
+
+LABELS = ["tiger", "great grey owl", "tabby"]
+VALUE = ([("tiger", 0.9)], [("tiger", None, 0.9)])
+
+
+def animal(name):
+    return {"name": name, "scientific_name": "", "aliases": []}
+
+
+def test_fingerprint_follows_catalog_labels_and_threshold():
+    catalog = {"tiger": animal("Tiger"), "snowy_owl": animal("Snowy Owl")}
+    base = results_fingerprint(LABELS, LabelMap(LABELS, catalog), 0.15)
+    assert base == results_fingerprint(LABELS, LabelMap(LABELS, dict(catalog)), 0.15)
+    assert base != results_fingerprint(LABELS, LabelMap(LABELS, {"tiger": animal("Tiger")}), 0.15)
+    assert base != results_fingerprint(LABELS, LabelMap(LABELS, catalog), 0.3)
+    assert base != results_fingerprint(LABELS[:2], LabelMap(LABELS[:2], catalog), 0.15)
+    assert base != results_fingerprint(LABELS, None, 0.15)
+
+
+def test_disk_entries_are_kept_apart_by_variant_and_fingerprint(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "RESULT_CACHE_PATH", str(tmp_path / "results.sqlite"))
+    build_result_cache("fp32", "a").put("digest", 5, VALUE)
+    assert build_result_cache("fp32", "a").get("digest", 5) == VALUE
+    assert build_result_cache("fp32", "b").get("digest", 5) is None
+    assert build_result_cache("int8", "a").get("digest", 5) is None
+
+
+def test_memory_entries_are_keyed_by_topk():
+    cache = ResultCache(max_entries=2)
+    cache.put("digest", 5, VALUE)
+    assert cache.get("digest", 5) == VALUE
+    assert cache.get("digest", 3) is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "disk_hits": 0, "misses": 1}
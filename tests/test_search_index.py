@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from search_index import FuzzyNameIndex, NameIndex, edit_distance
+
+
+def animal(name, scientific="", aliases=()):
+    return {"name": name, "scientific_name": scientific, "aliases": list(aliases)}
+
+
+@pytest.fixture
+def fuzzy():
+    animals = {
+        "snowy_owl": animal("Snowy Owl", "Bubo scandiacus", ["Arctic owl"]),
+        "barn_owl": animal("Barn Owl", "Tyto alba"),
+        "tiger": animal("Tiger", "Panthera tigris"),
+        "lion": animal("Lion", "Panthera leo"),
+        "leopard": animal("Leopard", "Panthera pardus"),
+    }
+    return FuzzyNameIndex(NameIndex(animals))
+
+
+def osa(a, b):
+    # Unbounded optimal string alignment, for reference.
+    d = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1,
+                          d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+def test_edit_distance_matches_full_table():
+    rng = random.Random(0)
+    for _ in range(3000):
+        a = "".join(rng.choice("abc ") for _ in range(rng.randrange(9)))
+        b = "".join(rng.choice("abc ") for _ in range(rng.randrange(9)))
+        for k in (0, 1, 2):
+            assert edit_distance(a, b, k) == min(osa(a, b), k + 1), (a, b, k)
+
+
+def test_transposition_is_one_edit():
+    assert edit_distance("tigre", "tiger", 2) == 1
+
+
+def test_closest_name_ranks_first(fuzzy):
+    assert fuzzy.lookup("panthera tigrs") == [("tiger", "panthera tigris", 1)]
+    results = fuzzy.lookup("panthera leox")
+    assert results == [("lion", "panthera leo", 1)]
+
+
+def test_closer_matches_before_collection_order():
+    names = NameIndex({"cat": animal("cat"), "bat": animal("bat"), "cart": animal("cart")})
+    fuzzy = FuzzyNameIndex(names)
+    # "cart" is exact; "cat" and "bat" are one and two edits away.
+    assert fuzzy.lookup("cart") == [("cart", "cart", 0), ("cat", "cat", 1), ("bat", "bat", 2)]
+
+
+def test_ties_keep_collection_order():
+    for order in (["cat", "bat"], ["bat", "cat"]):
+        fuzzy = FuzzyNameIndex(NameIndex({k: animal(k) for k in order}))
+        assert [a for a, _, _ in fuzzy.lookup("xat")] == order
+
+
+def test_distance_limits(fuzzy):
+    assert fuzzy.lookup("tigr") == [("tiger", "tiger", 1)]
+    assert fuzzy.lookup("tigr", max_distance=0) == []
+    assert fuzzy.lookup("tgr") == [("tiger", "tiger", 2)]
+    assert fuzzy.lookup("tr") == []  # three edits
+    # Asking for more than the index was built for is clamped.
+    assert fuzzy.lookup("tr", max_distance=5) == []
+    assert fuzzy.lookup("") == []
+
+
+def test_one_result_per_animal_with_its_closest_name(fuzzy):
+    # "arctic owl" (alias, 1 edit) and "snowy owl" are both names of one animal.
+    results = fuzzy.lookup("arctic owk")
+    assert [a for a, _, _ in results] == ["snowy_owl"]
+    assert results[0][1:] == ("arctic owl", 1)
+
+
+def test_shared_prefix_groups(monkeypatch):
+    # Hundreds of names with one prefix are split by their suffixes; the
+    # answers must be the same as with a single group.
+    animals = {f"fox_{i}": animal(f"red fox {i}") for i in range(500)}
+    animals["arctic_fox"] = animal("Arctic fox")
+    names = NameIndex(animals)
+    split = FuzzyNameIndex(names, group_size=8)
+    whole = FuzzyNameIndex(names, group_size=10 ** 6)
+    assert split._groups and not whole._groups
+    for q in ("red fox 123", "red fx 123", "rde fox 4", "red fox 4999", "arctc fox"):
+        assert split.lookup(q, limit=20) == whole.lookup(q, limit=20), q
+    assert split.lookup("red fx 123")[0] == ("fox_123", "red fox 123", 1)
+
+
+def test_candidate_cap():
+    animals = {f"fox_{i}": animal(f"red fox {i}") for i in range(300)}
+    capped = FuzzyNameIndex(NameIndex(animals), max_candidates=5)
+    assert len(capped.lookup("red fox 1", limit=50)) <= 5
+    assert capped.lookup("red fox 1")[0][2] == 0
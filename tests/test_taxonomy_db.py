@@ -0,0 +1,115 @@
+import zipfile
+
+import pytest
+
+import taxonomy_db
+from taxonomy_db import TaxonomyDB, import_archive
+
+TAXON_HEADER = ["taxonID", "parentNameUsageID", "acceptedNameUsageID", "scientificName",
+                "canonicalName", "taxonRank", "taxonomicStatus", "kingdom", "family", "genus"]
+
+# (key, parent, accepted, scientific, canonical, rank, status, kingdom, family, genus)
+TAXA = [
+    (10, "", "", "Bubo Duméril, 1805", "Bubo", "genus", "accepted", "Animalia", "Strigidae", "Bubo"),
+    (1, 10, "", "Bubo scandiacus (Linnaeus, 1758)", "Bubo scandiacus", "species", "accepted",
+     "Animalia", "Strigidae", "Bubo"),
+    (2, 10, 1, "Nyctea scandiaca (Linnaeus, 1758)", "Nyctea scandiaca", "species", "synonym",
+     "Animalia", "Strigidae", "Bubo"),
+    (3, 10, "", "Bubo bubo (Linnaeus, 1758)", "Bubo bubo", "species", "accepted",
+     "Animalia", "Strigidae", "Bubo"),
+    (4, "", "", "Quercus robur L.", "Quercus robur", "species", "accepted",
+     "Plantae", "Fagaceae", "Quercus"),
+]
+VERNACULAR = [
+    (1, "Snowy Owl", "en"),
+    (3, "Eurasian Eagle-Owl", "en"),
+    (3, "Grand-duc d'Europe", "fr"),
+]
+
+
+def _tsv(header, rows):
+    lines = ["\t".join(header)] + ["\t".join(str(v) for v in r) for r in rows]
+    return "\n".join(lines) + "\n"
+
+
+def write_archive(path, taxa=TAXA, vernacular=VERNACULAR):
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("backbone/Taxon.tsv", _tsv(TAXON_HEADER, taxa))
+        zf.writestr("backbone/VernacularName.tsv",
+                    _tsv(["taxonID", "vernacularName", "language"], vernacular))
+    return path
+
+
+@pytest.fixture
+def db(tmp_path):
+    archive = write_archive(tmp_path / "backbone.zip")
+    counts = import_archive(archive, tmp_path / "taxonomy.sqlite", kingdoms=["Animalia"],
+                            log=lambda *a: None)
+    assert counts["taxa"] == 4  # Quercus filtered out
+    assert counts["vernacular_names"] == 3
+    return TaxonomyDB(tmp_path / "taxonomy.sqlite")
+
+
+def keys(results):
+    return [r["key"] for r in results]
+
+
+def test_exact_common_name_ranks_first(db):
+    results = db.species_search("snowy owl")
+    assert keys(results)[0] == 1
+    assert results[0]["vernacularNames"][0]["vernacularName"] == "Snowy Owl"
+
+
+def test_exact_canonical_name_beats_prefix_hits(db):
+    # "bubo" is the genus's exact name and a word in every species name.
+    assert keys(db.species_search("bubo"))[0] == 10
+
+
+def test_accepted_name_beats_synonym(db):
+    # Prefix of both "Bubo scandiacus" and the synonym "Nyctea scandiaca".
+    assert keys(db.species_search("scandia")) == [1, 2]
+
+
+def test_prefix_of_each_word(db):
+    assert keys(db.species_search("eagle ow")) == [3]
+    assert db.species_search("quercus") == []
+
+
+def test_match_reports_accepted_usage_for_synonym(db):
+    match = db.species_match("Nyctea scandiaca")
+    assert match["usageKey"] == 2
+    assert match["synonym"] is True
+    assert match["acceptedUsageKey"] == 1
+    assert db.species_match("Unknown thing")["matchType"] == "NONE"
+
+
+def test_candidate_cap_keeps_best_ranked(tmp_path, monkeypatch):
+    # Many long names matching "owl" come first in row order; the short,
+    # best-scoring one comes last and must survive the candidate cap.
+    taxa = [(100 + i, "", "", f"Strix sp{i}", f"Strix sp{i}", "species", "doubtful",
+             "Animalia", "Strigidae", "Strix") for i in range(50)]
+    taxa.append((999, "", "", "Tyto alba", "Tyto alba", "species", "doubtful",
+                 "Animalia", "Tytonidae", "Tyto"))
+    vernacular = [(100 + i, f"Long tailed forest owl of the northern hills number {i}", "en")
+                  for i in range(50)]
+    vernacular.append((999, "Owl", "en"))
+    archive = write_archive(tmp_path / "many.zip", taxa, vernacular)
+    import_archive(archive, tmp_path / "many.sqlite", log=lambda *a: None)
+    monkeypatch.setattr(taxonomy_db, "SEARCH_CANDIDATES", 5)
+
+    # "ow" is not an exact name and none are accepted, so only bm25 ranks them.
+    results = TaxonomyDB(tmp_path / "many.sqlite").species_search("ow", limit=3)
+    assert keys(results)[0] == 999
+
+
+@pytest.mark.parametrize("dirname", ["what?mode=rwc", "a#b", "100%25 sure", "sp ace"])
+def test_paths_that_look_like_uri_syntax(tmp_path, dirname):
+    folder = tmp_path / dirname
+    folder.mkdir()
+    path = folder / "taxonomy.sqlite"
+    import_archive(write_archive(tmp_path / "backbone.zip"), path, log=lambda *a: None)
+    db = TaxonomyDB(path)
+    assert keys(db.species_search("snowy owl"))[0] == 1
+    with pytest.raises(taxonomy_db.sqlite3.OperationalError, match="readonly"):
+        db._conn().execute("DELETE FROM taxon")
+    assert sorted(p.name for p in folder.iterdir()) == ["taxonomy.sqlite"]
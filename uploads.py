@@ -0,0 +1,215 @@
+# Bounded ingestion of uploaded images.
+#
+# Every upload passes through ingest() before anything decodes it:
+#   1. the byte size is checked against MAX_CONTENT_LENGTH without reading;
+#   2. the image header is parsed (PIL opens lazily) and width * height *
+#      frames is checked against MAX_IMAGE_PIXELS, so a 20k x 20k PNG is
+#      rejected after a few hundred bytes instead of after a 1.6 GB decode;
+#   3. the pixels are read straight from the upload's buffer through a
+#      memoryview, with no bytes copy of the file. Uploads larger than
+#      UPLOAD_SPILL_BYTES are first written to UPLOAD_FOLDER and decoded from
+#      there; the file is removed when the Upload is closed, and files left
+#      behind by a crashed worker are swept after UPLOAD_STALE_S.
+
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import config
+import metrics
+from result_cache import image_digest
+
+_swept = False
+_sweep_lock = threading.Lock()
+
+
+class UploadError(ValueError):
+    """An upload that is refused; the message is safe to show to the user."""
+
+
+class MemoryReader(io.RawIOBase):
+    """Seekable read-only file over a memoryview (no copy of the data)."""
+
+    def __init__(self, buf):
+        self._buf = memoryview(buf).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self._buf) - self._pos))
+        b[:n] = self._buf[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._buf)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._buf.release()
+        super().close()
+
+
+def _mb(n: int) -> str:
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def check_size(name: str, size: int):
+    if size > config.MAX_CONTENT_LENGTH:
+        raise UploadError(
+            f"{name} ({_mb(size)}) is over the {_mb(config.MAX_CONTENT_LENGTH)} upload limit."
+        )
+
+
+def _too_many_pixels(name: str, what: str) -> UploadError:
+    return UploadError(
+        f"{name} is {what}; images are limited to {config.MAX_IMAGE_PIXELS / 1e6:.0f} megapixels."
+    )
+
+
+def check_pixels(name: str, img):
+    frames = getattr(img, "n_frames", 1) or 1
+    if img.width * img.height * frames > config.MAX_IMAGE_PIXELS:
+        raise _too_many_pixels(
+            name, f"{img.width} x {img.height}" + (f" x {frames} frames" if frames > 1 else "")
+        )
+
+
+def sweep_upload_folder(max_age: float = None):
+    """Remove spilled uploads older than max_age (left by crashed workers)."""
+    folder = Path(config.UPLOAD_FOLDER)
+    max_age = config.UPLOAD_STALE_S if max_age is None else max_age
+    cutoff = time.time() - max_age
+    for path in folder.glob("*.upload"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+def _sweep_once():
+    global _swept
+    if not _swept:
+        with _sweep_lock:
+            if not _swept:
+                _swept = True
+                sweep_upload_folder()
+
+
+class Upload:
+    """A checked upload. Use as a context manager; open() returns a lazy PIL image."""
+
+    def __init__(self, name: str, size: int, digest: str, buf=None, path: Path = None):
+        self.name = name
+        self.size = size
+        self.digest = digest
+        self.path = path
+        self._buf = buf
+        self._files = []
+
+    def _file(self):
+        f = open(self.path, "rb") if self.path is not None else MemoryReader(self._buf)
+        self._files.append(f)
+        return f
+
+    def open(self):
+        from PIL import Image
+
+        return Image.open(self._file())
+
+    def preview(self, max_side: int = None):
+        """A downsized copy for display; JPEGs decode at reduced scale."""
+        max_side = max_side or config.UPLOAD_PREVIEW_SIDE
+        img = self.open()
+        img.draft("RGB", (max_side, max_side))
+        img.thumbnail((max_side, max_side))
+        return img.convert("RGB") if img.mode not in ("RGB", "RGBA", "L") else img
+
+    def close(self):
+        for f in self._files:
+            f.close()
+        self._files.clear()
+        if self._buf is not None:
+            self._buf.release()
+            self._buf = None
+        if self.path is not None:
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _spill(buf) -> Path:
+    folder = Path(config.UPLOAD_FOLDER)
+    folder.mkdir(parents=True, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".upload", dir=folder)
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(MemoryReader(buf), f, 1024 * 1024)
+    return Path(path)
+
+
+@metrics.timed("upload_ingest")
+def ingest(uploaded) -> Upload:
+    """Check a Streamlit UploadedFile (or any named BytesIO) and wrap it.
+
+    Raises UploadError for files that are too large in bytes or pixels, or
+    that are not readable images.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    # Second line of defence for any Image.open elsewhere in the process:
+    # PIL refuses images over twice this size outright.
+    Image.MAX_IMAGE_PIXELS = config.MAX_IMAGE_PIXELS
+    _sweep_once()
+    name = getattr(uploaded, "name", "upload")
+    size = getattr(uploaded, "size", None)
+    if size is None:
+        with uploaded.getbuffer() as buf:
+            size = buf.nbytes
+    check_size(name, size)
+
+    buf = uploaded.getbuffer()
+    digest = image_digest(buf)
+    if size > config.UPLOAD_SPILL_BYTES:
+        try:
+            upload = Upload(name, size, digest, path=_spill(buf))
+        finally:
+            buf.release()
+    else:
+        upload = Upload(name, size, digest, buf=buf)
+
+    try:
+        img = upload.open()
+        check_pixels(name, img)
+    except UploadError:
+        upload.close()
+        raise
+    except Image.DecompressionBombError as e:
+        # Raised by PIL itself, from the header, at twice MAX_IMAGE_PIXELS.
+        upload.close()
+        raise _too_many_pixels(name, "far too large") from e
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        upload.close()
+        raise UploadError(f"{name} is not a readable image.") from e
+    return upload